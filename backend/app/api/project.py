@@ -1,10 +1,20 @@
 """
 ��ĿAPIģ��
 """
-from fastapi import APIRouter, HTTPException, File, UploadFile, Form, Request
+from fastapi import APIRouter, HTTPException, File, UploadFile, Form, Request, Query
 from ..core.response import APIResponse
+from ..core.connection_pool import get_pool_stats
+from ..core.executors import get_executor_stats, run_io
+from ..core.file_index import get_file_index
+from ..core.project_resolver import get_project_resolver
+from ..services.artifact_cache import get_artifact_cache
+from ..services.blob_store import get_blob_store
+from ..services.generation_context import get_generation_context_cache
+from ..services.llm_scheduler import get_llm_scheduler
+from ..services.office_converter import get_office_converter
 from ..services.project_progress_service import ProjectProgressService
 from ..services.project_service import ProjectService
+from ..services.upload_service import UploadError, get_upload_sessions
 from typing import List, Dict, Any, Optional
 import os
 import json
@@ -13,21 +23,37 @@ from pathlib import Path
 router = APIRouter(prefix="/projects", tags=["projects"])
 
 @router.get("/")
-async def get_projects():
-    """��ȡ��Ŀ�б�"""
+async def get_projects(
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    service_mode: Optional[str] = None,
+    user_phone: Optional[str] = None,
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+    search: Optional[str] = None,
+    include_total: bool = False
+):
+    """获取项目列表（游标分页：传入上一页返回的 next_cursor 获取下一页）"""
     try:
-        # ģ����Ŀ����
-        projects = [
-            {
-                "id": 1,
-                "name": "ʾ����Ŀ",
-                "status": "active",
-                "created_at": "2025-01-01T00:00:00"
-            }
-        ]
-        return APIResponse.success(projects, "��ȡ��Ŀ�б��ɹ�")
+        result = await run_io(
+            project_service.get_project_list,
+            limit=limit, cursor=cursor, status=status, service_mode=service_mode,
+            user_phone=user_phone, created_from=created_from, created_to=created_to,
+            search=search, include_total=include_total
+        )
+        if not result.get("success"):
+            return APIResponse.error(result.get("message"), code=400)
+        return APIResponse.success({
+            "projects": result["projects"],
+            "count": result["count"],
+            "total": result["total"],
+            "limit": result["limit"],
+            "has_more": result["has_more"],
+            "next_cursor": result["next_cursor"]
+        }, result.get("message"))
     except Exception as e:
-        return APIResponse.server_error(f"��ȡ��Ŀ�б�ʧ��: {str(e)}")
+        return APIResponse.server_error(f"获取项目列表失败: {str(e)}")
 
 @router.get("/status")
 async def get_system_status():
@@ -40,7 +66,16 @@ async def get_system_status():
                 "ai_service": "active",
                 "validation_service": "active",
                 "database": "active"
-            }
+            },
+            "database_pools": get_pool_stats(),
+            "llm_scheduler": get_llm_scheduler().stats(),
+            "executors": get_executor_stats(),
+            "office_converter": get_office_converter().stats(),
+            "artifact_cache": get_artifact_cache().stats(),
+            "blob_store": get_blob_store().stats(),
+            "file_index": get_file_index().stats(),
+            "project_resolver": get_project_resolver().stats(),
+            "generation_context": get_generation_context_cache().stats()
         }
         return APIResponse.success(status, "ϵͳ״̬����")
     except Exception as e:
@@ -96,72 +131,11 @@ async def reset_project_progress(project_id: int):
 # 新增：项目配置和文件管理API
 
 def get_project_path_by_id(project_id: str) -> Optional[str]:
-    """根据项目ID获取项目路径"""
+    """根据项目ID获取项目路径（经共享的项目解析器缓存）"""
     try:
-        import sqlite3
-
-        # 数据库路径
-        db_path = Path(__file__).parent.parent.parent / "ztbai.db"
-
-        with sqlite3.connect(str(db_path)) as conn:
-            conn.row_factory = sqlite3.Row  # 启用字典式访问
-            cursor = conn.cursor()
-            cursor.execute("SELECT project_path FROM projects WHERE id = ?", (project_id,))
-            row = cursor.fetchone()
-
-            if row and row['project_path']:
-                project_path = row['project_path']
-                print(f"✅ [API] 根据项目ID {project_id} 获取到路径: {project_path}")
-                return project_path
-            else:
-                print(f"❌ [API] 项目ID {project_id} 不存在或路径为空，尝试回退查找")
-                # 尝试回退查找
-                return find_project_by_id_fallback(project_id)
-
+        return get_project_resolver().get_path(project_id)
     except Exception as e:
         print(f"❌ [API] 获取项目路径失败: {e}")
-        # 尝试回退查找
-        return find_project_by_id_fallback(project_id)
-
-def find_project_by_id_fallback(project_id: str) -> Optional[str]:
-    """当数据库查找失败时，从目录结构查找项目"""
-    try:
-        print(f"🔍 [FALLBACK] 尝试从目录查找项目ID: {project_id}")
-
-        # 获取当前脚本目录
-        current_dir = Path(__file__).parent.parent.parent
-
-        # 查找ZtbBidPro目录
-        ztb_bid_pro_dir = current_dir / "ZtbBidPro"
-        if not ztb_bid_pro_dir.exists():
-            ztb_bid_pro_dir = current_dir.parent / "ZtbBidPro"
-
-        if ztb_bid_pro_dir.exists():
-            print(f"🔍 [FALLBACK] 在ZtbBidPro目录中查找: {ztb_bid_pro_dir}")
-
-            # 遍历所有子目录
-            for project_dir in ztb_bid_pro_dir.iterdir():
-                if project_dir.is_dir():
-                    # 检查目录名是否包含项目ID或匹配模式
-                    if (project_id in project_dir.name or
-                        project_dir.name.endswith(f"_{project_id}") or
-                        project_dir.name.startswith(f"{project_id}_")):
-                        print(f"✅ [FALLBACK] 找到匹配的项目目录: {project_dir}")
-                        return str(project_dir)
-
-            # 如果没有找到精确匹配，尝试查找最新的项目目录
-            project_dirs = [d for d in ztb_bid_pro_dir.iterdir() if d.is_dir()]
-            if project_dirs:
-                # 按修改时间排序，取最新的
-                latest_dir = max(project_dirs, key=lambda x: x.stat().st_mtime)
-                print(f"✅ [FALLBACK] 使用最新的项目目录: {latest_dir}")
-                return str(latest_dir)
-
-        print(f"❌ [FALLBACK] 未找到项目目录")
-        return None
-
-    except Exception as e:
-        print(f"❌ [FALLBACK] 目录查找失败: {e}")
         return None
 
 def get_current_project_path() -> Optional[str]:
@@ -241,17 +215,20 @@ async def get_project_files(project_id: str):
             print(f"❌ [API] 项目目录不存在: {project_dir}")
             return APIResponse.error("项目目录不存在")
 
-        files = []
-        for file_path in project_dir.iterdir():
-            if file_path.is_file():
-                file_info = {
-                    "name": file_path.name,
-                    "size": file_path.stat().st_size,
-                    "modified_time": file_path.stat().st_mtime,
-                    "extension": file_path.suffix.lower(),
-                    "is_analysis_report": file_path.name in ["招标文件分析报告.md", "投标文件制作策略.md"]
-                }
-                files.append(file_info)
+        # 从项目文件索引读取（索引过期时先核对一次目录）
+        file_index = get_file_index()
+        await run_io(file_index.ensure_fresh, project_id, project_dir)
+        indexed = await run_io(file_index.list_files, project_id, "", False)
+        files = [
+            {
+                "name": item["name"],
+                "size": item["size"],
+                "modified_time": item["modified_time"],
+                "extension": item["extension"],
+                "is_analysis_report": item["name"] in ["招标文件分析报告.md", "投标文件制作策略.md"]
+            }
+            for item in indexed
+        ]
 
         print(f"✅ [API] 获取到 {len(files)} 个文件")
         return APIResponse.success(files, "获取文件列表成功")
@@ -347,36 +324,29 @@ async def get_analysis_status(project_id: str):
                 "report_files": []
             }, "项目目录不存在，返回默认状态")
 
-        # 检查分析报告文件是否存在
-        analysis_report = project_dir / "招标文件分析报告.md"
-        strategy_report = project_dir / "投标文件制作策略.md"
+        # 从项目文件索引检查分析报告文件是否存在
+        file_index = get_file_index()
+        await run_io(file_index.ensure_fresh, project_id, project_dir)
+        analysis_report = await run_io(file_index.get_file, project_id, "招标文件分析报告.md")
+        strategy_report = await run_io(file_index.get_file, project_id, "投标文件制作策略.md")
 
-        print(f"🔍 [API] 分析报告文件: {analysis_report}")
-        print(f"🔍 [API] 分析报告存在: {analysis_report.exists()}")
-        print(f"🔍 [API] 策略报告文件: {strategy_report}")
-        print(f"🔍 [API] 策略报告存在: {strategy_report.exists()}")
+        print(f"🔍 [API] 分析报告存在: {analysis_report is not None}")
+        print(f"🔍 [API] 策略报告存在: {strategy_report is not None}")
 
         status = {
-            "has_analysis_report": analysis_report.exists(),
-            "has_strategy_report": strategy_report.exists(),
-            "analysis_completed": analysis_report.exists() and strategy_report.exists(),
-            "report_files": []
+            "has_analysis_report": analysis_report is not None,
+            "has_strategy_report": strategy_report is not None,
+            "analysis_completed": analysis_report is not None and strategy_report is not None,
+            "report_files": [
+                {
+                    "name": report["name"],
+                    "size": report["size"],
+                    "modified_time": report["modified_time"]
+                }
+                for report in (analysis_report, strategy_report) if report is not None
+            ]
         }
 
-        if analysis_report.exists():
-            status["report_files"].append({
-                "name": "招标文件分析报告.md",
-                "size": analysis_report.stat().st_size,
-                "modified_time": analysis_report.stat().st_mtime
-            })
-
-        if strategy_report.exists():
-            status["report_files"].append({
-                "name": "投标文件制作策略.md",
-                "size": strategy_report.stat().st_size,
-                "modified_time": strategy_report.stat().st_mtime
-            })
-
         print(f"✅ [API] 分析状态: {status}")
         return APIResponse.success(status, "获取分析状态成功")
     except Exception as e:
@@ -457,14 +427,29 @@ def fix_filename_encoding(filename: str) -> str:
 
 @router.post("/create")
 async def create_project(
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
     project_name: str = Form(...),
-    user_phone: str = Form("")
+    user_phone: str = Form(""),
+    upload_id: Optional[str] = Form(None)
 ):
-    """Create a new project by uploading a bid file"""
+    """
+    Create a new project by uploading a bid file
+    大文件可先通过 /uploads 断点续传，再以 upload_id 创建项目
+    """
     try:
+        staged = None
+        if upload_id:
+            try:
+                staged = dict(get_upload_sessions().get_staged(upload_id))
+            except UploadError as e:
+                return APIResponse.error(str(e), code=400)
+            original_filename = staged["filename"]
+        elif file is not None:
+            original_filename = file.filename
+        else:
+            return APIResponse.error("请上传招标文件", code=400)
+
         # 处理中文文件名编码问题
-        original_filename = file.filename
         print(f"🔍 [FastAPI] 接收到的文件名: {repr(original_filename)}")
         
         # 使用增强的编码修复函数
@@ -472,13 +457,17 @@ async def create_project(
             corrected_filename = fix_filename_encoding(original_filename)
             if corrected_filename != original_filename:
                 print(f"✅ [编码修复] 文件名已修复: {repr(original_filename)} -> {repr(corrected_filename)}")
-                file.filename = corrected_filename
+                if staged is not None:
+                    staged["filename"] = corrected_filename
+                else:
+                    file.filename = corrected_filename
             else:
                 print(f"ℹ️ [编码修复] 文件名无需修复或修复失败: {repr(original_filename)}")
         
         # The ProjectService's create_project method is asynchronous
-        result = await project_service.create_project(file, user_phone)
-        
+        result = await project_service.create_project(file, user_phone, staged=staged)
+        if upload_id and result.get("success"):
+            get_upload_sessions().abort(upload_id)
         # 如果创建成功，更新项目名称
         if result.get("success") and project_name:
             project_id = result.get("data", {}).get("id")
@@ -497,3 +486,17 @@ async def create_project(
         # Log the full exception for debugging purposes
         # logger.error(f"Project creation failed: {e}", exc_info=True)
         return APIResponse.server_error(f"An unexpected error occurred: {str(e)}")
+
+@router.post("/verify")
+async def verify_projects(request: Request):
+    """批量校验项目文件MD5（请求体可选 {"project_ids": [...]}，为空时校验全部项目）"""
+    try:
+        project_ids = None
+        if await request.body():
+            project_ids = (await request.json()).get("project_ids")
+        result = await run_io(project_service.verify_projects, project_ids)
+        if result.get("success"):
+            return APIResponse.success(result, result.get("message"))
+        return APIResponse.error(result.get("message"), code=400)
+    except Exception as e:
+        return APIResponse.server_error(f"批量校验项目失败: {str(e)}")
@@ -11,6 +11,7 @@ from .framework_generation import router as framework_generation_router
 from .content_generation import router as content_generation_router
 from .format_config import router as format_config_router
 from .document_export import router as document_export_router
+from .stream import router as step_stream_router
 
 __all__ = [
     "service_mode_router",
@@ -20,5 +21,6 @@ __all__ = [
     "framework_generation_router",
     "content_generation_router",
     "format_config_router",
-    "document_export_router"
+    "document_export_router",
+    "step_stream_router"
 ]
@@ -3,8 +3,10 @@
 """
 
 from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
 from ...core.response import create_response, create_error_response
 from ...services.content_generation_service import ContentGenerationService
+from .stream import format_sse
 import logging
 
 router = APIRouter()
@@ -25,7 +27,9 @@ async def execute_content_generation(project_id: str, request: Request):
         body = await request.json()
         sections = body.get("sections", [])
         
-        execute_result = await content_service.execute(project_id, sections)
+        execute_result = await content_service.execute(
+            project_id, section_keys=sections or None, force=bool(body.get("force", False))
+        )
         return create_response(True, "内容生成任务已启动", execute_result)
     except Exception as e:
         return create_error_response(f"执行内容生成失败: {str(e)}")
@@ -37,3 +41,24 @@ async def get_content_result(project_id: str):
         return create_response(True, "获取步骤结果成功", result_data)
     except Exception as e:
         return create_error_response(f"获取内容生成结果失败: {str(e)}")
+
+@router.get("/projects/{project_id}/step/content-generation/chapters/{chapter_key}/stream")
+async def stream_chapter_content(project_id: str, chapter_key: str, request: Request):
+    """Step API: 流式生成单个章节内容（SSE），增量文本同时写入 bid_content/<chapter>.md"""
+    async def event_stream():
+        events = content_service.stream_chapter_content(project_id, chapter_key)
+        try:
+            async for event in events:
+                if await request.is_disconnected():
+                    logger.info(f"章节流式生成连接已断开: {project_id}/{chapter_key}")
+                    break
+                yield format_sse(event, event["type"])
+        finally:
+            # 立即关闭生成器，释放上游模型流、调度槽位与临时文件
+            await events.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -5,7 +5,12 @@
 from fastapi import APIRouter, Request, UploadFile, File, Form
 from ...core.response import create_response, create_error_response
 from ...services.material_management_service import MaterialManagementService
+from ...services.blob_store import get_blob_store
+from ...services.upload_service import UploadError, get_upload_sessions, stream_upload
+from typing import Optional
+import os
 import time
+import uuid
 import logging
 
 router = APIRouter()
@@ -46,34 +51,53 @@ async def upload_material_file(
     category_id: str = Form(...),
     item_id: str = Form(...),
     description: str = Form(""),
-    file: UploadFile = File(...)
+    file: Optional[UploadFile] = File(None),
+    upload_id: Optional[str] = Form(None)
 ):
-    """上传资料文件"""
+    """
+    上传资料文件
+    可直接上传 file，也可传入已通过 /uploads 断点续传完成的 upload_id
+    """
+    sessions = get_upload_sessions()
+    staged = None
     try:
-        if not file.filename:
+        if upload_id:
+            staged = sessions.get_staged(upload_id)
+        elif file is not None and file.filename:
+            # 分块接收到共享存储暂存目录，不把整个文件读入内存
+            staged = await stream_upload(
+                file, get_blob_store().staging_dir / f"{uuid.uuid4().hex}.upload", filename=file.filename
+            )
+        else:
             return create_error_response("文件名不能为空")
 
-        # 读取文件内容
-        file_content = await file.read()
-
         # 调用服务层上传文件
         result = await material_service.upload_material(
             project_id=project_id,
             category_id=category_id,
             item_id=item_id,
-            file_content=file_content,
-            filename=file.filename,
-            description=description
+            file_content=None,
+            filename=staged["filename"],
+            description=description,
+            staged=staged
         )
 
         if result["success"]:
+            if upload_id:
+                sessions.abort(upload_id)
             return create_response(True, result["message"], result["file_info"])
         else:
             return create_error_response(result["error"])
 
+    except UploadError as e:
+        return create_error_response(f"上传资料文件失败: {str(e)}")
     except Exception as e:
         logger.error(f"上传资料文件失败: {e}")
         return create_error_response(f"上传资料文件失败: {str(e)}")
+    finally:
+        # 直接上传时清理未存入共享存储的暂存文件
+        if staged and not upload_id and os.path.exists(staged["path"]):
+            os.remove(staged["path"])
 
 # 添加获取资料分类API
 @router.get("/projects/{project_id}/step/material-management/categories")
@@ -0,0 +1,67 @@
+"""
+步骤进度推送 API
+通过 Server-Sent Events 推送项目各步骤的进度与状态变化，替代轮询 /step/<step>/status
+"""
+
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, Dict, Optional
+import json
+import logging
+
+from ...core.config import get_config
+from ...core.event_bus import get_event_bus
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+def format_sse(event: Dict[str, Any], event_type: str = "progress") -> str:
+    """格式化为SSE消息"""
+    data = json.dumps(event, ensure_ascii=False, default=str)
+    event_id = event.get("id")
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}event: {event_type}\ndata: {data}\n\n"
+
+
+async def _event_stream(request: Request, project_id: str, step_filter: Optional[set]) -> AsyncIterator[str]:
+    bus = get_event_bus()
+    heartbeat = get_config().get("events.heartbeat_seconds", 15)
+    sub = bus.subscribe(project_id)
+    try:
+        # 连接建立后先推送各步骤的最新状态快照
+        snapshot = [e for e in bus.snapshot(project_id) if not step_filter or e["step_key"] in step_filter]
+        yield format_sse({"project_id": project_id, "steps": snapshot}, "snapshot")
+
+        while True:
+            if await request.is_disconnected():
+                break
+            event = await sub.get(timeout=heartbeat)
+            if event is None:
+                # 心跳，防止代理断开空闲连接
+                yield ": keep-alive\n\n"
+                continue
+            if step_filter and event["step_key"] not in step_filter:
+                continue
+            yield format_sse(event)
+    finally:
+        bus.unsubscribe(sub)
+        logger.info(f"步骤进度推送连接关闭: project_id={project_id}, dropped={sub.dropped}")
+
+
+@router.get("/projects/{project_id}/steps/stream")
+async def stream_step_progress(project_id: str, request: Request, steps: Optional[str] = None):
+    """
+    Step API: 订阅项目步骤进度（SSE）
+    steps 可选，逗号分隔的步骤键，如 bid-analysis,content-generation
+    """
+    step_filter = {s.strip() for s in steps.split(",") if s.strip()} if steps else None
+    return StreamingResponse(
+        _event_stream(request, project_id, step_filter),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        },
+    )
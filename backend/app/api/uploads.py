@@ -0,0 +1,99 @@
+"""
+断点续传上传API
+大文件分多次上传：
+1. POST   /uploads                        创建会话（filename, total_size, sha256 可选）
+2. PUT    /uploads/{upload_id}?offset=N   请求体为从 offset 开始的原始字节，可分多次发送
+3. GET    /uploads/{upload_id}            查询已接收字节数，断线后从 received 处续传
+4. POST   /uploads/{upload_id}/complete   结束上传并校验哈希
+完成后把 upload_id 传给 /projects/create 或资料上传接口使用
+"""
+from fastapi import APIRouter, Request
+from typing import Optional
+import logging
+
+from ..core.response import APIResponse
+from ..services.upload_service import (
+    UploadError, UploadNotFoundError, UploadOffsetError, UploadTooLargeError, get_upload_sessions
+)
+
+router = APIRouter(prefix="/uploads", tags=["uploads"])
+logger = logging.getLogger(__name__)
+
+
+def _error_response(e: UploadError):
+    if isinstance(e, UploadNotFoundError):
+        return APIResponse.error(str(e), code=404)
+    if isinstance(e, UploadOffsetError):
+        return APIResponse.error(str(e), code=409, data={"received": e.expected})
+    if isinstance(e, UploadTooLargeError):
+        return APIResponse.error(str(e), code=413)
+    return APIResponse.error(str(e), code=400)
+
+
+@router.post("")
+async def create_upload(request: Request):
+    """创建上传会话"""
+    try:
+        body = await request.json()
+        filename = body.get("filename")
+        if not filename:
+            return APIResponse.error("文件名不能为空", code=400)
+        session = get_upload_sessions().create(filename, body.get("total_size"), body.get("sha256"))
+        return APIResponse.success(session, "上传会话已创建")
+    except UploadError as e:
+        return _error_response(e)
+    except Exception as e:
+        return APIResponse.server_error(f"创建上传会话失败: {str(e)}")
+
+
+@router.get("/{upload_id}")
+async def get_upload(upload_id: str):
+    """查询上传进度"""
+    try:
+        return APIResponse.success(get_upload_sessions().get(upload_id), "获取上传状态成功")
+    except UploadError as e:
+        return _error_response(e)
+
+
+@router.put("/{upload_id}")
+async def append_upload(upload_id: str, request: Request, offset: int = 0):
+    """从 offset 处追加数据（请求体流式读取）"""
+    try:
+        session = await get_upload_sessions().append(upload_id, offset, request.stream())
+        return APIResponse.success(session, "数据已接收")
+    except UploadError as e:
+        return _error_response(e)
+    except Exception as e:
+        logger.error(f"接收上传数据失败: {e}")
+        return APIResponse.server_error(f"接收上传数据失败: {str(e)}")
+
+
+@router.post("/{upload_id}/complete")
+async def complete_upload(upload_id: str, request: Request):
+    """结束上传并校验"""
+    try:
+        sha256: Optional[str] = None
+        if await request.body():
+            sha256 = (await request.json()).get("sha256")
+        staged = await get_upload_sessions().complete(upload_id, sha256)
+        return APIResponse.success({
+            "upload_id": upload_id,
+            "filename": staged["filename"],
+            "size": staged["size"],
+            "sha256": staged["sha256"],
+        }, "上传完成")
+    except UploadError as e:
+        return _error_response(e)
+    except Exception as e:
+        logger.error(f"完成上传失败: {e}")
+        return APIResponse.server_error(f"完成上传失败: {str(e)}")
+
+
+@router.delete("/{upload_id}")
+async def abort_upload(upload_id: str):
+    """取消上传"""
+    try:
+        get_upload_sessions().abort(upload_id)
+        return APIResponse.success(None, "上传已取消")
+    except UploadError as e:
+        return _error_response(e)
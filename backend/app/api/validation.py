@@ -1,35 +1,36 @@
 """
-֤APIģ
+验证API模块
 """
 from fastapi import APIRouter, UploadFile, File, HTTPException
 from ..services.validation_service import ValidationService
 from ..core.response import APIResponse
+from ..core.executors import run_io
+from ..services.upload_service import stream_upload
 import tempfile
 import os
+import uuid
 
 router = APIRouter(prefix="/api/validation", tags=["validation"])
 validation_service = ValidationService()
 
 @router.post("/file")
 async def validate_file(file: UploadFile = File(...)):
-    """֤ϴļ"""
+    """验证上传的文件"""
     try:
-        # ʱļ
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file.filename) as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_file_path = temp_file.name
+        # 保存临时文件（分块写入，不把整个文件读入内存）
+        temp_file_path = os.path.join(tempfile.gettempdir(), f"{uuid.uuid4().hex}_{os.path.basename(file.filename or 'upload')}")
+        await stream_upload(file, temp_file_path)
         
-        # ֤ļ
-        result = validation_service.validate_bid_file(temp_file_path)
+        # 验证文件（含PDF解析与大模型请求，在IO线程池中执行）
+        result = await run_io(validation_service.validate_bid_file, temp_file_path)
         
-        # ʱļ
+        # 清理临时文件
         os.unlink(temp_file_path)
         
         if result["valid"]:
-            return APIResponse.success(result, "ļ֤ͨ")
+            return APIResponse.success(result, "文件验证通过")
         else:
             return APIResponse.error(result["message"], 400, result)
             
     except Exception as e:
-        return APIResponse.server_error(f"ļ֤ʧ: {str(e)}")
+        return APIResponse.server_error(f"文件验证失败: {str(e)}")
@@ -24,7 +24,31 @@ class ConfigManager:
         return {
             "database": {
                 "url": "sqlite:///ztbai.db",
-                "echo": False
+                "echo": False,
+                "pool_size": 8,
+                "busy_timeout_ms": 5000,
+                "acquire_timeout": 30,
+                "cached_statements": 256
+            },
+            "tasks": {
+                "ttl_seconds": 3600,
+                "max_entries": 1000
+            },
+            "progress": {
+                "flush_interval_ms": 500,
+                "max_pending": 1000
+            },
+            "events": {
+                "max_queue": 100,
+                "max_projects": 1000,
+                "heartbeat_seconds": 15
+            },
+            "content_generation": {
+                "max_concurrency": 4,
+                "global_concurrency": 8,
+                "max_retries": 2,
+                "retry_backoff": 1.0,
+                "incremental": True
             },
             "server": {
                 "host": "0.0.0.0",
@@ -35,7 +59,85 @@ class ConfigManager:
                     "api_key": "",
                     "base_url": "https://api.deepseek.com/v1",
                     "model": "deepseek-chat"
-                }
+                },
+                "max_connections": 20,
+                "max_keepalive_connections": 10,
+                "keepalive_expiry": 30,
+                "connect_timeout": 10
+            },
+            "ai_cache": {
+                "enabled": True,
+                "memory_entries": 256,
+                "ttl_seconds": 604800,
+                "max_disk_bytes": 209715200
+            },
+            "llm_scheduler": {
+                "rpm": 60,
+                "tpm": 100000,
+                "max_queue": 200,
+                "max_retries": 4,
+                "base_delay": 1.0,
+                "max_delay": 30.0,
+                "acquire_timeout": 120.0
+            },
+            "bid_analysis": {
+                "pipeline": False,
+                "pipeline_sections": ["basic_info", "evaluation_criteria", "technical_requirements"]
+            },
+            "ocr": {
+                "max_workers": 0
+            },
+            "executors": {
+                "cpu_workers": 0,
+                "io_workers": 16,
+                "subprocess_workers": 2
+            },
+            "office": {
+                "workers": 2,
+                "job_timeout": 120.0,
+                "startup_timeout": 30.0,
+                "base_port": 2003,
+                "max_queue": 100,
+                "profile_root": ""
+            },
+            "artifact_cache": {
+                "enabled": True,
+                "root": "",
+                "max_bytes": 2147483648
+            },
+            "blob_store": {
+                "root": ""
+            },
+            "uploads": {
+                "chunk_size": 1048576,
+                "max_size_bytes": 2147483648,
+                "session_root": "",
+                "session_ttl_seconds": 86400
+            },
+            "encryption": {
+                "mode": "master",
+                "key_file": ""
+            },
+            "projects": {
+                "list_page_size": 50,
+                "list_max_limit": 200
+            },
+            "file_index": {
+                "reconcile_interval": 300,
+                "watch": False,
+                "max_watches": 200
+            },
+            "project_resolver": {
+                "max_entries": 1024,
+                "ttl_seconds": 300
+            },
+            "generation_context": {
+                "max_projects": 64
+            },
+            "document_export": {
+                "render_concurrency": 4,
+                "pdf_timeout": 600,
+                "table_of_contents": True
             }
         }
     
@@ -0,0 +1,269 @@
+"""
+SQLite连接池模块
+为Repository与各服务层提供共享的数据库连接，避免每次查询都重新建立连接
+- WAL日志模式 + synchronous=NORMAL，读写互不阻塞
+- busy_timeout 避免并发写入时立即报 "database is locked"
+- 借助 sqlite3 内置的语句缓存（cached_statements）复用预编译语句
+- 统计连接池命中、等待次数与等待时长
+- afetchone/afetchall/aexecute 在IO执行器中运行，供异步服务层调用
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from .config import get_config
+from .executors import run_io
+
+# 默认数据库路径（backend/ztbai.db），与各服务层历史路径保持一致
+DEFAULT_DB_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "ztbai.db")
+)
+
+
+class PoolTimeoutError(Exception):
+    """获取数据库连接超时"""
+
+
+class SQLiteConnectionPool:
+    """SQLite连接池（线程安全）"""
+
+    def __init__(self, db_path: str, pool_size: int = 8, busy_timeout_ms: int = 5000,
+                 acquire_timeout: float = 30.0, cached_statements: int = 256):
+        self.db_path = db_path
+        self.pool_size = max(1, int(pool_size))
+        self.busy_timeout_ms = int(busy_timeout_ms)
+        self.acquire_timeout = float(acquire_timeout)
+        self.cached_statements = int(cached_statements)
+
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+
+        # 统计信息
+        self._hits = 0
+        self._misses = 0
+        self._waits = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._timeouts = 0
+        self._in_use = 0
+
+    # ------------------ 连接管理 ------------------
+    def _create_connection(self) -> sqlite3.Connection:
+        """创建新连接并设置PRAGMA"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000.0,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        """从连接池获取连接"""
+        try:
+            conn = self._idle.get_nowait()
+            with self._lock:
+                self._hits += 1
+                self._in_use += 1
+            return conn
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.pool_size
+            if can_create:
+                self._created += 1
+                self._misses += 1
+                self._in_use += 1
+
+        if can_create:
+            try:
+                return self._create_connection()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                    self._in_use -= 1
+                raise
+
+        # 连接池已满，等待其他调用方归还连接
+        start = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeoutError(f"获取数据库连接超时（{self.acquire_timeout}s）: {self.db_path}")
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._waits += 1
+            self._wait_time_total += waited
+            self._wait_time_max = max(self._wait_time_max, waited)
+            self._in_use += 1
+        return conn
+
+    def release(self, conn: sqlite3.Connection, discard: bool = False) -> None:
+        """归还连接；discard=True 时直接关闭（例如连接已损坏）"""
+        with self._lock:
+            self._in_use -= 1
+        if discard:
+            with self._lock:
+                self._created -= 1
+            try:
+                conn.close()
+            except Exception:
+                pass
+            return
+        if conn.in_transaction:
+            # 调用方未提交的事务不能泄漏给下一个使用者
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        获取连接的上下文管理器
+        与 `with sqlite3.connect(...) as conn` 语义一致：正常退出时提交，异常时回滚
+        """
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except sqlite3.DatabaseError as e:
+            discard = not isinstance(e, (sqlite3.IntegrityError, sqlite3.OperationalError))
+            self._safe_rollback(conn)
+            raise
+        except BaseException:
+            self._safe_rollback(conn)
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    @staticmethod
+    def _safe_rollback(conn: sqlite3.Connection) -> None:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+
+    # ------------------ 便捷查询 ------------------
+    def fetchone(self, query: str, params: tuple = ()) -> Optional[sqlite3.Row]:
+        """执行查询并返回单行"""
+        with self.connection() as conn:
+            return conn.execute(query, params).fetchone()
+
+    def fetchall(self, query: str, params: tuple = ()) -> List[sqlite3.Row]:
+        """执行查询并返回全部结果"""
+        with self.connection() as conn:
+            return conn.execute(query, params).fetchall()
+
+    def execute(self, query: str, params: tuple = ()) -> int:
+        """执行写操作并提交，返回影响行数"""
+        with self.connection() as conn:
+            cursor = conn.execute(query, params)
+            return cursor.rowcount
+
+    def executescript(self, script: str) -> None:
+        """执行DDL脚本"""
+        with self.connection() as conn:
+            conn.executescript(script)
+
+    # ------------------ 异步查询（在IO执行器中执行，不阻塞事件循环） ------------------
+    async def afetchone(self, query: str, params: tuple = ()) -> Optional[sqlite3.Row]:
+        """异步执行查询并返回单行"""
+        return await run_io(self.fetchone, query, params)
+
+    async def afetchall(self, query: str, params: tuple = ()) -> List[sqlite3.Row]:
+        """异步执行查询并返回全部结果"""
+        return await run_io(self.fetchall, query, params)
+
+    async def aexecute(self, query: str, params: tuple = ()) -> int:
+        """异步执行写操作并提交"""
+        return await run_io(self.execute, query, params)
+
+    # ------------------ 统计与关闭 ------------------
+    def stats(self) -> Dict[str, Any]:
+        """连接池统计信息"""
+        with self._lock:
+            requests = self._hits + self._misses + self._waits
+            return {
+                "db_path": self.db_path,
+                "pool_size": self.pool_size,
+                "created": self._created,
+                "idle": self._idle.qsize(),
+                "in_use": self._in_use,
+                "hits": self._hits,
+                "misses": self._misses,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "hit_rate": round(self._hits / requests, 4) if requests else 0.0,
+                "wait_time_total_ms": round(self._wait_time_total * 1000, 2),
+                "wait_time_avg_ms": round(self._wait_time_total * 1000 / self._waits, 2) if self._waits else 0.0,
+                "wait_time_max_ms": round(self._wait_time_max * 1000, 2),
+            }
+
+    def close(self) -> None:
+        """关闭所有空闲连接"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._created -= 1
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+# 全局连接池（按数据库绝对路径区分）
+_pools: Dict[str, SQLiteConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_connection_pool(db_path: Optional[str] = None) -> SQLiteConnectionPool:
+    """获取指定数据库的共享连接池"""
+    key = os.path.abspath(str(db_path)) if db_path else DEFAULT_DB_PATH
+    pool = _pools.get(key)
+    if pool is not None:
+        return pool
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            config = get_config()
+            pool = SQLiteConnectionPool(
+                key,
+                pool_size=config.get("database.pool_size", 8),
+                busy_timeout_ms=config.get("database.busy_timeout_ms", 5000),
+                acquire_timeout=config.get("database.acquire_timeout", 30.0),
+                cached_statements=config.get("database.cached_statements", 256),
+            )
+            _pools[key] = pool
+        return pool
+
+
+def get_pool_stats() -> List[Dict[str, Any]]:
+    """获取所有连接池的统计信息"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [pool.stats() for pool in pools]
+
+
+def close_all_pools() -> None:
+    """关闭所有连接池（应用退出时调用）"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,163 @@
+"""
+进程内事件总线模块
+各步骤服务发布进度与状态变化，SSE 推送接口按项目订阅：
+- publish 线程安全，可在后台线程（如进度写入器）或事件循环中调用
+- 每个订阅者一个有界 asyncio.Queue，消费过慢时丢弃最旧的事件
+- 保留每个 (project_id, step_key) 的最新事件，新订阅者连接时先收到快照
+- 进程内组件可注册同步监听器（在发布线程中调用，须快速返回）
+"""
+
+import asyncio
+import itertools
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from .config import get_config
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """单个订阅者（绑定到创建它的事件循环）"""
+
+    def __init__(self, project_id: str, loop: asyncio.AbstractEventLoop, max_queue: int):
+        self.project_id = project_id
+        self.loop = loop
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def _put(self, event: Dict[str, Any]) -> None:
+        """在订阅者所在的事件循环中入队"""
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """等待下一个事件；超时返回 None"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventBus:
+    """按项目分发事件的发布/订阅总线"""
+
+    def __init__(self, max_queue: int = 100, max_projects: int = 1000):
+        self.max_queue = max(1, int(max_queue))
+        self.max_projects = max(1, int(max_projects))
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, List[Subscription]] = {}
+        # project_id -> {step_key: 最新事件}
+        self._latest: "OrderedDict[str, Dict[str, Dict[str, Any]]]" = OrderedDict()
+        self._seq = itertools.count(1)
+        self._published = 0
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+    def publish(self, project_id: Any, step_key: str, status: Optional[str] = None,
+                progress: Optional[int] = None, **fields: Any) -> Dict[str, Any]:
+        """发布一条步骤事件"""
+        project_id = str(project_id)
+        event = {
+            "id": next(self._seq),
+            "type": "step_progress",
+            "project_id": project_id,
+            "step_key": step_key,
+            "status": status,
+            "progress": progress,
+            "timestamp": datetime.now().isoformat(),
+        }
+        event.update({k: v for k, v in fields.items() if v is not None})
+
+        with self._lock:
+            self._published += 1
+            steps = self._latest.setdefault(project_id, {})
+            steps[step_key] = event
+            self._latest.move_to_end(project_id)
+            while len(self._latest) > self.max_projects:
+                self._latest.popitem(last=False)
+            subscribers = list(self._subscribers.get(project_id, ()))
+
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub._put, event)
+            except RuntimeError:
+                # 订阅者的事件循环已关闭
+                self.unsubscribe(sub)
+        for listener in list(self._listeners):
+            try:
+                listener(event)
+            except Exception as e:
+                logger.warning(f"事件监听器执行失败: {e}")
+        return event
+
+    def add_listener(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        """注册同步监听器，接收所有项目的事件"""
+        with self._lock:
+            if callback not in self._listeners:
+                self._listeners.append(callback)
+
+    def subscribe(self, project_id: Any) -> Subscription:
+        """订阅项目事件（须在事件循环中调用）"""
+        sub = Subscription(str(project_id), asyncio.get_running_loop(), self.max_queue)
+        with self._lock:
+            self._subscribers.setdefault(sub.project_id, []).append(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        """取消订阅"""
+        with self._lock:
+            subs = self._subscribers.get(sub.project_id)
+            if subs and sub in subs:
+                subs.remove(sub)
+                if not subs:
+                    del self._subscribers[sub.project_id]
+
+    def snapshot(self, project_id: Any) -> List[Dict[str, Any]]:
+        """获取项目各步骤的最新事件"""
+        with self._lock:
+            return list(self._latest.get(str(project_id), {}).values())
+
+    def stats(self) -> Dict[str, Any]:
+        """事件总线统计信息"""
+        with self._lock:
+            return {
+                "published": self._published,
+                "subscribers": sum(len(s) for s in self._subscribers.values()),
+                "projects_tracked": len(self._latest),
+            }
+
+
+# 全局事件总线实例
+_event_bus: Optional[EventBus] = None
+_event_bus_lock = threading.Lock()
+
+
+def get_event_bus() -> EventBus:
+    """获取事件总线实例"""
+    global _event_bus
+    if _event_bus is None:
+        with _event_bus_lock:
+            if _event_bus is None:
+                config = get_config()
+                _event_bus = EventBus(
+                    max_queue=config.get("events.max_queue", 100),
+                    max_projects=config.get("events.max_projects", 1000),
+                )
+    return _event_bus
+
+
+def publish_step_event(project_id: Any, step_key: str, status: Optional[str] = None,
+                       progress: Optional[int] = None, **fields: Any) -> None:
+    """发布步骤事件（发布失败不影响主流程）"""
+    try:
+        get_event_bus().publish(project_id, step_key, status, progress, **fields)
+    except Exception as e:
+        logger.warning(f"发布步骤事件失败: {e}")
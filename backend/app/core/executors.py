@@ -0,0 +1,206 @@
+"""
+执行器管理模块
+为异步服务层提供独立的执行器池，把阻塞操作移出事件循环：
+- cpu：进程池，用于哈希、加密等CPU密集型任务（任务函数须可pickle）
+- io：线程池，用于SQLite查询、文件复制、同步HTTP请求等阻塞IO
+- subprocess：线程池，用于LibreOffice等外部进程，容量单独限制，避免外部进程占满IO线程
+- 统计各池的排队长度、运行数、排队等待与执行耗时
+"""
+
+import asyncio
+import atexit
+import functools
+import logging
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from .config import get_config
+
+logger = logging.getLogger(__name__)
+
+POOL_NAMES = ("cpu", "io", "subprocess")
+
+
+class _PoolMetrics:
+    """单个执行器池的统计信息"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.queued = 0
+        self.running = 0
+        self.max_queued = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.run_total = 0.0
+        self.run_max = 0.0
+
+    def on_submit(self) -> None:
+        with self._lock:
+            self.submitted += 1
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+
+    def on_start(self, waited: float) -> None:
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def on_finish(self, elapsed: float, ok: bool) -> None:
+        with self._lock:
+            self.running -= 1
+            if ok:
+                self.completed += 1
+            else:
+                self.failed += 1
+            self.run_total += elapsed
+            self.run_max = max(self.run_max, elapsed)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            finished = self.completed + self.failed
+            started = finished + self.running
+            return {
+                "submitted": self.submitted,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "max_queued": self.max_queued,
+                "wait_time_avg_ms": round(self.wait_total * 1000 / started, 2) if started else 0.0,
+                "wait_time_max_ms": round(self.wait_max * 1000, 2),
+                "run_time_avg_ms": round(self.run_total * 1000 / finished, 2) if finished else 0.0,
+                "run_time_max_ms": round(self.run_max * 1000, 2),
+            }
+
+
+class ExecutorManager:
+    """按用途划分的执行器池集合"""
+
+    def __init__(self, cpu_workers: int = 0, io_workers: int = 16, subprocess_workers: int = 2):
+        cpu_count = os.cpu_count() or 2
+        self._sizes = {
+            "cpu": max(1, int(cpu_workers or cpu_count)),
+            "io": max(1, int(io_workers)),
+            "subprocess": max(1, int(subprocess_workers)),
+        }
+        self._executors: Dict[str, Executor] = {}
+        self._metrics: Dict[str, _PoolMetrics] = {name: _PoolMetrics() for name in POOL_NAMES}
+        self._lock = threading.Lock()
+
+    def executor(self, name: str) -> Executor:
+        """获取指定执行器池（按需创建）"""
+        if name not in self._sizes:
+            raise ValueError(f"未知的执行器池: {name}")
+        pool = self._executors.get(name)
+        if pool is None:
+            with self._lock:
+                pool = self._executors.get(name)
+                if pool is None:
+                    if name == "cpu":
+                        pool = ProcessPoolExecutor(max_workers=self._sizes[name])
+                    else:
+                        pool = ThreadPoolExecutor(max_workers=self._sizes[name], thread_name_prefix=f"ztb-{name}")
+                    self._executors[name] = pool
+        return pool
+
+    def submit(self, name: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """提交任务，返回 concurrent.futures.Future"""
+        metrics = self._metrics[name]
+        submitted_at = time.perf_counter()
+        metrics.on_submit()
+
+        if name == "cpu":
+            # 进程池中无法回调统计，开始时间按提交时间近似，耗时含排队
+            metrics.on_start(0.0)
+            future = self.executor(name).submit(fn, *args, **kwargs)
+            future.add_done_callback(
+                lambda f: metrics.on_finish(time.perf_counter() - submitted_at, f.exception() is None)
+            )
+            return future
+
+        def _run():
+            started_at = time.perf_counter()
+            metrics.on_start(started_at - submitted_at)
+            ok = False
+            try:
+                result = fn(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                metrics.on_finish(time.perf_counter() - started_at, ok)
+
+        return self.executor(name).submit(_run)
+
+    async def run(self, name: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """在指定执行器池中执行并等待结果"""
+        return await asyncio.wrap_future(self.submit(name, fn, *args, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        """各执行器池的统计信息"""
+        return {
+            name: dict(self._metrics[name].snapshot(), max_workers=self._sizes[name],
+                       started=name in self._executors)
+            for name in POOL_NAMES
+        }
+
+    def shutdown(self, wait: bool = False) -> None:
+        """关闭所有执行器池"""
+        with self._lock:
+            executors = list(self._executors.values())
+            self._executors.clear()
+        for pool in executors:
+            pool.shutdown(wait=wait)
+
+
+# 全局执行器管理实例
+_executor_manager: Optional[ExecutorManager] = None
+_executor_manager_lock = threading.Lock()
+
+
+def get_executor_manager() -> ExecutorManager:
+    """获取执行器管理实例"""
+    global _executor_manager
+    if _executor_manager is None:
+        with _executor_manager_lock:
+            if _executor_manager is None:
+                config = get_config()
+                _executor_manager = ExecutorManager(
+                    cpu_workers=config.get("executors.cpu_workers", 0),
+                    io_workers=config.get("executors.io_workers", 16),
+                    subprocess_workers=config.get("executors.subprocess_workers", 2),
+                )
+                atexit.register(_executor_manager.shutdown)
+    return _executor_manager
+
+
+async def run_io(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """在IO线程池中执行阻塞调用"""
+    return await get_executor_manager().run("io", fn, *args, **kwargs)
+
+
+async def run_cpu(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """在CPU进程池中执行计算密集型调用（fn 与参数须可pickle）"""
+    return await get_executor_manager().run("cpu", fn, *args, **kwargs)
+
+
+async def run_subprocess(cmd: List[str], timeout: Optional[float] = None,
+                         **kwargs: Any) -> subprocess.CompletedProcess:
+    """在子进程池中执行外部命令，异常语义与 subprocess.run 一致"""
+    kwargs.setdefault("capture_output", True)
+    return await get_executor_manager().run(
+        "subprocess", functools.partial(subprocess.run, cmd, timeout=timeout, **kwargs)
+    )
+
+
+def get_executor_stats() -> Dict[str, Any]:
+    """获取执行器统计信息"""
+    return get_executor_manager().stats()
@@ -0,0 +1,404 @@
+"""
+项目文件索引模块
+project_file_index 表记录各项目目录下文件的 (相对路径, 大小, 修改时间, 类型, SHA-256)，
+状态与文件列表接口直接查询索引，不再每次遍历磁盘：
+- 写入路径（创建项目、上传资料、保存分析结果）写完文件后登记
+- 步骤进入终态（产物生成、导出完成）时把项目标记为待核对，下次查询前扫描一次目录
+- 超过 file_index.reconcile_interval 秒未核对的项目在查询前重新核对，修正绕过写入路径的改动
+- 安装了 watchdog 且开启 file_index.watch 时监听项目目录（Linux 下为 inotify）实时更新索引
+以 "." 开头的文件和目录（临时文件、分页缓存等）不进入索引
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Union
+
+from .config import get_config
+from .connection_pool import get_connection_pool
+from .event_bus import get_event_bus
+from .progress_writer import TERMINAL_STATUSES
+from .project_resolver import get_project_resolver
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+    WATCHDOG_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+PathLike = Union[str, Path]
+
+FILE_INDEX_DDL = """
+    CREATE TABLE IF NOT EXISTS project_file_index (
+        project_id TEXT NOT NULL,
+        rel_path TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        mtime REAL NOT NULL,
+        file_type TEXT,
+        sha256 TEXT,
+        indexed_at TEXT NOT NULL,
+        PRIMARY KEY (project_id, rel_path)
+    );
+    CREATE TABLE IF NOT EXISTS project_file_index_state (
+        project_id TEXT PRIMARY KEY,
+        project_dir TEXT NOT NULL,
+        reconciled_at REAL NOT NULL
+    );
+"""
+
+# 大小与修改时间都未变化时保留已有的哈希
+UPSERT_SQL = """
+    INSERT INTO project_file_index (project_id, rel_path, size, mtime, file_type, sha256, indexed_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(project_id, rel_path) DO UPDATE SET
+        sha256 = COALESCE(excluded.sha256,
+                          CASE WHEN size = excluded.size AND mtime = excluded.mtime THEN sha256 END),
+        size = excluded.size,
+        mtime = excluded.mtime,
+        file_type = excluded.file_type,
+        indexed_at = excluded.indexed_at
+"""
+
+
+def _hidden(rel_path: str) -> bool:
+    return any(part.startswith(".") for part in rel_path.split("/"))
+
+
+def _row_to_file(row) -> Dict[str, Any]:
+    rel_path = row["rel_path"]
+    return {
+        "path": rel_path,
+        "name": rel_path.rsplit("/", 1)[-1],
+        "size": row["size"],
+        "modified_time": row["mtime"],
+        "extension": row["file_type"],
+        "sha256": row["sha256"],
+    }
+
+
+class _IndexEventHandler(FileSystemEventHandler):
+    """把目录变化同步到索引"""
+
+    def __init__(self, index: "ProjectFileIndex", project_id: str, project_dir: Path):
+        self.index = index
+        self.project_id = project_id
+        self.project_dir = project_dir
+
+    def _apply(self, path: str, is_directory: bool) -> None:
+        try:
+            if is_directory:
+                self.index.mark_stale(self.project_id)
+            elif os.path.isfile(path):
+                self.index.record(self.project_id, path, self.project_dir)
+            else:
+                self.index.remove(self.project_id, path, self.project_dir)
+        except Exception as e:
+            logger.debug(f"文件索引监听更新失败: {path} - {e}")
+
+    def on_created(self, event):
+        self._apply(event.src_path, event.is_directory)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self._apply(event.src_path, False)
+
+    def on_deleted(self, event):
+        self._apply(event.src_path, event.is_directory)
+
+    def on_moved(self, event):
+        self._apply(event.src_path, event.is_directory)
+        self._apply(event.dest_path, event.is_directory)
+
+
+class ProjectFileIndex:
+    """项目文件索引（同步接口，异步调用方在IO执行器中使用）"""
+
+    def __init__(self, db_path: Optional[str] = None, reconcile_interval: float = 300.0,
+                 watch: bool = False, max_watches: int = 200):
+        self.pool = get_connection_pool(db_path)
+        self.reconcile_interval = float(reconcile_interval)
+        self.watch_enabled = bool(watch) and WATCHDOG_AVAILABLE
+        self.max_watches = int(max_watches)
+        self._lock = threading.Lock()
+        self._project_locks: Dict[str, threading.Lock] = {}
+        self._stale: Set[str] = set()
+        self._observer = None
+        self._watches: Dict[str, Any] = {}
+
+        # 统计信息
+        self._queries = 0
+        self._reconciles = 0
+        self._recorded = 0
+
+        self.pool.executescript(FILE_INDEX_DDL)
+        get_event_bus().add_listener(self._on_step_event)
+        if watch and not WATCHDOG_AVAILABLE:
+            logger.info("未安装 watchdog，文件索引仅依靠写入登记与定期核对")
+
+    # ------------------ 路径 ------------------
+    def _project_dir(self, project_id: str, project_dir: Optional[PathLike]) -> Optional[Path]:
+        if project_dir:
+            return Path(project_dir)
+        project_path = get_project_resolver(self.pool.db_path).get_path(project_id)
+        return Path(project_path) if project_path else None
+
+    @staticmethod
+    def _rel_path(project_dir: Path, path: PathLike) -> str:
+        """转换为相对项目目录的路径；不在项目目录下的相对路径视为已是项目内相对路径"""
+        rel = os.path.relpath(os.path.abspath(path), os.path.abspath(project_dir))
+        if rel.startswith(".."):
+            if Path(path).is_absolute():
+                raise ValueError(f"文件不在项目目录下: {path}")
+            rel = str(path)
+        return Path(rel).as_posix()
+
+    def _project_lock(self, project_id: str) -> threading.Lock:
+        with self._lock:
+            return self._project_locks.setdefault(project_id, threading.Lock())
+
+    # ------------------ 写入 ------------------
+    def record(self, project_id: Any, path: PathLike, project_dir: Optional[PathLike] = None,
+               sha256: Optional[str] = None) -> None:
+        """登记单个文件（写入路径写完文件后调用）；文件不存在时从索引移除"""
+        project_id = str(project_id)
+        base = self._project_dir(project_id, project_dir)
+        if base is None:
+            return
+        rel_path = self._rel_path(base, path)
+        if _hidden(rel_path):
+            return
+        try:
+            st = (base / rel_path).stat()
+        except FileNotFoundError:
+            self.remove(project_id, rel_path, base)
+            return
+        self.pool.execute(UPSERT_SQL, (
+            project_id, rel_path, st.st_size, st.st_mtime, Path(rel_path).suffix.lower(),
+            sha256, datetime.now().isoformat()
+        ))
+        with self._lock:
+            self._recorded += 1
+
+    def remove(self, project_id: Any, path: PathLike, project_dir: Optional[PathLike] = None) -> None:
+        """从索引移除单个文件"""
+        project_id = str(project_id)
+        base = self._project_dir(project_id, project_dir)
+        if base is None:
+            return
+        self.pool.execute(
+            "DELETE FROM project_file_index WHERE project_id = ? AND rel_path = ?",
+            (project_id, self._rel_path(base, path))
+        )
+
+    def remove_project(self, project_id: Any) -> None:
+        """删除项目时清除其索引"""
+        project_id = str(project_id)
+        self.unwatch(project_id)
+        with self.pool.connection() as conn:
+            conn.execute("DELETE FROM project_file_index WHERE project_id = ?", (project_id,))
+            conn.execute("DELETE FROM project_file_index_state WHERE project_id = ?", (project_id,))
+        with self._lock:
+            self._stale.discard(project_id)
+            self._project_locks.pop(project_id, None)
+
+    def mark_stale(self, project_id: Any) -> None:
+        """标记项目需要在下次查询前重新核对"""
+        with self._lock:
+            self._stale.add(str(project_id))
+
+    def _on_step_event(self, event: Dict[str, Any]) -> None:
+        if event.get("status") in TERMINAL_STATUSES:
+            self.mark_stale(event["project_id"])
+
+    # ------------------ 核对 ------------------
+    def reconcile(self, project_id: Any, project_dir: Optional[PathLike] = None,
+                  subdir: str = "") -> Dict[str, int]:
+        """扫描项目目录（或其子目录），修正新增、修改和删除的文件"""
+        project_id = str(project_id)
+        base = self._project_dir(project_id, project_dir)
+        if base is None:
+            return {"added": 0, "updated": 0, "removed": 0, "files": 0}
+        prefix = subdir.strip("/") + "/" if subdir.strip("/") else ""
+
+        with self._project_lock(project_id):
+            on_disk: Dict[str, os.stat_result] = {}
+            root = base / prefix if prefix else base
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+                rel_dir = Path(dirpath).relative_to(base).as_posix()
+                for name in filenames:
+                    if name.startswith("."):
+                        continue
+                    rel_path = name if rel_dir == "." else f"{rel_dir}/{name}"
+                    try:
+                        on_disk[rel_path] = os.stat(os.path.join(dirpath, name))
+                    except FileNotFoundError:
+                        continue
+
+            indexed = {
+                row["rel_path"]: (row["size"], row["mtime"])
+                for row in self._select_prefix(project_id, prefix, "rel_path, size, mtime")
+            }
+            now = datetime.now().isoformat()
+            changed = [
+                (project_id, rel_path, st.st_size, st.st_mtime, Path(rel_path).suffix.lower(), None, now)
+                for rel_path, st in on_disk.items()
+                if indexed.get(rel_path) != (st.st_size, st.st_mtime)
+            ]
+            removed = [(project_id, rel_path) for rel_path in indexed if rel_path not in on_disk]
+            with self.pool.connection() as conn:
+                if changed:
+                    conn.executemany(UPSERT_SQL, changed)
+                if removed:
+                    conn.executemany(
+                        "DELETE FROM project_file_index WHERE project_id = ? AND rel_path = ?", removed
+                    )
+                if not prefix:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO project_file_index_state (project_id, project_dir, reconciled_at) "
+                        "VALUES (?, ?, ?)",
+                        (project_id, str(base), time.time())
+                    )
+            if not prefix:
+                with self._lock:
+                    self._stale.discard(project_id)
+
+        added = sum(1 for item in changed if item[1] not in indexed)
+        with self._lock:
+            self._reconciles += 1
+        if changed or removed:
+            logger.debug(f"文件索引核对 {project_id}: 新增 {added}，更新 {len(changed) - added}，删除 {len(removed)}")
+        return {"added": added, "updated": len(changed) - added, "removed": len(removed), "files": len(on_disk)}
+
+    def ensure_fresh(self, project_id: Any, project_dir: Optional[PathLike] = None) -> None:
+        """查询前调用：从未核对、被标记待核对或超过核对间隔时重新核对"""
+        project_id = str(project_id)
+        with self._lock:
+            stale = project_id in self._stale
+            watched = project_id in self._watches
+        if not stale:
+            row = self.pool.fetchone(
+                "SELECT reconciled_at FROM project_file_index_state WHERE project_id = ?", (project_id,)
+            )
+            if row is not None and (watched or time.time() - row["reconciled_at"] < self.reconcile_interval):
+                return
+        base = self._project_dir(project_id, project_dir)
+        if base is None or not base.exists():
+            return
+        self.reconcile(project_id, base)
+        self.watch(project_id, base)
+
+    # ------------------ 查询 ------------------
+    def _select_prefix(self, project_id: str, prefix: str, columns: str = "*", order: bool = True) -> list:
+        order_by = " ORDER BY rel_path" if order else ""
+        if prefix:
+            return self.pool.fetchall(
+                f"SELECT {columns} FROM project_file_index "
+                f"WHERE project_id = ? AND rel_path >= ? AND rel_path < ?{order_by}",
+                (project_id, prefix, prefix + "\U0010ffff")
+            )
+        return self.pool.fetchall(
+            f"SELECT {columns} FROM project_file_index WHERE project_id = ?{order_by}", (project_id,)
+        )
+
+    def list_files(self, project_id: Any, prefix: str = "", recursive: bool = True) -> List[Dict[str, Any]]:
+        """列出索引中的文件；prefix 为相对目录（如 "materials/"），recursive=False 时只列出该层文件"""
+        project_id = str(project_id)
+        with self._lock:
+            self._queries += 1
+        files = [_row_to_file(row) for row in self._select_prefix(project_id, prefix)]
+        if not recursive:
+            files = [f for f in files if "/" not in f["path"][len(prefix):]]
+        return files
+
+    def get_file(self, project_id: Any, rel_path: str) -> Optional[Dict[str, Any]]:
+        """查询单个文件，不存在返回 None"""
+        with self._lock:
+            self._queries += 1
+        row = self.pool.fetchone(
+            "SELECT * FROM project_file_index WHERE project_id = ? AND rel_path = ?", (str(project_id), rel_path)
+        )
+        return _row_to_file(row) if row else None
+
+    def count_files(self, project_id: Any, prefix: str = "") -> int:
+        """统计目录下的文件数"""
+        with self._lock:
+            self._queries += 1
+        return self._select_prefix(str(project_id), prefix, "COUNT(*)", order=False)[0][0]
+
+    # ------------------ 目录监听 ------------------
+    def watch(self, project_id: Any, project_dir: PathLike) -> bool:
+        """监听项目目录（需开启 file_index.watch 并安装 watchdog），返回是否处于监听中"""
+        if not self.watch_enabled:
+            return False
+        project_id = str(project_id)
+        with self._lock:
+            if project_id in self._watches:
+                return True
+            if len(self._watches) >= self.max_watches:
+                return False
+            try:
+                if self._observer is None:
+                    self._observer = Observer()
+                    self._observer.daemon = True
+                    self._observer.start()
+                handler = _IndexEventHandler(self, project_id, Path(project_dir))
+                self._watches[project_id] = self._observer.schedule(handler, str(project_dir), recursive=True)
+                return True
+            except Exception as e:
+                logger.warning(f"监听项目目录失败: {project_dir} - {e}")
+                return False
+
+    def unwatch(self, project_id: Any) -> None:
+        with self._lock:
+            watch = self._watches.pop(str(project_id), None)
+            if watch is not None and self._observer is not None:
+                try:
+                    self._observer.unschedule(watch)
+                except Exception:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        """索引统计信息"""
+        row = self.pool.fetchone(
+            "SELECT COUNT(*) AS files, COUNT(DISTINCT project_id) AS projects FROM project_file_index"
+        )
+        with self._lock:
+            return {
+                "files": row["files"],
+                "projects": row["projects"],
+                "queries": self._queries,
+                "reconciles": self._reconciles,
+                "recorded": self._recorded,
+                "stale_projects": len(self._stale),
+                "watching": len(self._watches),
+                "watch_available": WATCHDOG_AVAILABLE,
+            }
+
+
+# 全局索引实例
+_file_index: Optional[ProjectFileIndex] = None
+_file_index_lock = threading.Lock()
+
+
+def get_file_index() -> ProjectFileIndex:
+    """获取项目文件索引实例"""
+    global _file_index
+    if _file_index is None:
+        with _file_index_lock:
+            if _file_index is None:
+                config = get_config()
+                _file_index = ProjectFileIndex(
+                    reconcile_interval=config.get("file_index.reconcile_interval", 300),
+                    watch=config.get("file_index.watch", False),
+                    max_watches=config.get("file_index.max_watches", 200),
+                )
+    return _file_index
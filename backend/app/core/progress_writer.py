@@ -0,0 +1,287 @@
+"""
+步骤进度批量写入模块
+进度更新（project_step_progress / step_progress / project_progress / tasks）先进入内存缓冲区：
+- 同一键（如 project_id + step_key）在刷新窗口内的多次更新只保留最后一次
+- 后台线程按固定窗口在一个事务内批量写入
+- 终态（completed / error / failed / cancelled）立即刷新，保证结果及时落盘
+在事件循环线程中提交时，立即刷新与建表都交给IO线程池/刷新线程执行，不阻塞事件循环
+"""
+
+import asyncio
+import atexit
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from .config import get_config
+from .connection_pool import SQLiteConnectionPool
+from .event_bus import publish_step_event
+from .executors import get_executor_manager
+
+logger = logging.getLogger(__name__)
+
+
+def _on_event_loop() -> bool:
+    """当前线程是否正在运行事件循环"""
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+TERMINAL_STATUSES = ("completed", "error", "failed", "cancelled")
+
+# 各步骤服务共用的 step_progress 表结构
+STEP_PROGRESS_DDL = """
+    CREATE TABLE IF NOT EXISTS step_progress (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        project_id TEXT NOT NULL,
+        step_key TEXT NOT NULL,
+        status TEXT NOT NULL,
+        progress INTEGER DEFAULT 0,
+        result_data TEXT,
+        error_message TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(project_id, step_key)
+    )
+"""
+
+
+class ProgressWriter:
+    """合并并批量写入进度更新的后台写入器（线程安全）"""
+
+    def __init__(self, flush_interval: float = 0.5, max_pending: int = 1000):
+        self.flush_interval = max(0.01, float(flush_interval))
+        self.max_pending = max(1, int(max_pending))
+
+        # (db_path, key) -> (pool, sql, params)
+        self._pending: "OrderedDict[Tuple[str, Hashable], Tuple[SQLiteConnectionPool, str, tuple]]" = OrderedDict()
+        self._cond = threading.Condition()
+        # 串行化刷新，保证同一键的新旧写入顺序
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        self._initialized_tables: set = set()
+        # 已从缓冲区取出、正在写入数据库的键
+        self._in_flight: set = set()
+        # 事件循环中登记、待刷新时执行的建表语句：(db_path, 表名) -> (连接池, DDL)
+        self._pending_tables: Dict[Tuple[str, str], Tuple[SQLiteConnectionPool, str]] = {}
+
+        # 统计信息
+        self._submitted = 0
+        self._coalesced = 0
+        self._flushes = 0
+        self._written = 0
+        self._failed = 0
+        self._immediate = 0
+
+    # ------------------ 提交 ------------------
+    def submit(self, pool: SQLiteConnectionPool, key: Hashable, sql: str, params: tuple,
+               immediate: bool = False) -> None:
+        """
+        提交一条进度写入
+        key 相同的待写入语句会被新语句覆盖；immediate=True 时同步刷新全部缓冲
+        """
+        pending_key = (pool.db_path, key)
+        with self._cond:
+            if self._stopped:
+                immediate = True
+            self._submitted += 1
+            if pending_key in self._pending:
+                self._coalesced += 1
+                del self._pending[pending_key]
+            self._pending[pending_key] = (pool, sql, params)
+            overflow = len(self._pending) >= self.max_pending
+            if not immediate and not overflow:
+                self._ensure_thread()
+                self._cond.notify()
+                return
+            if immediate:
+                self._immediate += 1
+        if _on_event_loop():
+            try:
+                get_executor_manager().submit("io", self.flush)
+                return
+            except Exception as e:
+                logger.warning(f"提交进度刷新任务失败，改为同步刷新: {e}")
+        self.flush()
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="progress-writer", daemon=True)
+            self._thread.start()
+
+    # ------------------ 刷新 ------------------
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+            # 等待一个刷新窗口，合并窗口内的重复更新
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self) -> int:
+        """立即将缓冲区写入数据库，返回写入语句数"""
+        with self._flush_lock:
+            self._create_pending_tables()
+            with self._cond:
+                if not self._pending:
+                    return 0
+                batch = self._pending
+                self._pending = OrderedDict()
+                self._in_flight = set(batch)
+            try:
+                return self._write_batch(batch)
+            finally:
+                with self._cond:
+                    self._in_flight = set()
+
+    def _write_batch(self, batch: "OrderedDict[Tuple[str, Hashable], Tuple[SQLiteConnectionPool, str, tuple]]") -> int:
+        """在一个事务内写入一批语句（调用方持有刷新锁）"""
+        # 按数据库分组，每个数据库一个事务
+        groups: Dict[str, List[Tuple[Tuple[str, Hashable], SQLiteConnectionPool, str, tuple]]] = {}
+        for pending_key, (pool, sql, params) in batch.items():
+            groups.setdefault(pool.db_path, []).append((pending_key, pool, sql, params))
+
+        written = 0
+        for items in groups.values():
+            pool = items[0][1]
+            try:
+                with pool.connection() as conn:
+                    for _, _, sql, params in items:
+                        try:
+                            conn.execute(sql, params)
+                            written += 1
+                        except Exception as e:
+                            # 单条语句失败不影响同一批次的其他更新
+                            self._failed += 1
+                            logger.error(f"写入进度失败: {e}")
+            except Exception as e:
+                logger.error(f"批量写入进度失败，稍后重试: {e}")
+                with self._cond:
+                    # 未被新更新覆盖的条目放回缓冲区
+                    for pending_key, pool_, sql, params in items:
+                        self._pending.setdefault(pending_key, (pool_, sql, params))
+                    self._cond.notify()
+
+        with self._cond:
+            self._flushes += 1
+            self._written += written
+        return written
+
+    def flush_pending(self, pool: SQLiteConnectionPool, key: Hashable) -> None:
+        """若指定键仍在缓冲区中则立即刷新，保证随后的读取能看到最新状态"""
+        pending_key = (pool.db_path, key)
+        with self._cond:
+            pending = pending_key in self._pending
+            in_flight = pending_key in self._in_flight
+        if pending:
+            self.flush()
+        elif in_flight:
+            # 刷新线程已取出该键但尚未提交，等待本轮刷新结束（失败时条目已放回缓冲区）
+            with self._flush_lock:
+                pass
+            self.flush_pending(pool, key)
+
+    def ensure_table(self, pool: SQLiteConnectionPool, name: str, ddl: str) -> None:
+        """每个数据库只执行一次建表语句；在事件循环中只登记，由下一次刷新在写入前执行"""
+        marker = (pool.db_path, name)
+        if marker in self._initialized_tables:
+            return
+        if _on_event_loop():
+            with self._cond:
+                self._pending_tables.setdefault(marker, (pool, ddl))
+            return
+        pool.executescript(ddl)
+        self._initialized_tables.add(marker)
+
+    def _create_pending_tables(self) -> None:
+        """执行已登记的建表语句（调用方持有刷新锁）"""
+        with self._cond:
+            if not self._pending_tables:
+                return
+            pending = self._pending_tables
+            self._pending_tables = {}
+        for marker, (pool, ddl) in pending.items():
+            try:
+                pool.executescript(ddl)
+                self._initialized_tables.add(marker)
+            except Exception as e:
+                logger.error(f"创建进度表失败: {marker[1]}: {e}")
+                with self._cond:
+                    self._pending_tables.setdefault(marker, (pool, ddl))
+
+    def stop(self) -> None:
+        """停止后台线程并写入剩余更新（应用退出时调用）"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """写入器统计信息"""
+        with self._cond:
+            return {
+                "pending": len(self._pending),
+                "submitted": self._submitted,
+                "coalesced": self._coalesced,
+                "flushes": self._flushes,
+                "written": self._written,
+                "failed": self._failed,
+                "immediate_flushes": self._immediate,
+                "flush_interval_ms": int(self.flush_interval * 1000),
+            }
+
+
+# 全局进度写入器实例
+_progress_writer: Optional[ProgressWriter] = None
+_progress_writer_lock = threading.Lock()
+
+
+def get_progress_writer() -> ProgressWriter:
+    """获取进度写入器实例"""
+    global _progress_writer
+    if _progress_writer is None:
+        with _progress_writer_lock:
+            if _progress_writer is None:
+                config = get_config()
+                _progress_writer = ProgressWriter(
+                    flush_interval=config.get("progress.flush_interval_ms", 500) / 1000.0,
+                    max_pending=config.get("progress.max_pending", 1000),
+                )
+                atexit.register(_progress_writer.stop)
+    return _progress_writer
+
+
+def submit_step_progress(pool: SQLiteConnectionPool, project_id: str, step_key: str, status: str,
+                         progress: int, data: Optional[Dict[str, Any]] = None) -> None:
+    """写入 step_progress 表并推送步骤事件（各步骤服务共用）"""
+    writer = get_progress_writer()
+    writer.ensure_table(pool, "step_progress", STEP_PROGRESS_DDL)
+    result_json = json.dumps(data, ensure_ascii=False) if data else None
+    writer.submit(
+        pool,
+        ("step_progress", str(project_id), step_key),
+        """
+        INSERT OR REPLACE INTO step_progress
+        (project_id, step_key, status, progress, result_data, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        (project_id, step_key, status, progress, result_json, datetime.now().isoformat()),
+        immediate=status in TERMINAL_STATUSES,
+    )
+    publish_step_event(project_id, step_key, status, progress)
+
+
+def flush_step_progress(pool: SQLiteConnectionPool, project_id: str, step_key: str) -> None:
+    """读取 step_progress 前刷新该步骤尚未写入的更新"""
+    get_progress_writer().flush_pending(pool, ("step_progress", str(project_id), step_key))
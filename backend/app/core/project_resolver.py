@@ -0,0 +1,138 @@
+"""
+项目路径解析模块
+各服务统一通过本模块把项目ID解析为项目目录与基本信息：
+- 进程内 LRU 缓存 id -> {project_path, name, ...}，命中时不访问数据库
+- 项目更新、删除时由 ProjectService 调用 invalidate 使缓存失效
+- 条目超过 project_resolver.ttl_seconds 后重新查询，兜底其他进程对 projects 表的修改
+- 未找到的项目不缓存（项目可能随后被创建）
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .config import get_config
+from .connection_pool import DEFAULT_DB_PATH, get_connection_pool
+
+PROJECT_COLUMNS = "id, name, project_path, bid_file_name, user_phone, service_mode, status"
+
+
+class ProjectResolver:
+    """项目ID解析器（线程安全）"""
+
+    def __init__(self, db_path: Optional[str] = None, max_entries: int = 1024, ttl_seconds: float = 300.0):
+        self.pool = get_connection_pool(db_path)
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self._lock = threading.Lock()
+        # project_id -> (加载时间, 项目信息)
+        self._cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+        # 统计信息
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def _cached(self, project_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._cache.get(project_id)
+            if entry is not None and (self.ttl_seconds <= 0 or time.monotonic() - entry[0] < self.ttl_seconds):
+                self._cache.move_to_end(project_id)
+                self._hits += 1
+                return entry[1]
+            self._misses += 1
+            return None
+
+    def _store(self, project_id: str, row) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        project = dict(row)
+        with self._lock:
+            self._cache[project_id] = (time.monotonic(), project)
+            self._cache.move_to_end(project_id)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return project
+
+    # ------------------ 查询 ------------------
+    def get_project(self, project_id: Any) -> Optional[Dict[str, Any]]:
+        """获取项目基本信息，不存在返回 None"""
+        project_id = str(project_id)
+        project = self._cached(project_id)
+        if project is not None:
+            return project
+        row = self.pool.fetchone(f"SELECT {PROJECT_COLUMNS} FROM projects WHERE id = ?", (project_id,))
+        return self._store(project_id, row)
+
+    async def aget_project(self, project_id: Any) -> Optional[Dict[str, Any]]:
+        """异步获取项目基本信息（命中缓存时不切换线程）"""
+        project_id = str(project_id)
+        project = self._cached(project_id)
+        if project is not None:
+            return project
+        row = await self.pool.afetchone(f"SELECT {PROJECT_COLUMNS} FROM projects WHERE id = ?", (project_id,))
+        return self._store(project_id, row)
+
+    def get_path(self, project_id: Any) -> Optional[str]:
+        """获取项目目录，项目不存在或路径为空时返回 None"""
+        project = self.get_project(project_id)
+        return project["project_path"] if project and project["project_path"] else None
+
+    async def aget_path(self, project_id: Any) -> Optional[str]:
+        """异步获取项目目录"""
+        project = await self.aget_project(project_id)
+        return project["project_path"] if project and project["project_path"] else None
+
+    # ------------------ 失效 ------------------
+    def invalidate(self, project_id: Any) -> None:
+        """项目信息变化（更新、删除）后调用"""
+        with self._lock:
+            if self._cache.pop(str(project_id), None) is not None:
+                self._invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """解析器统计信息"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "cached": len(self._cache),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self._invalidations,
+            }
+
+
+# 每个数据库一个解析器实例
+_resolvers: Dict[str, ProjectResolver] = {}
+_resolvers_lock = threading.Lock()
+
+
+def get_project_resolver(db_path: Optional[str] = None) -> ProjectResolver:
+    """获取指定数据库（默认主库）的项目解析器"""
+    key = os.path.abspath(str(db_path)) if db_path else DEFAULT_DB_PATH
+    resolver = _resolvers.get(key)
+    if resolver is not None:
+        return resolver
+    with _resolvers_lock:
+        resolver = _resolvers.get(key)
+        if resolver is None:
+            config = get_config()
+            resolver = ProjectResolver(
+                key,
+                max_entries=config.get("project_resolver.max_entries", 1024),
+                ttl_seconds=config.get("project_resolver.ttl_seconds", 300),
+            )
+            _resolvers[key] = resolver
+        return resolver
+
+
+def get_project_path(project_id: Any) -> Optional[str]:
+    """根据项目ID获取项目目录（主库）"""
+    return get_project_resolver().get_path(project_id)
@@ -4,48 +4,39 @@
 """
 
 import sqlite3
-import os
 from typing import Optional, Dict, Any, List
 from abc import ABC, abstractmethod
 from datetime import datetime
 import json
 
+from .connection_pool import get_connection_pool, SQLiteConnectionPool
+from .progress_writer import get_progress_writer, TERMINAL_STATUSES
+from .event_bus import publish_step_event
+from .project_resolver import get_project_resolver
+
 
 class BaseRepository(ABC):
     """基础Repository抽象类"""
     
     def __init__(self, db_path: Optional[str] = None):
-        if db_path is None:
-            db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "ztbai.db")
-        self.db_path = db_path
+        self.pool: SQLiteConnectionPool = get_connection_pool(db_path)
+        self.db_path = self.pool.db_path
     
-    def get_connection(self) -> sqlite3.Connection:
-        """获取数据库连接"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+    def get_connection(self):
+        """获取数据库连接（连接池上下文管理器，退出时自动提交并归还连接）"""
+        return self.pool.connection()
     
     def execute_query(self, query: str, params: tuple = ()) -> List[sqlite3.Row]:
         """执行查询并返回结果"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            return cursor.fetchall()
+        return self.pool.fetchall(query, params)
     
     def execute_single(self, query: str, params: tuple = ()) -> Optional[sqlite3.Row]:
         """执行查询并返回单个结果"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            return cursor.fetchone()
+        return self.pool.fetchone(query, params)
     
     def execute_update(self, query: str, params: tuple = ()) -> int:
         """执行更新操作并返回影响的行数"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            conn.commit()
-            return cursor.rowcount
+        return self.pool.execute(query, params)
 
 
 class ProjectRepository(BaseRepository):
@@ -60,12 +51,8 @@ class ProjectRepository(BaseRepository):
         return dict(row) if row else None
     
     def get_project_path_by_id(self, project_id: str) -> Optional[str]:
-        """根据项目ID获取项目路径"""
-        row = self.execute_single(
-            "SELECT project_path FROM projects WHERE id = ?",
-            (project_id,)
-        )
-        return row['project_path'] if row and row['project_path'] else None
+        """根据项目ID获取项目路径（经共享的项目解析器缓存）"""
+        return get_project_resolver(self.db_path).get_path(project_id)
 
 
 class StepProgressRepository(BaseRepository):
@@ -73,6 +60,7 @@ class StepProgressRepository(BaseRepository):
     
     def get_step_progress(self, project_id: str, step_key: str) -> Optional[Dict[str, Any]]:
         """获取步骤进度"""
+        get_progress_writer().flush_pending(self.pool, ("project_step_progress", str(project_id), step_key))
         row = self.execute_single("""
             SELECT status, progress, started_at, completed_at, updated_at, task_id, error_message
             FROM project_step_progress
@@ -99,13 +87,16 @@ class StepProgressRepository(BaseRepository):
     def update_step_progress(self, project_id: str, step_key: str, step_name: str,
                            status: str, progress: int, data: Optional[Dict[str, Any]] = None,
                            task_id: Optional[str] = None, error_message: Optional[str] = None) -> bool:
-        """更新步骤进度"""
+        """
+        更新步骤进度
+        写入由进度写入器按 (project_id, step_key) 合并后批量提交，终态立即写入
+        """
         try:
             now = datetime.now().isoformat()
             data_json = json.dumps(data) if data else None
             
             # 使用 INSERT OR REPLACE 确保记录存在
-            self.execute_update("""
+            get_progress_writer().submit(self.pool, ("project_step_progress", str(project_id), step_key), """
                 INSERT OR REPLACE INTO project_step_progress
                 (project_id, step_key, step_name, status, progress, started_at, completed_at, updated_at, task_id, error_message)
                 VALUES (?, ?, ?, ?, ?,
@@ -117,7 +108,9 @@ class StepProgressRepository(BaseRepository):
                 project_id, step_key, now,  # started_at logic
                 status, now,  # completed_at logic
                 now, task_id, error_message
-            ))
+            ), immediate=status in TERMINAL_STATUSES)
+            publish_step_event(project_id, step_key, status, progress,
+                               step_name=step_name, task_id=task_id, error_message=error_message)
             
             return True
             
@@ -0,0 +1,403 @@
+"""
+任务注册表模块
+替代 shared_state.analysis_tasks 进程内字典：
+- 按 task_id 存储任务，附带 project_id、(project_id, idempotency_key) 二级索引
+- O(1) 获取项目最新任务 / 最新已完成任务
+- 已结束任务按 TTL + LRU 淘汰，运行中任务不会被淘汰
+- 状态、进度变化写透到 tasks 表；重启时未结束的任务已无后台协程，恢复后标记为中断（error）
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import get_config
+from .connection_pool import get_connection_pool, SQLiteConnectionPool
+from .progress_writer import get_progress_writer
+from .event_bus import publish_step_event
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("pending", "in_progress")
+FINISHED_STATUSES = ("completed", "failed", "error", "cancelled")
+
+# 重启时未结束任务的错误信息
+INTERRUPTED_MESSAGE = "服务重启，任务已中断，请重新执行"
+
+# 写透到数据库时需要的字段，其余字段（如 result）只保留在内存/payload 中
+_PERSISTED_FIELDS = ("status", "progress", "error_message")
+
+
+class TaskRegistry:
+    """带索引与淘汰策略的任务注册表（线程安全）"""
+
+    def __init__(self, pool: Optional[SQLiteConnectionPool] = None,
+                 ttl_seconds: float = 3600, max_entries: int = 1000,
+                 step_key: str = "bid-analysis"):
+        self.pool = pool or get_connection_pool()
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_entries = max(1, int(max_entries))
+        self.step_key = step_key
+
+        self._lock = threading.RLock()
+        # task_id -> task（按最近访问顺序排列，用于LRU淘汰）
+        self._tasks: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # project_id -> 按创建顺序排列的 task_id
+        self._by_project: Dict[str, "OrderedDict[str, None]"] = {}
+        # (project_id, idempotency_key) -> task_id
+        self._by_idempotency: Dict[Tuple[str, str], str] = {}
+        # project_id -> 最新已完成的 task_id
+        self._latest_completed: Dict[str, str] = {}
+        # task_id -> 结束时间（monotonic），用于TTL淘汰
+        self._finished_at: Dict[str, float] = {}
+        self._evicted = 0
+
+        self._init_table()
+        self._recover()
+
+    # ------------------ 数据库 ------------------
+    def _init_table(self) -> None:
+        """确保 tasks 表及索引存在"""
+        try:
+            self.pool.executescript("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    task_id TEXT NOT NULL,
+                    project_id TEXT NOT NULL,
+                    step_key TEXT NOT NULL,
+                    status TEXT,
+                    progress INTEGER DEFAULT 0,
+                    payload TEXT,
+                    error TEXT,
+                    started_at TEXT,
+                    updated_at TEXT,
+                    completed_at TEXT,
+                    cancelled_at TEXT,
+                    idempotency_key TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_tasks_task ON tasks(task_id, id);
+                CREATE INDEX IF NOT EXISTS idx_tasks_project_step ON tasks(project_id, step_key, status, id);
+            """)
+        except Exception as e:
+            logger.warning(f"初始化tasks表失败: {e}")
+
+    def _persist(self, task: Dict[str, Any]) -> None:
+        """
+        将任务快照写入 tasks 表（保留历史记录）
+        同一任务的中间进度由进度写入器合并，结束状态立即写入
+        """
+        now = datetime.now().isoformat()
+        status = task.get("status")
+        payload = {
+            "idempotency_key": task.get("idempotency_key"),
+            "trace_id": task.get("trace_id"),
+        }
+        if status == "completed" and task.get("result") is not None:
+            payload["result"] = task.get("result")
+        try:
+            payload_txt = json.dumps(payload, ensure_ascii=False, default=str)
+        except Exception:
+            payload_txt = None
+        try:
+            get_progress_writer().submit(
+                self.pool,
+                ("tasks", task["project_id"], task.get("step_key", self.step_key), task["id"]),
+                """
+                INSERT INTO tasks (task_id, project_id, step_key, status, progress, payload, error, started_at, updated_at, completed_at, cancelled_at, idempotency_key)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (task["id"], task["project_id"], task.get("step_key", self.step_key), status,
+                 int(task.get("progress") or 0), payload_txt, task.get("error_message"),
+                 task.get("start_time"), now,
+                 now if status == "completed" else None,
+                 now if status == "cancelled" else None,
+                 task.get("idempotency_key")),
+                immediate=status in FINISHED_STATUSES
+            )
+        except Exception as e:
+            logger.warning(f"写入任务记录失败: {task.get('id')}: {e}")
+
+    def _recover(self) -> None:
+        """
+        启动时从 tasks 表恢复未结束的任务
+        这些任务的后台协程已随进程退出，统一标记为 error 并写回数据库：
+        状态接口不会一直显示运行中，下次启动也不会再次恢复，且可按 TTL 淘汰
+        """
+        try:
+            rows = self.pool.fetchall(
+                """
+                SELECT t.* FROM tasks t
+                JOIN (SELECT task_id, MAX(id) AS max_id FROM tasks WHERE step_key = ? GROUP BY task_id) latest
+                  ON t.id = latest.max_id
+                WHERE t.status IN ('pending', 'in_progress')
+                ORDER BY t.id
+                """,
+                (self.step_key,)
+            )
+        except Exception as e:
+            logger.warning(f"恢复任务记录失败: {e}")
+            return
+
+        now = datetime.now().isoformat()
+        for row in rows:
+            payload = self._load_payload(row["payload"])
+            task = {
+                "id": row["task_id"],
+                "project_id": row["project_id"],
+                "step_key": row["step_key"],
+                "status": "error",
+                "progress": row["progress"] or 0,
+                "start_time": row["started_at"],
+                "end_time": now,
+                "error_message": INTERRUPTED_MESSAGE,
+                "idempotency_key": row["idempotency_key"],
+                "trace_id": payload.get("trace_id"),
+                # 恢复的任务没有对应的后台协程，仅用于状态展示
+                "recovered": True,
+            }
+            with self._lock:
+                self._index(task)
+            self._persist(task)
+            self._interrupt_step_progress(task)
+        if rows:
+            logger.info(f"从数据库恢复了 {len(rows)} 个未结束的任务，已标记为中断")
+
+    def _interrupt_step_progress(self, task: Dict[str, Any]) -> None:
+        """把被中断任务对应的 project_step_progress 运行中状态同步为 error（状态接口优先读取该表）"""
+        try:
+            self.pool.execute(
+                """
+                UPDATE project_step_progress SET status = 'error', error_message = ?, updated_at = ?
+                WHERE project_id = ? AND step_key = ? AND task_id = ? AND status = 'in_progress'
+                """,
+                (INTERRUPTED_MESSAGE, task["end_time"], task["project_id"], task["step_key"], task["id"])
+            )
+        except Exception as e:
+            # project_step_progress 表可能尚未创建
+            logger.debug(f"同步中断状态到 project_step_progress 失败: {e}")
+
+    @staticmethod
+    def _load_payload(payload_txt: Optional[str]) -> Dict[str, Any]:
+        if not payload_txt:
+            return {}
+        try:
+            payload = json.loads(payload_txt)
+            return payload if isinstance(payload, dict) else {}
+        except (TypeError, ValueError):
+            return {}
+
+    # ------------------ 索引维护 ------------------
+    def _index(self, task: Dict[str, Any]) -> None:
+        task_id = task["id"]
+        project_id = str(task["project_id"])
+        self._tasks[task_id] = task
+        self._tasks.move_to_end(task_id)
+        self._by_project.setdefault(project_id, OrderedDict())[task_id] = None
+        if task.get("idempotency_key"):
+            self._by_idempotency[(project_id, task["idempotency_key"])] = task_id
+        self._on_status_change(task)
+
+    def _on_status_change(self, task: Dict[str, Any]) -> None:
+        status = task.get("status")
+        if status in FINISHED_STATUSES:
+            self._finished_at.setdefault(task["id"], time.monotonic())
+            if status == "completed":
+                self._latest_completed[str(task["project_id"])] = task["id"]
+        else:
+            self._finished_at.pop(task["id"], None)
+
+    def _unindex(self, task_id: str) -> None:
+        task = self._tasks.pop(task_id, None)
+        self._finished_at.pop(task_id, None)
+        if not task:
+            return
+        project_id = str(task["project_id"])
+        project_tasks = self._by_project.get(project_id)
+        if project_tasks is not None:
+            project_tasks.pop(task_id, None)
+            if not project_tasks:
+                del self._by_project[project_id]
+        key = (project_id, task.get("idempotency_key"))
+        if self._by_idempotency.get(key) == task_id:
+            del self._by_idempotency[key]
+        if self._latest_completed.get(project_id) == task_id:
+            del self._latest_completed[project_id]
+
+    def _evict(self) -> None:
+        """淘汰过期或超出容量的已结束任务"""
+        if self.ttl_seconds > 0:
+            deadline = time.monotonic() - self.ttl_seconds
+            expired = []
+            # _finished_at 按结束时间顺序插入，遇到未过期的即可停止
+            for task_id, finished_at in self._finished_at.items():
+                if finished_at > deadline:
+                    break
+                expired.append(task_id)
+            for task_id in expired:
+                self._unindex(task_id)
+                self._evicted += 1
+
+        if len(self._tasks) > self.max_entries:
+            # 按LRU顺序淘汰已结束任务，运行中任务始终保留
+            for task_id in [tid for tid in self._tasks if tid in self._finished_at]:
+                if len(self._tasks) <= self.max_entries:
+                    break
+                self._unindex(task_id)
+                self._evicted += 1
+
+    # ------------------ 公共接口 ------------------
+    def create(self, project_id: str, idempotency_key: Optional[str] = None,
+               trace_id: Optional[str] = None, task_id: Optional[str] = None,
+               status: str = "in_progress", **fields: Any) -> Dict[str, Any]:
+        """创建任务并写透到数据库"""
+        task = {
+            "id": task_id or str(uuid.uuid4()),
+            "project_id": str(project_id),
+            "step_key": self.step_key,
+            "status": status,
+            "progress": 0,
+            "start_time": datetime.now().isoformat(),
+            "idempotency_key": idempotency_key,
+            "trace_id": trace_id,
+        }
+        task.update(fields)
+        with self._lock:
+            self._index(task)
+            self._evict()
+            snapshot = dict(task)
+        self._persist(snapshot)
+        return snapshot
+
+    def update(self, task_id: str, persist: bool = True, **fields: Any) -> Optional[Dict[str, Any]]:
+        """更新任务字段；状态/进度/错误变化时写透到数据库"""
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return None
+            changed = any(task.get(k) != v for k, v in fields.items() if k in _PERSISTED_FIELDS)
+            task.update(fields)
+            if fields.get("status") in FINISHED_STATUSES and "end_time" not in fields:
+                task.setdefault("end_time", datetime.now().isoformat())
+            if "status" in fields:
+                self._on_status_change(task)
+            self._tasks.move_to_end(task_id)
+            snapshot = dict(task)
+        if persist and changed:
+            self._persist(snapshot)
+            publish_step_event(snapshot["project_id"], snapshot.get("step_key", self.step_key),
+                               snapshot.get("status"), snapshot.get("progress"),
+                               task_id=task_id, error_message=snapshot.get("error_message"))
+        return snapshot
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """按 task_id 获取任务快照"""
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return None
+            self._tasks.move_to_end(task_id)
+            return dict(task)
+
+    def __contains__(self, task_id: str) -> bool:
+        with self._lock:
+            return task_id in self._tasks
+
+    def latest_for_project(self, project_id: str) -> Optional[Dict[str, Any]]:
+        """获取项目最新创建的任务"""
+        with self._lock:
+            project_tasks = self._by_project.get(str(project_id))
+            if not project_tasks:
+                return None
+            return dict(self._tasks[next(reversed(project_tasks))])
+
+    def latest_completed_for_project(self, project_id: str) -> Optional[Dict[str, Any]]:
+        """获取项目最新完成的任务；内存中已淘汰时回退到数据库"""
+        with self._lock:
+            task_id = self._latest_completed.get(str(project_id))
+            if task_id is not None:
+                return dict(self._tasks[task_id])
+
+        try:
+            row = self.pool.fetchone(
+                """
+                SELECT task_id, project_id, status, progress, payload, started_at, completed_at, idempotency_key
+                FROM tasks
+                WHERE project_id = ? AND step_key = ? AND status = 'completed'
+                ORDER BY id DESC LIMIT 1
+                """,
+                (str(project_id), self.step_key)
+            )
+        except Exception as e:
+            logger.warning(f"查询已完成任务失败: {e}")
+            return None
+        if not row:
+            return None
+        payload = self._load_payload(row["payload"])
+        return {
+            "id": row["task_id"],
+            "project_id": row["project_id"],
+            "status": row["status"],
+            "progress": row["progress"],
+            "start_time": row["started_at"],
+            "end_time": row["completed_at"],
+            "idempotency_key": row["idempotency_key"],
+            "result": payload.get("result"),
+        }
+
+    def find_active_by_idempotency(self, project_id: str, idempotency_key: str) -> Optional[Dict[str, Any]]:
+        """按幂等键查找仍在运行的任务（恢复的任务没有后台协程，不参与幂等匹配）"""
+        with self._lock:
+            task_id = self._by_idempotency.get((str(project_id), idempotency_key))
+            task = self._tasks.get(task_id) if task_id else None
+            if task and task.get("status") in ACTIVE_STATUSES and not task.get("recovered"):
+                return dict(task)
+            return None
+
+    def list_project_tasks(self, project_id: str) -> List[Dict[str, Any]]:
+        """列出项目在内存中的任务（按创建顺序）"""
+        with self._lock:
+            return [dict(self._tasks[tid]) for tid in self._by_project.get(str(project_id), ())]
+
+    def purge(self) -> int:
+        """主动执行一次淘汰，返回本次淘汰数量"""
+        with self._lock:
+            before = self._evicted
+            self._evict()
+            return self._evicted - before
+
+    def stats(self) -> Dict[str, Any]:
+        """注册表统计信息"""
+        with self._lock:
+            return {
+                "entries": len(self._tasks),
+                "active": len(self._tasks) - len(self._finished_at),
+                "finished": len(self._finished_at),
+                "projects": len(self._by_project),
+                "evicted": self._evicted,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+# 全局任务注册表实例
+_task_registry: Optional[TaskRegistry] = None
+_task_registry_lock = threading.Lock()
+
+
+def get_task_registry() -> TaskRegistry:
+    """获取任务注册表实例"""
+    global _task_registry
+    if _task_registry is None:
+        with _task_registry_lock:
+            if _task_registry is None:
+                config = get_config()
+                _task_registry = TaskRegistry(
+                    ttl_seconds=config.get("tasks.ttl_seconds", 3600),
+                    max_entries=config.get("tasks.max_entries", 1000),
+                )
+    return _task_registry
@@ -0,0 +1,273 @@
+"""
+AI响应缓存模块
+按 (model, system_prompt, prompt, temperature, max_tokens) 的哈希缓存大模型响应：
+- 内存层：有界LRU
+- 磁盘层：SQLite（ai_cache.db），支持TTL与总大小淘汰
+- 统计命中/未命中次数及节省的响应字节数
+事件循环中使用 aget/aset，磁盘读写在IO线程池中执行；超出容量时的淘汰在后台进行，不占用请求路径
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from ..core.config import get_config
+from ..core.connection_pool import get_connection_pool
+from ..core.executors import get_executor_manager, run_io
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "ai_cache.db")
+
+
+def make_cache_key(model: str, system_prompt: str, prompt: str, temperature: Any, max_tokens: Any) -> str:
+    """计算缓存键"""
+    raw = json.dumps(
+        [model, system_prompt, prompt, temperature, max_tokens],
+        ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AIResponseCache:
+    """两级（内存LRU + SQLite）AI响应缓存"""
+
+    def __init__(self, db_path: str = DEFAULT_CACHE_DB, memory_entries: int = 256,
+                 ttl_seconds: float = 7 * 24 * 3600, max_disk_bytes: int = 200 * 1024 * 1024):
+        self.memory_entries = max(0, int(memory_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_disk_bytes = int(max_disk_bytes)
+        self.pool = get_connection_pool(db_path)
+
+        self._lock = threading.Lock()
+        # key -> (created_at, response)
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._disk_bytes = 0
+        self._evicting = False
+
+        # 统计信息
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._evictions = 0
+        self._bytes_saved = 0
+
+        self._init_table()
+
+    def _init_table(self) -> None:
+        try:
+            self.pool.executescript("""
+                CREATE TABLE IF NOT EXISTS ai_response_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    model TEXT,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_ai_cache_access ON ai_response_cache(last_access);
+            """)
+            row = self.pool.fetchone("SELECT COALESCE(SUM(size), 0) FROM ai_response_cache")
+            self._disk_bytes = int(row[0]) if row else 0
+        except Exception as e:
+            logger.warning(f"初始化AI缓存表失败: {e}")
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - created_at > self.ttl_seconds
+
+    # ------------------ 读写 ------------------
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存，先查内存再查磁盘"""
+        now = time.time()
+        response = self._get_memory(key, now)
+        if response is not None:
+            return response
+        return self._get_disk(key, now)
+
+    async def aget(self, key: str) -> Optional[str]:
+        """异步读取缓存，内存未命中时在IO线程池中查询磁盘"""
+        now = time.time()
+        response = self._get_memory(key, now)
+        if response is not None:
+            return response
+        return await run_io(self._get_disk, key, now)
+
+    def _get_memory(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[0], now):
+                    self._memory.move_to_end(key)
+                    self._memory_hits += 1
+                    self._bytes_saved += len(entry[1].encode("utf-8"))
+                    return entry[1]
+                del self._memory[key]
+        return None
+
+    def _get_disk(self, key: str, now: float) -> Optional[str]:
+        try:
+            row = self.pool.fetchone(
+                "SELECT response, size, created_at FROM ai_response_cache WHERE cache_key = ?", (key,)
+            )
+            if row and not self._expired(row["created_at"], now):
+                self.pool.execute("UPDATE ai_response_cache SET last_access = ? WHERE cache_key = ?", (now, key))
+                with self._lock:
+                    self._disk_hits += 1
+                    self._bytes_saved += row["size"]
+                    self._remember(key, row["created_at"], row["response"])
+                return row["response"]
+            if row:
+                self._delete(key, row["size"])
+        except Exception as e:
+            logger.warning(f"读取AI缓存失败: {e}")
+
+        with self._lock:
+            self._misses += 1
+        return None
+
+    def set(self, key: str, response: str, model: str = "") -> None:
+        """写入缓存"""
+        if not response:
+            return
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._remember(key, now, response)
+            self._stores += 1
+        try:
+            with self.pool.connection() as conn:
+                old = conn.execute("SELECT size FROM ai_response_cache WHERE cache_key = ?", (key,)).fetchone()
+                conn.execute(
+                    """
+                    INSERT OR REPLACE INTO ai_response_cache (cache_key, model, response, size, created_at, last_access)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    (key, model, response, size, now, now)
+                )
+            with self._lock:
+                self._disk_bytes += size - (old["size"] if old else 0)
+            if self._disk_bytes > self.max_disk_bytes:
+                self._schedule_eviction()
+        except Exception as e:
+            logger.warning(f"写入AI缓存失败: {e}")
+
+    async def aset(self, key: str, response: str, model: str = "") -> None:
+        """异步写入缓存（在IO线程池中写磁盘）"""
+        await run_io(self.set, key, response, model)
+
+    def _remember(self, key: str, created_at: float, response: str) -> None:
+        """写入内存层（调用方持有锁）"""
+        if self.memory_entries <= 0:
+            return
+        self._memory[key] = (created_at, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _delete(self, key: str, size: int) -> None:
+        self.pool.execute("DELETE FROM ai_response_cache WHERE cache_key = ?", (key,))
+        with self._lock:
+            self._disk_bytes -= size
+            self._evictions += 1
+
+    # ------------------ 淘汰 ------------------
+    def _schedule_eviction(self) -> None:
+        """在IO线程池中后台淘汰，同一时间只运行一次"""
+        with self._lock:
+            if self._evicting:
+                return
+            self._evicting = True
+        try:
+            get_executor_manager().submit("io", self._run_eviction)
+        except Exception as e:
+            with self._lock:
+                self._evicting = False
+            logger.warning(f"提交AI缓存淘汰任务失败: {e}")
+
+    def _run_eviction(self) -> None:
+        try:
+            self._evict_disk()
+        finally:
+            with self._lock:
+                self._evicting = False
+
+    def _evict_disk(self) -> None:
+        """删除过期条目，并按最近访问时间淘汰到容量的 90%"""
+        try:
+            with self.pool.connection() as conn:
+                evicted = 0
+                if self.ttl_seconds > 0:
+                    evicted += conn.execute(
+                        "DELETE FROM ai_response_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+                    ).rowcount
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM ai_response_cache").fetchone()[0]
+                target = int(self.max_disk_bytes * 0.9)
+                if total > target:
+                    # 逐行读取最久未访问的条目，够数即停止，不整表加载
+                    cursor = conn.execute("SELECT cache_key, size FROM ai_response_cache ORDER BY last_access")
+                    victims = []
+                    for row in cursor:
+                        if total <= target:
+                            break
+                        victims.append((row["cache_key"],))
+                        total -= row["size"]
+                    cursor.close()
+                    conn.executemany("DELETE FROM ai_response_cache WHERE cache_key = ?", victims)
+                    evicted += len(victims)
+            with self._lock:
+                self._disk_bytes = int(total)
+                self._evictions += evicted
+            logger.info(f"AI缓存淘汰 {evicted} 条，当前磁盘占用 {total} 字节")
+        except Exception as e:
+            logger.warning(f"AI缓存淘汰失败: {e}")
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._memory.clear()
+            self._disk_bytes = 0
+        self.pool.execute("DELETE FROM ai_response_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        with self._lock:
+            hits = self._memory_hits + self._disk_hits
+            lookups = hits + self._misses
+            return {
+                "memory_hits": self._memory_hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "stores": self._stores,
+                "evictions": self._evictions,
+                "bytes_saved": self._bytes_saved,
+                "memory_entries": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+            }
+
+
+# 全局缓存实例
+_ai_cache: Optional[AIResponseCache] = None
+_ai_cache_lock = threading.Lock()
+
+
+def get_ai_cache() -> AIResponseCache:
+    """获取AI响应缓存实例"""
+    global _ai_cache
+    if _ai_cache is None:
+        with _ai_cache_lock:
+            if _ai_cache is None:
+                config = get_config()
+                _ai_cache = AIResponseCache(
+                    db_path=config.get("ai_cache.db_path", DEFAULT_CACHE_DB),
+                    memory_entries=config.get("ai_cache.memory_entries", 256),
+                    ttl_seconds=config.get("ai_cache.ttl_seconds", 7 * 24 * 3600),
+                    max_disk_bytes=config.get("ai_cache.max_disk_bytes", 200 * 1024 * 1024),
+                )
+    return _ai_cache
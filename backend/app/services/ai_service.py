@@ -2,23 +2,130 @@
 AI服务模块（方案A：接入真实大模型服务）
 - 支持 OpenAI/DeepSeek 兼容协议
 - 统一读取AI配置（优先级：环境变量 > ztbai_config.json > app/core/ai_config.json > core默认）
+- 客户端长期复用：基于 httpx 连接池保持长连接，避免每次调用重新握手
+- agenerate_content 为异步接口，generate_content 为兼容旧调用方的同步接口
+- astream_content 以流式方式逐段返回生成内容
+- 相同请求的响应走两级缓存（内存LRU + SQLite），调用时传 use_cache=False 可跳过
+- 实际请求经 LLMScheduler 统一限流、排队与重试，调用时可传 priority（interactive/normal/bulk）
 """
+import asyncio
 import json
 import logging
 import os
+import threading
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
 
 from ..core.config import get_config
+from .ai_cache import get_ai_cache, make_cache_key
+from .llm_scheduler import get_llm_scheduler
 
 try:
     # OpenAI 1.x 客户端，兼容 DeepSeek 的 OpenAI 协议
-    from openai import OpenAI
+    from openai import OpenAI, AsyncOpenAI
 except Exception:  # 库不存在或版本不兼容时的兜底导入
     OpenAI = None  # 运行时再检测
+    AsyncOpenAI = None
+
+try:
+    import httpx
+except Exception:  # openai 依赖 httpx，缺失时退回 openai 默认连接配置
+    httpx = None
 
 logger = logging.getLogger(__name__)
 
+# 未显式配置 timeout 时沿用 openai SDK 的默认读取超时（秒），长文本生成可能持续数分钟
+SDK_DEFAULT_TIMEOUT = 600.0
+
+# 进程级客户端缓存：(api_key, base_url, timeout) -> 客户端
+_sync_clients: Dict[Tuple[str, str, Optional[float]], Any] = {}
+# 异步客户端绑定事件循环：(api_key, base_url, timeout) -> (loop, 客户端)
+_async_clients: Dict[Tuple[str, str, Optional[float]], Tuple[asyncio.AbstractEventLoop, Any]] = {}
+_clients_lock = threading.Lock()
+
+
+def _http_pool_settings(timeout: Optional[float]) -> Dict[str, Any]:
+    """从配置读取连接池与超时参数"""
+    config = get_config()
+    return {
+        "max_connections": int(config.get("ai.max_connections", 20)),
+        "max_keepalive_connections": int(config.get("ai.max_keepalive_connections", 10)),
+        "keepalive_expiry": float(config.get("ai.keepalive_expiry", 30)),
+        "connect_timeout": float(config.get("ai.connect_timeout", 10)),
+        "timeout": SDK_DEFAULT_TIMEOUT if timeout is None else float(timeout),
+    }
+
+
+def _client_kwargs(api_key: str, base_url: str, timeout: Optional[float], async_client: bool) -> Dict[str, Any]:
+    """构造 OpenAI 客户端参数；重试由 LLMScheduler 统一处理"""
+    kwargs: Dict[str, Any] = {"api_key": api_key, "base_url": base_url, "max_retries": 0}
+    if httpx is None:
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        return kwargs
+    settings = _http_pool_settings(timeout)
+    # 客户端级 timeout 会覆盖 http_client 上的设置，两处保持一致
+    kwargs["timeout"] = httpx.Timeout(settings["timeout"], connect=settings["connect_timeout"])
+    http_client_cls = httpx.AsyncClient if async_client else httpx.Client
+    kwargs["http_client"] = http_client_cls(
+        limits=httpx.Limits(
+            max_connections=settings["max_connections"],
+            max_keepalive_connections=settings["max_keepalive_connections"],
+            keepalive_expiry=settings["keepalive_expiry"],
+        ),
+        timeout=kwargs["timeout"],
+    )
+    return kwargs
+
+
+def _get_sync_client(api_key: str, base_url: str, timeout: Optional[float]):
+    """获取（或创建）同步客户端"""
+    key = (api_key, base_url, timeout)
+    client = _sync_clients.get(key)
+    if client is not None:
+        return client
+    with _clients_lock:
+        client = _sync_clients.get(key)
+        if client is None:
+            client = OpenAI(**_client_kwargs(api_key, base_url, timeout, async_client=False))
+            _sync_clients[key] = client
+        return client
+
+
+def _get_async_client(api_key: str, base_url: str, timeout: Optional[float]):
+    """获取（或创建）异步客户端；httpx 异步连接绑定事件循环，循环变化时重新创建"""
+    key = (api_key, base_url, timeout)
+    loop = asyncio.get_running_loop()
+    cached = _async_clients.get(key)
+    if cached is not None and cached[0] is loop:
+        return cached[1]
+    with _clients_lock:
+        cached = _async_clients.get(key)
+        if cached is not None and cached[0] is loop:
+            return cached[1]
+        client = AsyncOpenAI(**_client_kwargs(api_key, base_url, timeout, async_client=True))
+        _async_clients[key] = (loop, client)
+        return client
+
+
+async def aclose_clients() -> None:
+    """关闭缓存的AI客户端（应用关闭时调用）"""
+    with _clients_lock:
+        sync_clients = list(_sync_clients.values())
+        async_clients = [c for _, c in _async_clients.values()]
+        _sync_clients.clear()
+        _async_clients.clear()
+    for client in sync_clients:
+        try:
+            client.close()
+        except Exception:
+            pass
+    for client in async_clients:
+        try:
+            await client.close()
+        except Exception:
+            pass
+
 
 class AIService:
     def __init__(self):
@@ -39,7 +146,6 @@ class AIService:
                 "model": "deepseek-chat",
                 "max_tokens": 4000,
                 "temperature": 0.7,
-                "timeout": 30,
                 "enabled": True,
             }
         }
@@ -90,10 +196,8 @@ class AIService:
         return enabled and bool(cfg.get("api_key"))
 
     # ------------------ 内容生成 ------------------
-    def generate_content(self, prompt: str, provider: str = "deepseek", **kwargs) -> str:
-        """调用真实大模型生成内容。
-        - provider: 默认 deepseek（OpenAI 协议兼容）
-        """
+    def _prepare_request(self, prompt: str, provider: str, **kwargs) -> Tuple[Tuple[str, str, Optional[float]], Dict[str, Any]]:
+        """校验配置并构造 (客户端参数, Chat Completions 请求参数)"""
         cfg = self._get_provider_config(provider)
         if not cfg.get("api_key"):
             raise Exception("AI服务未配置 API Key，请在 ztbai_config.json 或 app/core/ai_config.json 中填写 deepseek.api_key")
@@ -103,27 +207,157 @@ class AIService:
         base_url = cfg.get("base_url") or "https://api.deepseek.com/v1"
         if not base_url.rstrip("/").endswith("/v1"):
             base_url = base_url.rstrip("/") + "/v1"
-        client = OpenAI(api_key=cfg["api_key"], base_url=base_url)
+        # 仅在调用方或配置文件显式指定时设置读取超时，否则使用 SDK 默认值
+        timeout = kwargs.get("timeout", cfg.get("timeout"))
+        timeout = float(timeout) if timeout is not None else None
         model = cfg.get("model", "deepseek-chat")
         temperature = kwargs.get("temperature", cfg.get("temperature", 0.7))
         max_tokens = kwargs.get("max_tokens", cfg.get("max_tokens", 4000))
         system_prompt = kwargs.get("system_prompt", "你是专业的投标分析/策略专家，严格按规范输出。")
 
-        # 以 OpenAI Chat Completions 形式调用
-        resp = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=temperature,
-            max_tokens=max_tokens,
+        messages: List[Dict[str, str]] = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt},
+        ]
+        request = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }
+        return (cfg["api_key"], base_url, timeout), request
+
+    @staticmethod
+    def _cache_key(request: Dict[str, Any]) -> str:
+        messages = request["messages"]
+        return make_cache_key(
+            request["model"], messages[0]["content"], messages[1]["content"],
+            request["temperature"], request["max_tokens"]
         )
+
+    def _cache_enabled(self, use_cache: bool) -> bool:
+        return use_cache and bool(get_config().get("ai_cache.enabled", True))
+
+    @staticmethod
+    def _estimate_tokens(request: Dict[str, Any]) -> int:
+        prompt = "".join(m["content"] for m in request["messages"])
+        return get_llm_scheduler().estimate_tokens(prompt, request["max_tokens"])
+
+    @staticmethod
+    def _record_usage(resp: Any, estimated: int) -> None:
+        usage = getattr(resp, "usage", None)
+        total = getattr(usage, "total_tokens", None) if usage is not None else None
+        get_llm_scheduler().record_usage(estimated, total)
+
+    @staticmethod
+    def _extract_content(resp: Any) -> str:
         content = (resp.choices[0].message.content or "").strip()
         if not content:
             raise Exception("模型返回空内容")
         return content
 
+    async def agenerate_content(self, prompt: str, provider: str = "deepseek", **kwargs) -> str:
+        """异步调用真实大模型生成内容（复用长连接，不阻塞事件循环）。
+        - provider: 默认 deepseek（OpenAI 协议兼容）
+        """
+        use_cache = self._cache_enabled(kwargs.pop("use_cache", True))
+        priority = kwargs.pop("priority", "normal")
+        client_args, request = self._prepare_request(prompt, provider, **kwargs)
+        cache_key = self._cache_key(request) if use_cache else None
+        if cache_key:
+            cached = await get_ai_cache().aget(cache_key)
+            if cached is not None:
+                return cached
+
+        if AsyncOpenAI is None:
+            raise Exception("openai 库未安装或版本不兼容，请按 requirements.txt 安装依赖")
+        client = _get_async_client(*client_args)
+
+        # 以 OpenAI Chat Completions 形式调用（经调度器限流与重试）
+        estimated = self._estimate_tokens(request)
+        resp = await get_llm_scheduler().acall(
+            lambda: client.chat.completions.create(**request), priority=priority, tokens=estimated
+        )
+        self._record_usage(resp, estimated)
+        content = self._extract_content(resp)
+        if cache_key:
+            await get_ai_cache().aset(cache_key, content, request["model"])
+        return content
+
+    async def astream_content(self, prompt: str, provider: str = "deepseek", **kwargs) -> AsyncIterator[str]:
+        """流式调用大模型，逐段产出增量文本（stream=True）。
+        - 命中缓存时一次性产出完整内容
+        - 完整内容在流结束后写入缓存
+        """
+        use_cache = self._cache_enabled(kwargs.pop("use_cache", True))
+        priority = kwargs.pop("priority", "normal")
+        client_args, request = self._prepare_request(prompt, provider, **kwargs)
+        cache_key = self._cache_key(request) if use_cache else None
+        if cache_key:
+            cached = await get_ai_cache().aget(cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+        if AsyncOpenAI is None:
+            raise Exception("openai 库未安装或版本不兼容，请按 requirements.txt 安装依赖")
+        client = _get_async_client(*client_args)
+
+        parts: List[str] = []
+        # 建立流式连接阶段经调度器限流与重试，开始输出后不再重试
+        stream = await get_llm_scheduler().acall(
+            lambda: client.chat.completions.create(stream=True, **request),
+            priority=priority, tokens=self._estimate_tokens(request)
+        )
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content or ""
+            if delta:
+                parts.append(delta)
+                yield delta
+
+        content = "".join(parts).strip()
+        if not content:
+            raise Exception("模型返回空内容")
+        if cache_key:
+            await get_ai_cache().aset(cache_key, content, request["model"])
+
+    def generate_content(self, prompt: str, provider: str = "deepseek", **kwargs) -> str:
+        """调用真实大模型生成内容（同步接口，供旧调用方使用）。
+        - provider: 默认 deepseek（OpenAI 协议兼容）
+        - 在事件循环中请使用 agenerate_content
+        """
+        use_cache = self._cache_enabled(kwargs.pop("use_cache", True))
+        priority = kwargs.pop("priority", "normal")
+        client_args, request = self._prepare_request(prompt, provider, **kwargs)
+        cache_key = self._cache_key(request) if use_cache else None
+        if cache_key:
+            cached = get_ai_cache().get(cache_key)
+            if cached is not None:
+                return cached
+
+        client = _get_sync_client(*client_args)
+
+        # 以 OpenAI Chat Completions 形式调用（经调度器限流与重试）
+        estimated = self._estimate_tokens(request)
+        resp = get_llm_scheduler().call(
+            lambda: client.chat.completions.create(**request), priority=priority, tokens=estimated
+        )
+        self._record_usage(resp, estimated)
+        content = self._extract_content(resp)
+        if cache_key:
+            get_ai_cache().set(cache_key, content, request["model"])
+        return content
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """AI响应缓存统计"""
+        return get_ai_cache().stats()
+
+    def get_scheduler_stats(self) -> Dict[str, Any]:
+        """大模型请求调度统计（队列深度、等待时长等）"""
+        return get_llm_scheduler().stats()
+
     # ------------------ 其他 ------------------
     def validate_file(self, file_path: str) -> Dict[str, Any]:
         """验证文件（占位逻辑）"""
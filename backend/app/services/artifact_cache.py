@@ -0,0 +1,278 @@
+"""
+处理产物缓存模块
+按 (源文件内容SHA-256, 处理阶段, 阶段版本, 参数变体) 缓存文件格式化各阶段的输出：
+- 每个条目保存该阶段生成的文件及结果数据（结果中的项目路径以占位符保存，可在任意项目目录还原）
+- 命中时以硬链接方式放入项目目录（跨文件系统等无法硬链接时退回复制）
+- 阶段重新计算前先断开项目内输出文件的硬链接，避免原地写入污染缓存
+- 超出容量时按最近使用时间淘汰；条目大小在写入时记录到清单，进程内维护总占用，
+  只有总占用超出上限时才扫描各条目清单
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from ..core.config import get_config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "artifact_cache")
+
+# 各阶段的实现版本，阶段逻辑变化时递增即可让旧缓存失效
+STAGE_VERSIONS = {
+    "detect": 1,
+    "clean": 1,
+    "extract": 1,
+    "ocr": 1,
+    "html": 1,
+}
+
+PROJECT_DIR_PLACEHOLDER = "${PROJECT_DIR}"
+MANIFEST_NAME = "manifest.json"
+
+
+def file_sha256(path: Path) -> str:
+    """计算文件内容的SHA-256"""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _relocate(value: Any, old: str, new: str) -> Any:
+    """递归替换结果数据中以 old 开头的路径前缀"""
+    if isinstance(value, str):
+        return new + value[len(old):] if value.startswith(old) else value
+    if isinstance(value, dict):
+        return {k: _relocate(v, old, new) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_relocate(v, old, new) for v in value]
+    return value
+
+
+def _match_outputs(base_dir: Path, patterns: List[str]) -> List[Path]:
+    files = []
+    for pattern in patterns:
+        files.extend(p for p in base_dir.glob(pattern) if p.is_file())
+    return files
+
+
+def _entry_size(entry_dir: Path) -> int:
+    """条目占用字节数：优先读取清单中记录的大小，旧清单退回统计目录"""
+    try:
+        size = json.loads((entry_dir / MANIFEST_NAME).read_text(encoding="utf-8")).get("size")
+        if isinstance(size, int):
+            return size
+    except FileNotFoundError:
+        return 0
+    except Exception:
+        pass
+    return sum(p.stat().st_size for p in entry_dir.rglob("*") if p.is_file())
+
+
+def _link_or_copy(src: Path, dst: Path) -> bool:
+    """硬链接 src 到 dst，失败时复制；返回是否为硬链接"""
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(src, dst)
+        return True
+    except OSError:
+        shutil.copy2(src, dst)
+        return False
+
+
+class ArtifactCache:
+    """文件格式化阶段产物缓存（同步接口，调用方在IO执行器中使用）"""
+
+    def __init__(self, root: str = DEFAULT_CACHE_ROOT, enabled: bool = True, max_bytes: int = 2 * 1024 ** 3):
+        self.root = Path(root)
+        self.enabled = bool(enabled)
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        # 缓存总占用（字节），首次需要时扫描一次，之后随写入与淘汰增减
+        self._total_bytes: Optional[int] = None
+
+        # 统计信息
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._linked_files = 0
+        self._copied_files = 0
+        self._evictions = 0
+
+    def _entry_dir(self, source_hash: str, stage: str, variant: str = "") -> Path:
+        version = STAGE_VERSIONS.get(stage, 1)
+        suffix = hashlib.sha1(variant.encode("utf-8")).hexdigest()[:8] if variant else "default"
+        return self.root / source_hash[:2] / source_hash / f"{stage}-v{version}-{suffix}"
+
+    # ------------------ 读取 ------------------
+    def lookup(self, source_hash: str, stage: str, variant: str = "") -> Optional[Dict[str, Any]]:
+        """查找缓存条目，返回清单（含 dir 字段）；未命中返回 None"""
+        if not self.enabled:
+            return None
+        entry_dir = self._entry_dir(source_hash, stage, variant)
+        manifest_file = entry_dir / MANIFEST_NAME
+        try:
+            manifest = json.loads(manifest_file.read_text(encoding="utf-8"))
+            if all((entry_dir / "files" / rel).is_file() for rel in manifest.get("files", [])):
+                os.utime(manifest_file)
+                manifest["dir"] = str(entry_dir)
+                with self._lock:
+                    self._hits += 1
+                return manifest
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"读取产物缓存失败: {entry_dir} - {e}")
+        with self._lock:
+            self._misses += 1
+        return None
+
+    def materialize(self, entry: Dict[str, Any], base_dir: Path, patterns: List[str]) -> Dict[str, Any]:
+        """将缓存文件链接到项目目录（先清除旧的同阶段输出），返回还原路径后的结果数据"""
+        base_dir = Path(base_dir)
+        for stale in _match_outputs(base_dir, patterns):
+            stale.unlink()
+        files_dir = Path(entry["dir"]) / "files"
+        linked = copied = 0
+        for rel in entry.get("files", []):
+            if _link_or_copy(files_dir / rel, base_dir / rel):
+                linked += 1
+            else:
+                copied += 1
+        with self._lock:
+            self._linked_files += linked
+            self._copied_files += copied
+        return _relocate(entry.get("result") or {}, PROJECT_DIR_PLACEHOLDER, str(base_dir))
+
+    # ------------------ 写入 ------------------
+    def detach(self, base_dir: Path, patterns: List[str]) -> None:
+        """阶段重新计算前断开输出文件与缓存的硬链接"""
+        for path in _match_outputs(Path(base_dir), patterns):
+            try:
+                if path.stat().st_nlink > 1:
+                    path.unlink()
+            except OSError:
+                pass
+
+    def store(self, source_hash: str, stage: str, base_dir: Path, patterns: List[str],
+              result: Optional[Dict[str, Any]] = None, variant: str = "") -> None:
+        """保存阶段输出（复制到缓存目录，与项目文件互不影响）"""
+        if not self.enabled:
+            return
+        base_dir = Path(base_dir)
+        entry_dir = self._entry_dir(source_hash, stage, variant)
+        tmp_dir = entry_dir.with_name(f".{entry_dir.name}.{uuid.uuid4().hex[:8]}")
+        try:
+            files = []
+            size = 0
+            for path in _match_outputs(base_dir, patterns):
+                rel = path.relative_to(base_dir).as_posix()
+                target = tmp_dir / "files" / rel
+                target.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(path, target)
+                files.append(rel)
+                size += target.stat().st_size
+            tmp_dir.mkdir(parents=True, exist_ok=True)
+            manifest = {
+                "stage": stage,
+                "version": STAGE_VERSIONS.get(stage, 1),
+                "variant": variant,
+                "source_sha256": source_hash,
+                "created_at": time.time(),
+                "files": files,
+                "result": _relocate(result or {}, str(base_dir), PROJECT_DIR_PLACEHOLDER),
+            }
+            manifest_text = json.dumps(manifest, ensure_ascii=False, indent=2, default=str)
+            # 清单本身也计入条目大小
+            manifest["size"] = size + len(manifest_text.encode("utf-8"))
+            (tmp_dir / MANIFEST_NAME).write_text(
+                json.dumps(manifest, ensure_ascii=False, indent=2, default=str), encoding="utf-8"
+            )
+            replaced = _entry_size(entry_dir)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(tmp_dir, entry_dir)
+            with self._lock:
+                self._stores += 1
+                if self._total_bytes is not None:
+                    self._total_bytes += manifest["size"] - replaced
+        except Exception as e:
+            logger.warning(f"写入产物缓存失败: {stage} - {e}")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+        with self._lock:
+            total = self._total_bytes
+        if total is None or total > self.max_bytes:
+            self.prune()
+
+    # ------------------ 淘汰 ------------------
+    def prune(self) -> None:
+        """总大小超出上限时按最近使用时间淘汰条目"""
+        if self.max_bytes <= 0 or not self.root.exists():
+            return
+        entries = []
+        total = 0
+        for manifest_file in self.root.glob(f"*/*/*/{MANIFEST_NAME}"):
+            entry_dir = manifest_file.parent
+            size = _entry_size(entry_dir)
+            entries.append((manifest_file.stat().st_mtime, size, entry_dir))
+            total += size
+        if total <= self.max_bytes:
+            with self._lock:
+                self._total_bytes = total
+            return
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        for _, size, entry_dir in sorted(entries, key=lambda e: e[0]):
+            if total <= target:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._evictions += evicted
+            self._total_bytes = total
+        logger.info(f"产物缓存淘汰 {evicted} 个条目，当前占用 {total} 字节")
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "stores": self._stores,
+                "linked_files": self._linked_files,
+                "copied_files": self._copied_files,
+                "evictions": self._evictions,
+            }
+
+
+# 全局缓存实例
+_artifact_cache: Optional[ArtifactCache] = None
+_artifact_cache_lock = threading.Lock()
+
+
+def get_artifact_cache() -> ArtifactCache:
+    """获取产物缓存实例"""
+    global _artifact_cache
+    if _artifact_cache is None:
+        with _artifact_cache_lock:
+            if _artifact_cache is None:
+                config = get_config()
+                _artifact_cache = ArtifactCache(
+                    root=config.get("artifact_cache.root") or DEFAULT_CACHE_ROOT,
+                    enabled=config.get("artifact_cache.enabled", True),
+                    max_bytes=config.get("artifact_cache.max_bytes", 2 * 1024 ** 3),
+                )
+    return _artifact_cache
@@ -2,8 +2,7 @@ import time
 import os
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, Optional
-import uuid
+from typing import Dict, Any, List, Optional, Tuple
 import asyncio
 import logging
 import traceback
@@ -11,14 +10,15 @@ import traceback
 from Agent.base.agent_manager import AgentManager
 from Agent.base.base_agent import AgentConfig
 from app.core.response import create_error_response
-from app.shared_state import analysis_tasks
 from backend.app.utils import (
     find_bid_file_in_project,
     save_analysis_results,
-    upsert_task_record,
     get_project_path_by_id,
 )
+from ..core.config import get_config
+from ..core.executors import run_io
 from ..core.repository import StepProgressRepository, ProjectRepository
+from ..core.task_registry import get_task_registry
 
 logger = logging.getLogger(__name__)
 
@@ -30,16 +30,29 @@ FAST_MODE = os.getenv("ZTBAI_FAST_MODE", "false").lower() == "true"
 # 快速模式开关（用于开发和测试环境）
 FAST_MODE = os.getenv("ZTBAI_FAST_MODE", "false").lower() == "true"
 
+# 流水线模式下相互独立、可并发分析的章节
+PIPELINE_SECTIONS = ("basic_info", "evaluation_criteria", "technical_requirements")
+
+
+class SectionModeUnsupported(Exception):
+    """分析Agent未按章节返回结果（不支持 analysis_section 参数）"""
+
 class BidAnalysisService:
     def __init__(self, agent_manager: AgentManager):
         self.agent_manager = agent_manager
         self.step_repo = StepProgressRepository()
         self.project_repo = ProjectRepository()
+        self.task_registry = get_task_registry()
 
         # 预初始化Agent配置（避免每次请求重新创建）
         self._analysis_config = None
         self._strategy_config = None
         self._agents_initialized = False
+        self._section_configs: Dict[str, Tuple[AgentConfig, AgentConfig]] = {}
+
+        # 流水线模式：各分析章节并发执行，章节分析完成后立即启动该章节的策略生成
+        self.pipeline_enabled = bool(get_config().get("bid_analysis.pipeline", False))
+        self.pipeline_sections = tuple(get_config().get("bid_analysis.pipeline_sections", PIPELINE_SECTIONS))
 
         # Final diagnostic: log the state of agent_manager at creation time.
         log_path = "g:/ZtbAiBidApp_202507210900/service_init.log"
@@ -94,7 +107,8 @@ class BidAnalysisService:
         try:
             # 尝试将project_id转换为整数（数据库中是INTEGER类型）
             project_id_int = int(project_id)
-            db_status = self.step_repo.get_step_progress(str(project_id_int), "bid-analysis")
+            # 读取前可能需要刷新进度缓冲区，放到IO线程池中执行
+            db_status = await run_io(self.step_repo.get_step_progress, str(project_id_int), "bid-analysis")
         except (ValueError, TypeError):
             db_status = None
         if db_status:
@@ -105,12 +119,8 @@ class BidAnalysisService:
                 "error_message": db_status.get("error_message")
             }
 
-        # 回退到内存状态（兼容性）
-        latest_task = None
-        for task_id, task in analysis_tasks.items():
-            if task.get("project_id") == project_id:
-                if latest_task is None or task.get("start_time") > latest_task.get("start_time"):
-                    latest_task = task
+        # 回退到任务注册表（兼容性）
+        latest_task = self.task_registry.latest_for_project(project_id)
 
         if latest_task:
             return {
@@ -122,11 +132,8 @@ class BidAnalysisService:
             return {"status": "not_started", "progress": 0}
 
     async def get_result(self, project_id: str) -> Dict[str, Any]:
-        latest_task = None
-        for task_id, task in analysis_tasks.items():
-            if task.get("project_id") == project_id and task.get("status") == "completed":
-                if latest_task is None or task.get("start_time") > latest_task.get("start_time"):
-                    latest_task = task
+        # 内存中已淘汰时会回退查询数据库
+        latest_task = await run_io(self.task_registry.latest_completed_for_project, project_id)
 
         if latest_task and latest_task.get("result"):
             return {
@@ -142,25 +149,19 @@ class BidAnalysisService:
 
         # 检查是否已有运行中的任务（幂等性）
         if idempotency_key:
-            for task_id, task in analysis_tasks.items():
-                if (task.get("project_id") == project_id and
-                    task.get("idempotency_key") == idempotency_key and
-                    task.get("status") in ["pending", "in_progress"]):
-                    logger.info(f"返回已存在的任务: {task_id}")
-                    return {"task_id": task_id, "status": task.get("status", "running")}
-
-        # 创建新任务
-        task_id = str(uuid.uuid4())
-        task = {
-            "id": task_id,
-            "project_id": project_id,
-            "status": "in_progress",  # 立即设置为进行中
-            "progress": 0,
-            "start_time": datetime.now().isoformat(),
-            "idempotency_key": idempotency_key,
-            "trace_id": trace_id
-        }
-        analysis_tasks[task_id] = task
+            existing = self.task_registry.find_active_by_idempotency(project_id, idempotency_key)
+            if existing:
+                logger.info(f"返回已存在的任务: {existing['id']}")
+                return {"task_id": existing["id"], "status": existing.get("status", "running")}
+
+        # 创建新任务（立即设置为进行中）
+        task = self.task_registry.create(
+            project_id,
+            idempotency_key=idempotency_key,
+            trace_id=trace_id,
+            status="in_progress"
+        )
+        task_id = task["id"]
 
         # 更新数据库状态
         try:
@@ -184,9 +185,13 @@ class BidAnalysisService:
             except Exception as e:
                 logger.error(f"后台分析任务 {task_id} 失败: {e}", exc_info=True)
                 # 更新任务状态为失败
-                if task_id in analysis_tasks:
-                    analysis_tasks[task_id]["status"] = "failed"
-                    analysis_tasks[task_id]["error_message"] = str(e)
+                if task_id in self.task_registry:
+                    current = self.task_registry.get(task_id) or {}
+                    self.task_registry.update(
+                        task_id,
+                        status="failed",
+                        error_message=current.get("error_message") or str(e)
+                    )
                     try:
                         project_id_int = int(project_id)
                         self.step_repo.update_step_progress(
@@ -219,31 +224,28 @@ class BidAnalysisService:
 
     async def execute_analysis_task(self, task_id: str, project_id: str, analysis_type: str):
         try:
-            task = analysis_tasks[task_id]
+            task = self.task_registry.get(task_id)
+            if task is None:
+                raise Exception(f"Task {task_id} not found in registry")
 
             # 快速模式：使用模拟结果，立即完成
             if FAST_MODE:
                 logger.info(f"快速模式：使用模拟结果完成任务 {task_id}")
                 result = await self.execute_fast_mode(task_id, project_id, analysis_type, task)
+            elif AGENT_AVAILABLE and self.agent_manager and self.pipeline_enabled:
+                result = await self.execute_pipelined(task_id, project_id, analysis_type, task)
             elif AGENT_AVAILABLE and self.agent_manager:
                 result = await self.execute_with_agent(task_id, project_id, analysis_type, task)
             else:
-                task["status"] = "failed"
-                task["error_message"] = "Agent system is unavailable"
                 # We must raise an exception here to make sure the callback catches it.
-                raise Exception(task["error_message"])
+                raise Exception("Agent system is unavailable")
 
-            if result:
-                task["result"] = result
-            else:
+            if not result:
                 # This is the silent failure point. The agent task returned a falsy value without raising an exception.
-                task["status"] = "failed"
-                task["error_message"] = "Agent execution resulted in an empty or invalid result."
                 # We must raise an exception here to make sure the callback catches it.
-                raise Exception(task["error_message"])
+                raise Exception("Agent execution resulted in an empty or invalid result.")
         except Exception as e:
-            task["status"] = "failed"
-            task["error"] = str(e)
+            self.task_registry.update(task_id, status="failed", error_message=str(e))
             with open("g:/ZtbAiBidApp_202507210900/failure_point.log", "a") as f:
                 f.write(f"[execute_analysis_task] failed at {datetime.now().isoformat()}: {str(e)}\n")
             raise e
@@ -254,7 +256,7 @@ class BidAnalysisService:
             logger.info(f"快速模式执行开始: 任务ID {task_id}")
 
             # 模拟进度更新
-            task["progress"] = 20
+            self.task_registry.update(task_id, progress=20)
             try:
                 project_id_int = int(project_id)
                 self.step_repo.update_step_progress(
@@ -271,7 +273,7 @@ class BidAnalysisService:
             # 模拟短暂处理时间
             await asyncio.sleep(0.5)
 
-            task["progress"] = 50
+            self.task_registry.update(task_id, progress=50)
             try:
                 project_id_int = int(project_id)
                 self.step_repo.update_step_progress(
@@ -307,7 +309,7 @@ class BidAnalysisService:
                 "strategy_path": f"ZtbBidPro/mock_project_{project_id}/投标文件制作策略.md"
             }
 
-            task["progress"] = 90
+            self.task_registry.update(task_id, progress=90)
             try:
                 project_id_int = int(project_id)
                 self.step_repo.update_step_progress(
@@ -323,10 +325,8 @@ class BidAnalysisService:
 
             await asyncio.sleep(0.2)
 
-            # 完成任务
-            task["status"] = "completed"
-            task["progress"] = 100
-            task["end_time"] = datetime.now().isoformat()
+            # 完成任务（结果随完成状态一并写入 tasks 表）
+            self.task_registry.update(task_id, status="completed", progress=100, result=mock_result)
 
             try:
                 project_id_int = int(project_id)
@@ -345,27 +345,143 @@ class BidAnalysisService:
             return mock_result
 
         except Exception as e:
-            task["status"] = "failed"
-            task["error_message"] = f"快速模式执行失败: {str(e)}"
+            self.task_registry.update(task_id, status="failed", error_message=f"快速模式执行失败: {str(e)}")
             logger.error(f"快速模式执行失败: {e}")
             raise e
 
+    def _resolve_bid_file(self, project_id: str) -> Tuple[Path, Path]:
+        """解析项目目录与招标文件"""
+        project_path = get_project_path_by_id(project_id)
+        if not project_path:
+            raise Exception(f"Project path for project ID {project_id} not found")
+
+        project_dir = Path(project_path)
+        if not project_dir.exists():
+            raise Exception(f"Project directory does not exist: {project_path}")
+
+        bid_file = find_bid_file_in_project(project_dir)
+        if not bid_file:
+            raise Exception(f"Bid file not found in project directory: {project_path}")
+        return project_dir, bid_file
+
+    def _get_section_agents(self, section: str) -> Tuple[str, str]:
+        """创建（一次）章节级分析与策略Agent配置，返回 (分析Agent名, 策略Agent名)"""
+        if section not in self._section_configs:
+            analysis_config = AgentConfig(
+                name=f"bid_analysis_agent_{section}",
+                agent_type="BidAnalysisAgent",
+                config={"analysis": {"type": "section", "section": section, "detailed": True}}
+            )
+            strategy_config = AgentConfig(
+                name=f"bid_strategy_agent_{section}",
+                agent_type="BidStrategyAgent",
+                config={"strategy": {"type": "section", "section": section, "detailed": True}}
+            )
+            self.agent_manager.create_agent(analysis_config)
+            self.agent_manager.create_agent(strategy_config)
+            self._section_configs[section] = (analysis_config, strategy_config)
+        analysis_config, strategy_config = self._section_configs[section]
+        return analysis_config.name, strategy_config.name
+
+    async def execute_pipelined(self, task_id: str, project_id: str, analysis_type: str, task: dict):
+        """
+        流水线模式执行分析：
+        各章节（基本信息、评分标准、技术要求）的分析Agent并发运行，
+        某章节分析一完成即启动该章节的策略Agent，最后合并各章节结果
+        """
+        try:
+            project_dir, bid_file = self._resolve_bid_file(project_id)
+            sections: List[str] = list(self.pipeline_sections)
+            total = len(sections)
+            done = {"analysis": 0, "strategy": 0}
+
+            def report_progress():
+                # 分析阶段占 20%~50%，策略阶段占 50%~90%
+                progress = 20 + int(30 * done["analysis"] / total) + int(40 * done["strategy"] / total)
+                self.task_registry.update(task_id, progress=progress)
+
+            async def run_section(section: str):
+                analysis_agent, strategy_agent = self._get_section_agents(section)
+                analysis_input = {
+                    "file_path": str(bid_file), "project_id": project_id, "project_path": str(project_dir),
+                    "analysis_type": analysis_type, "analysis_section": section
+                }
+                analysis_result = await self.agent_manager.run_agent(analysis_agent, analysis_input)
+                if not analysis_result.success:
+                    raise Exception(f"Analysis Agent failed for section {section}: {analysis_result.error}")
+                data = analysis_result.data.get("analysis_result", {})
+                # Agent 忽略 analysis_section 时会返回整份分析，按章节合并会得到重复且错位的结果
+                if not isinstance(data, dict) or section not in data:
+                    raise SectionModeUnsupported(f"分析Agent未返回章节 {section} 的结果")
+                section_data = data[section]
+                done["analysis"] += 1
+                report_progress()
+
+                strategy_input = {
+                    "analysis_result": {section: section_data}, "project_id": project_id,
+                    "project_path": str(project_dir), "strategy_section": section
+                }
+                strategy_result = await self.agent_manager.run_agent(strategy_agent, strategy_input)
+                if not strategy_result.success:
+                    logger.warning(f"章节 {section} 策略生成失败: {strategy_result.error}")
+                done["strategy"] += 1
+                report_progress()
+                return section, section_data, analysis_result, strategy_result
+
+            self.task_registry.update(task_id, progress=20)
+            section_tasks = [asyncio.ensure_future(run_section(section)) for section in sections]
+            try:
+                results = await asyncio.gather(*section_tasks)
+            except BaseException:
+                for section_task in section_tasks:
+                    section_task.cancel()
+                raise
+
+            # 合并各章节结果（保持章节顺序）
+            analysis_merged: Dict[str, Any] = {}
+            strategy_merged: Dict[str, Any] = {}
+            report_path = ""
+            strategy_path = ""
+            for section, section_data, analysis_result, strategy_result in results:
+                analysis_merged[section] = section_data
+                report_path = report_path or analysis_result.data.get("report_path", "")
+                if strategy_result.success:
+                    data = strategy_result.data.get("strategy_result", {})
+                    strategy_merged[section] = data.get(section, data) if isinstance(data, dict) else data
+                    strategy_path = strategy_path or strategy_result.data.get("strategy_path", "")
+
+            combined_result = {
+                "analysis_result": analysis_merged,
+                "strategy_result": strategy_merged,
+                "report_path": report_path,
+                "strategy_path": strategy_path,
+                "pipeline": {"sections": sections},
+            }
+
+            self.task_registry.update(task_id, progress=95)
+            save_result = await save_analysis_results(project_id, combined_result)
+            if not (save_result and save_result.get("success")):
+                raise Exception(save_result.get("message") if isinstance(save_result, dict) else "Failed to save analysis results")
+
+            self.task_registry.update(task_id, status="completed", progress=100, result=combined_result)
+            return combined_result
+        except SectionModeUnsupported as e:
+            # 当前 Agent 不支持按章节分析，本进程内不再使用流水线模式，改走顺序执行
+            logger.warning(f"{e}，回退到顺序分析模式")
+            self.pipeline_enabled = False
+            return await self.execute_with_agent(task_id, project_id, analysis_type, task)
+        except Exception as e:
+            current = self.task_registry.get(task_id) or {}
+            self.task_registry.update(task_id, status="failed", error_message=current.get("error_message") or str(e))
+            logger.error(f"流水线分析失败: {e}")
+            raise e
+
     async def execute_with_agent(self, task_id: str, project_id: str, analysis_type: str, task: dict):
         try:
             # 确保Agent配置已初始化
             self._ensure_agents_initialized()
 
-            project_path = get_project_path_by_id(project_id)
-            if not project_path:
-                raise Exception(f"Project path for project ID {project_id} not found")
-
-            project_dir = Path(project_path)
-            if not project_dir.exists():
-                raise Exception(f"Project directory does not exist: {project_path}")
-
-            bid_file = find_bid_file_in_project(project_dir)
-            if not bid_file:
-                raise Exception(f"Bid file not found in project directory: {project_path}")
+            project_dir, bid_file = self._resolve_bid_file(project_id)
 
             # 使用预初始化的Agent配置，避免重复创建
             if not self._analysis_config:
@@ -374,17 +490,15 @@ class BidAnalysisService:
             analysis_agent = self.agent_manager.create_agent(self._analysis_config)
             analysis_input = {"file_path": str(bid_file), "project_id": project_id, "project_path": str(project_dir), "analysis_type": analysis_type}
 
-            task["progress"] = 20
-            upsert_task_record(project_id, "bid-analysis", task_id, "in_progress", 20)
+            self.task_registry.update(task_id, progress=20)
             analysis_result = await self.agent_manager.run_agent("bid_analysis_agent", analysis_input)
-            task["progress"] = 50
-            upsert_task_record(project_id, "bid-analysis", task_id, "in_progress", 50)
+            self.task_registry.update(task_id, progress=50)
 
             if not analysis_result.success:
                 # This is a critical failure point. We must set the task status AND raise an exception.
-                task["status"] = "failed"
-                task["error_message"] = f"Analysis Agent failed: {analysis_result.error}"
-                raise Exception(task["error_message"])
+                error_message = f"Analysis Agent failed: {analysis_result.error}"
+                self.task_registry.update(task_id, status="failed", error_message=error_message)
+                raise Exception(error_message)
 
             # 使用预初始化的策略Agent配置
             if not self._strategy_config:
@@ -393,11 +507,9 @@ class BidAnalysisService:
             strategy_agent = self.agent_manager.create_agent(self._strategy_config)
             strategy_input = {"analysis_result": analysis_result.data.get("analysis_result", {}), "project_id": project_id, "project_path": str(project_dir)}
 
-            task["progress"] = 70
-            upsert_task_record(project_id, "bid-analysis", task_id, "in_progress", 70)
+            self.task_registry.update(task_id, progress=70)
             strategy_result = await self.agent_manager.run_agent("bid_strategy_agent", strategy_input)
-            task["progress"] = 90
-            upsert_task_record(project_id, "bid-analysis", task_id, "in_progress", 90)
+            self.task_registry.update(task_id, progress=90)
 
             combined_result = {
                 "analysis_result": analysis_result.data.get("analysis_result", {}),
@@ -406,20 +518,17 @@ class BidAnalysisService:
                 "strategy_path": strategy_result.data.get("strategy_path", "") if strategy_result.success else "",
             }
 
-            task["progress"] = 95
+            self.task_registry.update(task_id, progress=95)
             save_result = await save_analysis_results(project_id, combined_result)
             if not (save_result and save_result.get("success")):
                 raise Exception(save_result.get("message") if isinstance(save_result, dict) else "Failed to save analysis results")
 
-            task["status"] = "completed"
-            task["progress"] = 100
-            task["end_time"] = datetime.now().isoformat()
-            upsert_task_record(project_id, "bid-analysis", task_id, "completed", 100)
+            self.task_registry.update(task_id, status="completed", progress=100, result=combined_result)
 
             return combined_result
         except Exception as e:
-            task["status"] = "failed"
-            task["error_message"] = str(e)
+            current = self.task_registry.get(task_id) or {}
+            self.task_registry.update(task_id, status="failed", error_message=current.get("error_message") or str(e))
             with open("g:/ZtbAiBidApp_202507210900/failure_point.log", "a") as f:
                 f.write(f"[execute_with_agent] failed at {datetime.now().isoformat()}: {str(e)}\n")
             raise e
@@ -0,0 +1,305 @@
+"""
+内容寻址文件存储模块
+跨项目共享相同内容的招标文件与资料文件：
+- 文件按内容SHA-256存放在 blob_store/<前两位>/<sha256>，同一内容只保存一份
+- 项目目录中的文件是指向存储文件的硬链接（无法硬链接时退回复制），路径引用记录在 blob_refs 表
+- blobs 表维护引用计数，删除项目释放最后一个引用时回收存储文件
+注意：项目目录中的这些文件与存储共享同一份数据，只能整体替换，不能原地修改
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from ..core.config import get_config
+from ..core.connection_pool import get_connection_pool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BLOB_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "blob_store")
+
+PathLike = Union[str, Path]
+
+
+def _ref_key(path: PathLike) -> str:
+    return str(Path(path).resolve())
+
+
+class BlobStore:
+    """引用计数的内容寻址存储（同步接口，异步调用方在IO执行器中使用）"""
+
+    def __init__(self, root: str = DEFAULT_BLOB_ROOT, db_path: Optional[str] = None):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.pool = get_connection_pool(db_path)
+        self._lock = threading.Lock()
+        # 存入+链接 与 回收 互斥，避免刚被引用的存储文件被回收
+        self._gc_lock = threading.RLock()
+
+        # 统计信息
+        self._dedup_hits = 0
+        self._bytes_saved = 0
+        self._linked = 0
+        self._copied = 0
+        self._collected = 0
+
+        self._init_tables()
+
+    def _init_tables(self) -> None:
+        self.pool.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                sha256 TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                refcount INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS blob_refs (
+                path TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                project_id TEXT,
+                created_at TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_blob_refs_sha ON blob_refs(sha256);
+            CREATE INDEX IF NOT EXISTS idx_blob_refs_project ON blob_refs(project_id);
+        """)
+
+    def blob_path(self, sha256: str) -> Path:
+        return self.root / sha256[:2] / sha256
+
+    @property
+    def staging_dir(self) -> Path:
+        """上传暂存目录（与存储位于同一文件系统，存入时可直接重命名）"""
+        path = self.root / ".incoming"
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    # ------------------ 写入 ------------------
+    def _commit_blob(self, tmp_file: Path, sha256: str, size: int) -> None:
+        """把临时文件登记为存储文件（内容已存在时丢弃临时文件）"""
+        target = self.blob_path(sha256)
+        if target.exists():
+            # 并发存入了相同内容
+            tmp_file.unlink(missing_ok=True)
+            self._count_dedup(sha256, size)
+            return
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.replace(tmp_file, target)
+        except OSError:
+            shutil.move(str(tmp_file), str(target))
+        self._register_blob(sha256, size)
+
+    def put_file(self, src: PathLike, move: bool = False) -> Tuple[str, int]:
+        """存入文件，返回 (sha256, size)；move=True 时源文件被移入存储"""
+        src = Path(src)
+        sha = hashlib.sha256()
+        with open(src, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        size = src.stat().st_size
+        if self.blob_path(digest).exists():
+            self._count_dedup(digest, size)
+            if move:
+                src.unlink(missing_ok=True)
+            return digest, size
+
+        tmp_file = self.root / f".tmp-{uuid.uuid4().hex}"
+        if move:
+            try:
+                os.replace(src, tmp_file)
+            except OSError:
+                shutil.copy2(src, tmp_file)
+                src.unlink(missing_ok=True)
+        else:
+            shutil.copy2(src, tmp_file)
+        self._commit_blob(tmp_file, digest, size)
+        return digest, size
+
+    def put_bytes(self, data: bytes) -> Tuple[str, int]:
+        """存入字节内容，返回 (sha256, size)"""
+        digest = hashlib.sha256(data).hexdigest()
+        if self.blob_path(digest).exists():
+            self._count_dedup(digest, len(data))
+            return digest, len(data)
+        tmp_file = self.root / f".tmp-{uuid.uuid4().hex}"
+        tmp_file.write_bytes(data)
+        self._commit_blob(tmp_file, digest, len(data))
+        return digest, len(data)
+
+    def _count_dedup(self, sha256: str, size: int) -> None:
+        with self._lock:
+            self._dedup_hits += 1
+            self._bytes_saved += size
+        self._register_blob(sha256, size)
+
+    def _register_blob(self, sha256: str, size: int) -> None:
+        self.pool.execute(
+            "INSERT OR IGNORE INTO blobs (sha256, size, refcount, created_at) VALUES (?, ?, 0, ?)",
+            (sha256, size, datetime.now().isoformat())
+        )
+
+    def link(self, sha256: str, dest: PathLike, project_id: Optional[Any] = None) -> bool:
+        """
+        在 dest 放置存储文件的硬链接并登记引用；返回是否为硬链接
+        先链接到临时文件，登记引用后再原子替换 dest，最后释放被覆盖的旧引用；
+        dest 已引用相同内容时保留现有文件
+        """
+        dest = Path(dest)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        key = _ref_key(dest)
+        source = self.blob_path(sha256)
+
+        existing = self.pool.fetchone("SELECT sha256 FROM blob_refs WHERE path = ?", (key,))
+        if existing and existing["sha256"] == sha256 and dest.exists():
+            return os.path.samefile(source, dest)
+
+        tmp_file = dest.with_name(f".{dest.name}.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            os.link(source, tmp_file)
+            linked = True
+        except OSError:
+            shutil.copy2(source, tmp_file)
+            linked = False
+
+        try:
+            with self.pool.connection() as conn:
+                # 引用记录可能在文件被绕过存储删除后残留，无论 dest 是否存在都先释放
+                old = conn.execute("SELECT sha256 FROM blob_refs WHERE path = ?", (key,)).fetchone()
+                if old:
+                    conn.execute("UPDATE blobs SET refcount = MAX(refcount - 1, 0) WHERE sha256 = ?", (old["sha256"],))
+                conn.execute(
+                    "INSERT OR REPLACE INTO blob_refs (path, sha256, project_id, created_at) VALUES (?, ?, ?, ?)",
+                    (key, sha256, str(project_id) if project_id is not None else None, datetime.now().isoformat())
+                )
+                conn.execute("UPDATE blobs SET refcount = refcount + 1 WHERE sha256 = ?", (sha256,))
+                # 替换失败时事务回滚，引用计数保持不变
+                os.replace(tmp_file, dest)
+        finally:
+            tmp_file.unlink(missing_ok=True)
+
+        if old and old["sha256"] != sha256:
+            self.collect({old["sha256"]})
+        with self._lock:
+            if linked:
+                self._linked += 1
+            else:
+                self._copied += 1
+        return linked
+
+    def ingest_file(self, src: PathLike, dest: PathLike, project_id: Optional[Any] = None,
+                    move: bool = False) -> Dict[str, Any]:
+        """存入文件并放置到项目目录"""
+        with self._gc_lock:
+            digest, size = self.put_file(src, move=move)
+            linked = self.link(digest, dest, project_id)
+        return {"sha256": digest, "size": size, "linked": linked, "path": str(dest)}
+
+    def ingest_bytes(self, data: bytes, dest: PathLike, project_id: Optional[Any] = None) -> Dict[str, Any]:
+        """存入字节内容并放置到项目目录"""
+        with self._gc_lock:
+            digest, size = self.put_bytes(data)
+            linked = self.link(digest, dest, project_id)
+        return {"sha256": digest, "size": size, "linked": linked, "path": str(dest)}
+
+    def ingest_staged(self, staged: Dict[str, Any], dest: PathLike,
+                      project_id: Optional[Any] = None) -> Dict[str, Any]:
+        """存入已接收并计算过哈希的上传文件（直接重命名，不再复制和重新哈希）"""
+        with self._gc_lock:
+            self._commit_blob(Path(staged["path"]), staged["sha256"], staged["size"])
+            linked = self.link(staged["sha256"], dest, project_id)
+        return {"sha256": staged["sha256"], "size": staged["size"], "linked": linked, "path": str(dest)}
+
+    # ------------------ 释放与回收 ------------------
+    def release(self, path: PathLike, collect: bool = True) -> int:
+        """释放单个路径的引用，返回回收的存储文件数"""
+        return self._release_keys([_ref_key(path)], collect)
+
+    def release_tree(self, directory: PathLike, collect: bool = True) -> int:
+        """释放目录下所有路径的引用（删除项目时调用），返回回收的存储文件数"""
+        prefix = _ref_key(directory).rstrip(os.sep) + os.sep
+        rows = self.pool.fetchall(
+            "SELECT path FROM blob_refs WHERE path >= ? AND path < ?", (prefix, prefix + "\U0010ffff")
+        )
+        return self._release_keys([row["path"] for row in rows], collect)
+
+    def _release_keys(self, keys: List[str], collect: bool) -> int:
+        if not keys:
+            return 0
+        touched = set()
+        with self.pool.connection() as conn:
+            for key in keys:
+                row = conn.execute("SELECT sha256 FROM blob_refs WHERE path = ?", (key,)).fetchone()
+                if not row:
+                    continue
+                conn.execute("DELETE FROM blob_refs WHERE path = ?", (key,))
+                conn.execute("UPDATE blobs SET refcount = MAX(refcount - 1, 0) WHERE sha256 = ?", (row["sha256"],))
+                touched.add(row["sha256"])
+        return self.collect(touched) if collect else 0
+
+    def collect(self, candidates: Optional[set] = None) -> int:
+        """回收引用计数为 0 的存储文件"""
+        with self._gc_lock:
+            return self._collect(candidates)
+
+    def _collect(self, candidates: Optional[set]) -> int:
+        with self.pool.connection() as conn:
+            if candidates is None:
+                rows = conn.execute("SELECT sha256 FROM blobs WHERE refcount <= 0").fetchall()
+            else:
+                rows = [
+                    row for sha in candidates
+                    for row in conn.execute(
+                        "SELECT sha256 FROM blobs WHERE sha256 = ? AND refcount <= 0", (sha,)
+                    ).fetchall()
+                ]
+            for row in rows:
+                conn.execute("DELETE FROM blobs WHERE sha256 = ?", (row["sha256"],))
+        for row in rows:
+            self.blob_path(row["sha256"]).unlink(missing_ok=True)
+        if rows:
+            with self._lock:
+                self._collected += len(rows)
+            logger.info(f"回收未引用的存储文件 {len(rows)} 个")
+        return len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        """存储统计信息"""
+        row = self.pool.fetchone(
+            "SELECT COUNT(*) AS blobs, COALESCE(SUM(size), 0) AS bytes, "
+            "COALESCE(SUM(size * MAX(refcount - 1, 0)), 0) AS shared_bytes FROM blobs"
+        )
+        refs = self.pool.fetchone("SELECT COUNT(*) FROM blob_refs")[0]
+        with self._lock:
+            return {
+                "blobs": row["blobs"],
+                "stored_bytes": row["bytes"],
+                "deduplicated_bytes": row["shared_bytes"],
+                "references": refs,
+                "dedup_hits": self._dedup_hits,
+                "bytes_saved": self._bytes_saved,
+                "linked": self._linked,
+                "copied": self._copied,
+                "collected": self._collected,
+            }
+
+
+# 全局存储实例
+_blob_store: Optional[BlobStore] = None
+_blob_store_lock = threading.Lock()
+
+
+def get_blob_store() -> BlobStore:
+    """获取内容寻址存储实例"""
+    global _blob_store
+    if _blob_store is None:
+        with _blob_store_lock:
+            if _blob_store is None:
+                _blob_store = BlobStore(root=get_config().get("blob_store.root") or DEFAULT_BLOB_ROOT)
+    return _blob_store
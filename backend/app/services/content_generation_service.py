@@ -4,10 +4,11 @@
 
 import os
 import json
-import sqlite3
 import asyncio
+import uuid
+import weakref
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, AsyncIterator, List
 from datetime import datetime
 import logging
 
@@ -17,17 +18,59 @@ from Agent.base.base_agent import AgentConfig, AgentResult
 from Agent.generation.technical_content_agent import TechnicalContentAgent
 from Agent.generation.commercial_content_agent import CommercialContentAgent
 from ..core.repository import Repository
+from ..core.config import get_config
+from ..core.connection_pool import get_connection_pool
+from ..core.executors import run_io
+from ..core.file_index import get_file_index
+from ..core.progress_writer import submit_step_progress, flush_step_progress
+from .ai_service import AIService
+from .generation_context import GenerationContext, get_generation_context_cache
+from .generation_dependencies import (
+    ChapterDependencyGraph, chapter_inputs, dependency_lock, make_chapter_key, material_fingerprints,
+    migrate_legacy_chapters, rename_result_sections
+)
 
 logger = logging.getLogger(__name__)
 
+
+def _temp_content_path(content_file: Path) -> Path:
+    """章节内容的临时文件（隐藏文件，写完后原子替换正式文件）"""
+    return content_file.with_name(f".{content_file.name}.{uuid.uuid4().hex[:8]}.tmp")
+
+
+def _migrate_with_graph(content_dir: Path, sections: List[Dict[str, Any]]) -> Dict[str, str]:
+    """在目录锁内迁移旧版章节文件并同步依赖记录"""
+    with dependency_lock(content_dir):
+        migrated = migrate_legacy_chapters(content_dir, sections)
+        if migrated:
+            graph = ChapterDependencyGraph.load(content_dir)
+            for old_key, new_key in migrated.items():
+                graph.rename(old_key, new_key)
+            graph.save()
+        return migrated
+
 class ContentGenerationService:
     """内容生成服务"""
 
     def __init__(self):
         self.db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "ztbai.db")
+        self.pool = get_connection_pool(self.db_path)
         self.repository = Repository()
         self.agent_manager = AgentManager()
         self._register_agents()
+        self.ai_service = AIService()
+
+        # 章节并发生成配置：单项目并发数、全局并发数（所有项目共享）与单章节重试次数
+        config = get_config()
+        self.max_concurrency = max(1, int(config.get("content_generation.max_concurrency", 4)))
+        self.global_concurrency = max(1, int(config.get("content_generation.global_concurrency", 8)))
+        self.max_retries = max(0, int(config.get("content_generation.max_retries", 2)))
+        self.retry_backoff = float(config.get("content_generation.retry_backoff", 1.0))
+        # 增量生成：全量执行时只重新生成输入发生变化的章节
+        self.incremental = bool(config.get("content_generation.incremental", True))
+        # 信号量在首次使用时于事件循环内创建
+        self._global_semaphore: Optional[asyncio.Semaphore] = None
+        self._project_semaphores: "weakref.WeakValueDictionary[str, asyncio.Semaphore]" = weakref.WeakValueDictionary()
 
     def _register_agents(self):
         """注册Agent"""
@@ -37,18 +80,13 @@ class ContentGenerationService:
     async def get_status(self, project_id: str) -> Dict[str, Any]:
         """获取内容生成状态"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            await run_io(flush_step_progress, self.pool, project_id, "content-generation")
+            result = await self.pool.afetchone("""
                 SELECT status, progress, result_data, updated_at 
                 FROM step_progress 
                 WHERE project_id = ? AND step_key = ?
             """, (project_id, "content-generation"))
             
-            result = cursor.fetchone()
-            conn.close()
-            
             if result:
                 status, progress, result_data, updated_at = result
                 return {
@@ -76,86 +114,105 @@ class ContentGenerationService:
                 "error": str(e)
             }
 
-    async def execute(self, project_id: str, chapter_key: str = None, section_keys: List[str] = None) -> Dict[str, Any]:
-        """执行内容生成"""
+    async def execute(self, project_id: str, chapter_key: str = None, section_keys: List[str] = None,
+                      force: bool = False) -> Dict[str, Any]:
+        """
+        执行内容生成
+        指定 chapter_key / section_keys 时总是重新生成这些章节；
+        全量执行时按依赖图跳过输入未变化的章节，force=True 时全部重新生成
+        """
         try:
             # 更新状态为进行中
             await self._update_step_progress(project_id, "in_progress", 10)
             
-            # 获取项目信息
-            project_info = await self._get_project_info(project_id)
-            if not project_info:
+            # 获取项目信息、框架、分析与资料数据（按版本缓存，未变化时不重新读取解析）
+            context = await get_generation_context_cache().get(project_id)
+            if not context:
                 raise Exception(f"项目 {project_id} 不存在")
-            
-            # 获取框架数据
-            framework_data = await self._get_framework_data(project_id)
-            
-            # 获取分析数据
-            analysis_data = await self._get_analysis_data(project_id)
-            
-            # 获取资料数据
-            material_data = await self._get_material_data(project_id)
+            project_info = context.project_info
             
             # 更新进度
             await self._update_step_progress(project_id, "in_progress", 30)
             
-            # 如果指定了章节，只生成该章节内容
+            # 旧版章节文件迁移到稳定标识
+            await self._migrate_legacy_chapters(project_id, project_info["project_path"], context.sections)
+
+            # 如果指定了章节，只生成该章节内容（统一换算为稳定标识）
+            explicit = bool(chapter_key or section_keys)
             if chapter_key:
-                chapters_to_generate = [chapter_key]
+                chapters_to_generate = [self._normalize_chapter_key(context, chapter_key)]
             elif section_keys:
-                chapters_to_generate = section_keys
+                chapters_to_generate = list(dict.fromkeys(
+                    self._normalize_chapter_key(context, key) for key in section_keys
+                ))
             else:
-                # 从框架数据获取所有章节
-                chapters_to_generate = []
-                if framework_data and "sections" in framework_data:
-                    sections = framework_data["sections"]
-                    # 使用section_id和section_name组合来避免重复
-                    for i, section in enumerate(sections):
-                        section_id = section.get("section_id")
-                        section_name = section.get("section_name", "")
-                        if section_id:
-                            # 创建唯一标识符
-                            unique_id = f"{section_id}_{hash(section_name) & 0xFFFFFFFF}"
-                            chapters_to_generate.append(unique_id)
-                            print(f"DEBUG: Added section {i+1}: {unique_id} - {section_name[:20]}")
+                # 从框架数据获取所有章节（section_id 与 section_name 组合的稳定标识）
+                chapters_to_generate = list(context.chapter_keys)
                 
                 # 如果没有框架数据，使用默认章节
                 if not chapters_to_generate:
                     chapters_to_generate = ["technical_proposal", "commercial_proposal", "qualification"]
             
-            generated_sections = []
+            # 计算各章节的输入指纹，与依赖图比较找出需要重新生成的章节
+            graph = await run_io(ChapterDependencyGraph.load, Path(project_info["project_path"]) / "bid_content")
+            material_fps = await self._get_material_fingerprints(project_id, project_info["project_path"])
+            chapter_deps: Dict[str, Dict[str, str]] = {}
+            stale_reasons: Dict[str, List[str]] = {}
+            for key in chapters_to_generate:
+                chapter_deps[key] = chapter_inputs(
+                    context.find_section(key), context.analysis_data, context.material_data,
+                    material_fps, project_info.get("service_mode")
+                )
+                reasons = graph.stale_reasons(key, chapter_deps[key])
+                if reasons or explicit or force or not self.incremental:
+                    stale_reasons[key] = reasons
+            stale_chapters = [key for key in chapters_to_generate if key in stale_reasons]
+
             total_chapters = len(chapters_to_generate)
-            print(f"DEBUG: Generating {total_chapters} chapters: {chapters_to_generate}")
-            
-            for i, chapter_key in enumerate(chapters_to_generate):
-                try:
-                    # 生成章节内容
-                    section_result = await self._generate_chapter_content(
-                        project_id, chapter_key, project_info, analysis_data, material_data, framework_data
-                    )
-                    
-                    if section_result:
-                        generated_sections.append(section_result)
-                    
-                    # 更新进度
-                    progress = 30 + int((i + 1) / total_chapters * 60)
-                    await self._update_step_progress(project_id, "in_progress", progress)
-                    
-                except Exception as e:
-                    logger.error(f"生成章节 {chapter_key} 内容失败: {str(e)}")
+            logger.info(f"项目 {project_id} 共 {total_chapters} 个章节，需要生成 {len(stale_chapters)} 个")
+            
+            # 并发生成各章节，结果按章节顺序组装
+            generated = await self._generate_chapters_concurrently(project_id, stale_chapters, context)
+            generated_by_key = {}
+            for section in generated:
+                key = section.get("key")
+                section["stale_reasons"] = stale_reasons.get(key, [])
+                if section.get("status") == "completed" and section.get("content_file"):
+                    graph.record(key, chapter_deps[key], section["content_file"])
+                generated_by_key[key] = section
+
+            # 未变化的章节沿用上次生成的内容
+            generated_sections = []
+            for key in chapters_to_generate:
+                if key in generated_by_key:
+                    generated_sections.append(generated_by_key[key])
+                elif key not in stale_reasons:
+                    record = graph.get(key)
                     generated_sections.append({
-                        "key": chapter_key,
-                        "status": "error",
-                        "error": str(e)
+                        "key": key,
+                        "status": "completed",
+                        "content_file": record["content_file"],
+                        "generated_at": record["generated_at"],
+                        "skipped": True
                     })
+            if not explicit:
+                graph.retain(chapters_to_generate)
+            await run_io(graph.save)
             
             # 保存生成结果
+            success_count = len([s for s in generated_sections if s.get('status') == 'completed'])
+            skipped_count = len([s for s in generated_sections if s.get('skipped')])
+            summary = f"已生成 {success_count - skipped_count} 个章节内容"
+            if skipped_count:
+                summary += f"，{skipped_count} 个章节输入未变化已跳过"
             result_data = {
                 "sections": generated_sections,
-                "summary": f"已生成 {len([s for s in generated_sections if s.get('status') == 'completed'])} 个章节内容",
+                "summary": summary,
                 "total_sections": len(generated_sections),
-                "success_count": len([s for s in generated_sections if s.get('status') == 'completed']),
-                "error_count": len([s for s in generated_sections if s.get('status') == 'error'])
+                "success_count": success_count,
+                "error_count": len([s for s in generated_sections if s.get('status') == 'error']),
+                "regenerated_count": success_count - skipped_count,
+                "skipped_count": skipped_count
             }
             
             # 更新状态为完成
@@ -172,18 +229,13 @@ class ContentGenerationService:
     async def get_result(self, project_id: str) -> Dict[str, Any]:
         """获取内容生成结果"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            await run_io(flush_step_progress, self.pool, project_id, "content-generation")
+            result = await self.pool.afetchone("""
                 SELECT result_data, status, updated_at 
                 FROM step_progress 
                 WHERE project_id = ? AND step_key = ?
             """, (project_id, "content-generation"))
             
-            result = cursor.fetchone()
-            conn.close()
-            
             if result and result[0]:
                 result_data, status, updated_at = result
                 return {
@@ -203,9 +255,69 @@ class ContentGenerationService:
             logger.error(f"获取内容生成结果失败: {str(e)}")
             raise e
 
-    async def _generate_chapter_content(self, project_id: str, chapter_key: str, project_info: Dict, 
-                                      analysis_data: Dict, material_data: Dict, framework_data: Dict) -> Dict[str, Any]:
+    def _get_semaphores(self, project_id: str):
+        """获取全局信号量与项目信号量"""
+        if self._global_semaphore is None:
+            self._global_semaphore = asyncio.Semaphore(self.global_concurrency)
+        project_semaphore = self._project_semaphores.get(project_id)
+        if project_semaphore is None:
+            project_semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._project_semaphores[project_id] = project_semaphore
+        return self._global_semaphore, project_semaphore
+
+    async def _generate_chapters_concurrently(self, project_id: str, chapters: List[str],
+                                              context: GenerationContext) -> List[Dict[str, Any]]:
+        """
+        有界并发生成章节内容
+        同时受项目信号量与全局信号量限制，失败章节按指数退避重试，
+        进度按已完成章节数计算，返回结果与 chapters 顺序一致
+        """
+        total_chapters = len(chapters)
+        if total_chapters == 0:
+            return []
+
+        global_semaphore, project_semaphore = self._get_semaphores(project_id)
+        completed = 0
+
+        async def run_chapter(chapter_key: str) -> Dict[str, Any]:
+            nonlocal completed
+            section_result: Dict[str, Any] = {}
+            for attempt in range(self.max_retries + 1):
+                async with project_semaphore:
+                    async with global_semaphore:
+                        try:
+                            section_result = await self._generate_chapter_content(project_id, chapter_key, context)
+                        except Exception as e:
+                            logger.error(f"生成章节 {chapter_key} 内容失败: {str(e)}")
+                            section_result = {
+                                "key": chapter_key,
+                                "status": "error",
+                                "error": str(e)
+                            }
+                if section_result and section_result.get("status") != "error":
+                    break
+                if attempt < self.max_retries:
+                    delay = self.retry_backoff * (2 ** attempt)
+                    logger.warning(f"章节 {chapter_key} 生成失败，{delay:.1f}s 后重试（第 {attempt + 1} 次）")
+                    # 退避期间释放信号量，让其他章节继续生成
+                    await asyncio.sleep(delay)
+
+            if section_result:
+                section_result["attempts"] = attempt + 1
+
+            # 更新进度
+            completed += 1
+            progress = 30 + int(completed / total_chapters * 60)
+            await self._update_step_progress(project_id, "in_progress", progress)
+            return section_result
+
+        results = await asyncio.gather(*(run_chapter(chapter_key) for chapter_key in chapters))
+        return [r for r in results if r]
+
+    async def _generate_chapter_content(self, project_id: str, chapter_key: str,
+                                        context: GenerationContext) -> Dict[str, Any]:
         """生成单个章节内容"""
+        project_info = context.project_info
         try:
             # 提取原始section_id（去除哈希后缀）
             original_section_id = chapter_key
@@ -217,18 +329,11 @@ class ContentGenerationService:
             # 获取框架中的Agent分配信息
             assigned_agent_type = None
             section_name = original_section_id
-            if framework_data and "sections" in framework_data:
-                sections = framework_data["sections"]
-                for section in sections:
-                    section_id = section.get("section_id")
-                    section_name_val = section.get("section_name", "")
-                    # 匹配section_id和section_name组合
-                    unique_id = f"{section_id}_{hash(section_name_val) & 0xFFFFFFFF}"
-                    if unique_id == chapter_key:
-                        agent_req = section.get("agent_requirements", {})
-                        assigned_agent_type = agent_req.get("primary_agent")
-                        section_name = section_name_val
-                        break
+            section = context.find_section(chapter_key)
+            if section:
+                agent_req = section.get("agent_requirements", {})
+                assigned_agent_type = agent_req.get("primary_agent")
+                section_name = section.get("section_name", "")
             
             # 根据分配的Agent类型选择内容生成Agent
             agent_type_mapping = {
@@ -270,11 +375,11 @@ class ContentGenerationService:
                 "section_id": chapter_key,  # Agent期望的字段名
                 "chapter_key": chapter_key,  # 保持兼容性
                 "project_path": project_info.get("project_path"),
-                "analysis_data": analysis_data,
-                "materials_data": material_data,  # Agent期望的字段名
-                "material_data": material_data,   # 保持兼容性
-                "framework_config": framework_data,  # Agent期望的字段名
-                "framework_data": framework_data,    # 保持兼容性
+                "analysis_data": context.analysis_data,
+                "materials_data": context.material_data,  # Agent期望的字段名
+                "material_data": context.material_data,   # 保持兼容性
+                "framework_config": context.framework_data,  # Agent期望的字段名
+                "framework_data": context.framework_data,    # 保持兼容性
                 "service_mode": project_info.get("service_mode", "free")
             }
             
@@ -310,8 +415,128 @@ class ContentGenerationService:
                 "error": str(e)
             }
 
+    def _normalize_chapter_key(self, context: GenerationContext, chapter_key: str) -> str:
+        """把客户端传入的章节标识（section_id、旧版标识）换算为稳定标识"""
+        section = context.find_section(chapter_key)
+        if section and section.get("section_id"):
+            return make_chapter_key(section["section_id"], section.get("section_name", ""))
+        return chapter_key
+
+    async def _migrate_legacy_chapters(self, project_id: str, project_path: str,
+                                       sections: List[Dict[str, Any]]) -> Dict[str, str]:
+        """迁移旧版标识的章节文件及其依赖记录"""
+        content_dir = Path(project_path) / "bid_content"
+        try:
+            migrated = await run_io(_migrate_with_graph, content_dir, sections)
+            if migrated:
+                await run_io(self._rename_result_sections, project_id, content_dir, migrated)
+                get_file_index().mark_stale(project_id)
+            return migrated
+        except Exception as e:
+            logger.warning(f"迁移旧版章节文件失败: {str(e)}")
+            return {}
+
+    def _rename_result_sections(self, project_id: str, content_dir: Path, migrated: Dict[str, str]) -> None:
+        """同步更新已保存的内容生成结果，导出时按新标识找到迁移后的章节文件"""
+        flush_step_progress(self.pool, project_id, "content-generation")
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT result_data FROM step_progress WHERE project_id = ? AND step_key = ?",
+                (project_id, "content-generation")
+            ).fetchone()
+            if not row or not row[0]:
+                return
+            result_data = json.loads(row[0])
+            if rename_result_sections(result_data, migrated, content_dir):
+                conn.execute(
+                    "UPDATE step_progress SET result_data = ? WHERE project_id = ? AND step_key = ?",
+                    (json.dumps(result_data, ensure_ascii=False), project_id, "content-generation")
+                )
+
+    def _build_chapter_prompt(self, chapter_key: str, section: Optional[Dict[str, Any]],
+                              project_info: Dict[str, Any], analysis_data: Dict[str, Any]) -> str:
+        """构造流式生成章节内容的提示词"""
+        section = section or {}
+        section_name = section.get("section_name", chapter_key)
+        requirements = section.get("requirements") or section.get("description") or section.get("content_requirements") or ""
+        analysis_result = analysis_data.get("analysis_result", analysis_data) if analysis_data else {}
+        analysis_text = json.dumps(analysis_result, ensure_ascii=False)[:4000] if analysis_result else "无"
+        return (
+            f"请为投标文件撰写章节《{section_name}》的正文内容。\n"
+            f"项目名称：{project_info.get('name', '')}\n"
+            f"章节要求：{requirements or '根据招标文件要求撰写'}\n"
+            f"招标文件分析摘要：{analysis_text}\n"
+            "要求：使用Markdown格式输出，以二级标题（##）划分内容块，不要重复章节标题。"
+        )
+
+    async def stream_chapter_content(self, project_id: str, chapter_key: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式生成单个章节内容
+        增量文本边生成边写入临时文件，完成后替换 bid_content/<chapter>.md，并逐段产出事件：
+        {"type": "delta", "text": ...} / {"type": "completed", ...} / {"type": "error", ...}
+        """
+        context = await get_generation_context_cache().get(project_id)
+        if not context:
+            yield {"type": "error", "key": chapter_key, "error": f"项目 {project_id} 不存在"}
+            return
+        project_info = context.project_info
+
+        await self._migrate_legacy_chapters(project_id, project_info["project_path"], context.sections)
+        chapter_key = self._normalize_chapter_key(context, chapter_key)
+        section = context.find_section(chapter_key)
+        section_name = section.get("section_name", chapter_key) if section else chapter_key
+        prompt = self._build_chapter_prompt(chapter_key, section, project_info, context.analysis_data)
+
+        content_dir = Path(project_info["project_path"]) / "bid_content"
+        content_dir.mkdir(exist_ok=True)
+        content_file = content_dir / f"{chapter_key}.md"
+        # 中途出错或客户端断开时保留原文件，避免依赖图把截断的内容当作最新结果
+        tmp_file = _temp_content_path(content_file)
+
+        written = 0
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(f"# {section_name}\n\n")
+                f.write("**生成类型**: ai_stream  \n")
+                f.write(f"**生成时间**: {datetime.now().isoformat()}\n\n")
+                f.flush()
+                # 用户正在等待的流式生成按交互优先级调度
+                async for delta in self.ai_service.astream_content(prompt, priority="interactive"):
+                    f.write(delta)
+                    f.flush()
+                    written += len(delta)
+                    yield {"type": "delta", "key": chapter_key, "text": delta}
+                f.write("\n")
+            os.replace(tmp_file, content_file)
+
+            logger.info(f"章节内容已流式保存到: {content_file}")
+
+            # 记录依赖，后续全量执行时该章节输入未变化则不再重复生成
+            material_fps = await self._get_material_fingerprints(project_id, project_info["project_path"])
+            inputs = chapter_inputs(section, context.analysis_data, context.material_data, material_fps,
+                                    project_info.get("service_mode"))
+            graph = await run_io(ChapterDependencyGraph.load, content_dir)
+            graph.record(chapter_key, inputs, str(content_file))
+            await run_io(graph.save)
+
+            yield {
+                "type": "completed",
+                "key": chapter_key,
+                "status": "completed",
+                "content_file": str(content_file),
+                "word_count": written,
+                "generated_at": datetime.now().isoformat()
+            }
+        except Exception as e:
+            logger.error(f"流式生成章节 {chapter_key} 内容失败: {str(e)}")
+            yield {"type": "error", "key": chapter_key, "status": "error", "error": str(e),
+                   "content_file": str(content_file), "word_count": written}
+        finally:
+            tmp_file.unlink(missing_ok=True)
+
     async def _save_chapter_content(self, project_id: str, chapter_key: str, content_data: Dict[str, Any], project_path: str) -> str:
         """保存章节内容到文件"""
+        tmp_file = None
         try:
             project_dir = Path(project_path)
             content_dir = project_dir / "bid_content"
@@ -319,9 +544,10 @@ class ContentGenerationService:
             
             # 生成文件名
             content_file = content_dir / f"{chapter_key}.md"
+            tmp_file = _temp_content_path(content_file)
             
-            # 写入内容 - 处理Agent返回的blocks结构
-            with open(content_file, 'w', encoding='utf-8') as f:
+            # 写入内容 - 处理Agent返回的blocks结构（写完后原子替换，失败时保留原文件）
+            with open(tmp_file, 'w', encoding='utf-8') as f:
                 f.write(f"# {content_data.get('section_name', chapter_key)}\n\n")
                 f.write(f"**生成类型**: {content_data.get('generation_type', 'ai')}  \n")
                 f.write(f"**生成时间**: {content_data.get('generated_time', '')}\n\n")
@@ -341,12 +567,15 @@ class ContentGenerationService:
                     else:
                         # 处理文本内容
                         f.write(f"{block_content}\n\n")
+            os.replace(tmp_file, content_file)
             
             logger.info(f"章节内容已保存到: {content_file}")
             return str(content_file)
             
         except Exception as e:
             logger.error(f"保存章节内容失败: {str(e)}")
+            if tmp_file is not None:
+                tmp_file.unlink(missing_ok=True)
             return ""
 
     def _convert_table_to_markdown(self, table_data: Dict[str, Any]) -> str:
@@ -383,161 +612,15 @@ class ContentGenerationService:
             logger.error(f"转换表格到Markdown失败: {str(e)}")
             return str(table_data)
 
-    async def _get_project_info(self, project_id: str) -> Optional[Dict[str, Any]]:
-        """获取项目信息"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT name, project_path, service_mode, created_at
-                FROM projects 
-                WHERE id = ?
-            """, (project_id,))
-            
-            result = cursor.fetchone()
-            
-            # 检查所有项目用于调试
-            cursor.execute('SELECT id, name, project_path FROM projects')
-            all_projects = cursor.fetchall()
-            print(f"DEBUG: All projects in DB: {all_projects}")
-            
-            conn.close()
-            
-            if result:
-                project_name, project_path, service_mode, created_at = result
-                print(f"DEBUG: Found project {project_id}: {project_name}, path: {project_path}")
-                return {
-                    "project_id": project_id,
-                    "project_name": project_name,
-                    "project_path": project_path,
-                    "service_mode": service_mode,
-                    "created_at": created_at
-                }
-            else:
-                print(f"DEBUG: Project {project_id} not found in database")
-            return None
-        except Exception as e:
-            logger.error(f"获取项目信息失败: {str(e)}")
-            return None
-
-    async def _get_framework_data(self, project_id: str) -> Dict[str, Any]:
-        """获取框架数据"""
+    async def _get_material_fingerprints(self, project_id: str, project_path: str) -> Dict[str, str]:
+        """按资料分类计算资料文件指纹"""
         try:
-            # 首先尝试从数据库获取框架数据
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT result_data 
-                FROM step_progress 
-                WHERE project_id = ? AND step_key = ? AND status = 'completed'
-            """, (project_id, "framework-generation"))
-            
-            result = cursor.fetchone()
-            conn.close()
-            
-            if result and result[0]:
-                db_framework_data = json.loads(result[0])
-                print(f"DEBUG: Found framework data in database for project {project_id}")
-                print(f"DEBUG: Database framework keys: {list(db_framework_data.keys())}")
-                
-                # 如果数据库中有框架数据，但只有基本框架，尝试从配置文件获取完整框架
-                if (db_framework_data.get("framework", {}).get("sections", []) and 
-                    len(db_framework_data["framework"]["sections"]) < 10):
-                    
-                    print(f"DEBUG: Database has only {len(db_framework_data['framework']['sections'])} sections, trying config file")
-                    
-                    # 获取项目路径
-                    project_info = await self._get_project_info(project_id)
-                    if project_info and "project_path" in project_info:
-                        project_path = project_info["project_path"]
-                        framework_config_path = os.path.join(project_path, "投标文件框架配置.json")
-                        
-                        if os.path.exists(framework_config_path):
-                            with open(framework_config_path, 'r', encoding='utf-8') as f:
-                                file_framework_data = json.load(f)
-                            
-                            # 合并文件框架数据到数据库框架数据
-                            if "sections" in file_framework_data:
-                                db_framework_data["framework"]["sections"] = file_framework_data["sections"]
-                                print(f"DEBUG: Merged {len(file_framework_data['sections'])} sections from config file")
-                            
-                            return db_framework_data
-                else:
-                    print(f"DEBUG: Using database framework data with {len(db_framework_data.get('framework', {}).get('sections', []))} sections")
-                
-                return db_framework_data
-            else:
-                print(f"DEBUG: No framework data found in database for project {project_id}")
-            
-            # 如果数据库中没有框架数据，尝试从配置文件获取
-            project_info = await self._get_project_info(project_id)
-            if project_info and "project_path" in project_info:
-                project_path = project_info["project_path"]
-                framework_config_path = os.path.join(project_path, "投标文件框架配置.json")
-                
-                print(f"DEBUG: Looking for framework config at: {framework_config_path}")
-                print(f"DEBUG: Config file exists: {os.path.exists(framework_config_path)}")
-                
-                if os.path.exists(framework_config_path):
-                    with open(framework_config_path, 'r', encoding='utf-8') as f:
-                        file_framework_data = json.load(f)
-                    
-                    print(f"DEBUG: Framework config keys: {list(file_framework_data.keys())}")
-                    if "sections" in file_framework_data:
-                        print(f"DEBUG: Number of sections in config: {len(file_framework_data['sections'])}")
-                    
-                    # 直接返回配置文件数据（新格式）
-                    return file_framework_data
-            
-            return {}
+            file_index = get_file_index()
+            await run_io(file_index.ensure_fresh, project_id, project_path)
+            files = await run_io(file_index.list_files, project_id, "materials/")
+            return material_fingerprints(files)
         except Exception as e:
-            logger.error(f"获取框架数据失败: {str(e)}")
-            return {}
-
-    async def _get_analysis_data(self, project_id: str) -> Dict[str, Any]:
-        """获取招标文件分析数据"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT result_data 
-                FROM step_progress 
-                WHERE project_id = ? AND step_key = ? AND status = 'completed'
-            """, (project_id, "bid-analysis"))
-            
-            result = cursor.fetchone()
-            conn.close()
-            
-            if result and result[0]:
-                return json.loads(result[0])
-            return {}
-        except Exception as e:
-            logger.error(f"获取分析数据失败: {str(e)}")
-            return {}
-
-    async def _get_material_data(self, project_id: str) -> Dict[str, Any]:
-        """获取资料管理数据"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT result_data 
-                FROM step_progress 
-                WHERE project_id = ? AND step_key = ? AND status = 'completed'
-            """, (project_id, "material-management"))
-            
-            result = cursor.fetchone()
-            conn.close()
-            
-            if result and result[0]:
-                return json.loads(result[0])
-            return {}
-        except Exception as e:
-            logger.error(f"获取资料数据失败: {str(e)}")
+            logger.warning(f"计算资料指纹失败: {str(e)}")
             return {}
 
     async def _get_ai_service_config(self) -> Dict[str, Any]:
@@ -551,35 +634,6 @@ class ContentGenerationService:
     async def _update_step_progress(self, project_id: str, status: str, progress: int, data: Optional[Dict[str, Any]] = None):
         """更新步骤进度"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # 创建表（如果不存在）
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS step_progress (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    project_id TEXT NOT NULL,
-                    step_key TEXT NOT NULL,
-                    status TEXT NOT NULL,
-                    progress INTEGER DEFAULT 0,
-                    result_data TEXT,
-                    error_message TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(project_id, step_key)
-                )
-            """)
-            
-            result_json = json.dumps(data, ensure_ascii=False) if data else None
-            
-            cursor.execute("""
-                INSERT OR REPLACE INTO step_progress 
-                (project_id, step_key, status, progress, result_data, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (project_id, "content-generation", status, progress, result_json, datetime.now().isoformat()))
-            
-            conn.commit()
-            conn.close()
-            
+            submit_step_progress(self.pool, project_id, "content-generation", status, progress, data)
         except Exception as e:
             logger.error(f"更新步骤进度失败: {str(e)}")
@@ -4,12 +4,19 @@
 
 import os
 import json
-import sqlite3
+import asyncio
+import uuid
 from pathlib import Path
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 import logging
 import shutil
+from ..core.config import get_config
+from ..core.connection_pool import get_connection_pool
+from ..core.executors import run_cpu, run_io
+from ..core.progress_writer import submit_step_progress, flush_step_progress
+from .docx_writer import load_document_styles, render_markdown_fragment, write_docx
+from .office_converter import OfficeConversionError, get_office_converter
 
 logger = logging.getLogger(__name__)
 
@@ -18,25 +25,27 @@ class DocumentExportService:
 
     def __init__(self):
         self.db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "ztbai.db")
+        self.pool = get_connection_pool(self.db_path)
         # 导出文件存储目录
         self.export_root = Path(__file__).parent.parent.parent / "static" / "exports"
         self.export_root.mkdir(parents=True, exist_ok=True)
 
+        # DOCX/PDF 导出：章节并行渲染数、PDF转换超时与是否插入目录
+        config = get_config()
+        self.render_concurrency = max(1, int(config.get("document_export.render_concurrency", 4)))
+        self.pdf_timeout = float(config.get("document_export.pdf_timeout", 600))
+        self.table_of_contents = bool(config.get("document_export.table_of_contents", True))
+
     async def get_status(self, project_id: str) -> Dict[str, Any]:
         """获取文档导出状态"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            await run_io(flush_step_progress, self.pool, project_id, "document-export")
+            result = await self.pool.afetchone("""
                 SELECT status, progress, result_data, updated_at 
                 FROM step_progress 
                 WHERE project_id = ? AND step_key = ?
             """, (project_id, "document-export"))
             
-            result = cursor.fetchone()
-            conn.close()
-            
             if result:
                 status, progress, result_data, updated_at = result
                 return {
@@ -111,18 +120,13 @@ class DocumentExportService:
     async def get_result(self, project_id: str) -> Dict[str, Any]:
         """获取文档导出结果"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            await run_io(flush_step_progress, self.pool, project_id, "document-export")
+            result = await self.pool.afetchone("""
                 SELECT result_data, status, updated_at 
                 FROM step_progress 
                 WHERE project_id = ? AND step_key = ?
             """, (project_id, "document-export"))
             
-            result = cursor.fetchone()
-            conn.close()
-            
             if result and result[0]:
                 result_data, status, updated_at = result
                 return {
@@ -144,18 +148,12 @@ class DocumentExportService:
     async def _get_project_info(self, project_id: str) -> Optional[Dict[str, Any]]:
         """获取项目信息"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            result = await self.pool.afetchone("""
                 SELECT name, project_path, bid_file_name, created_at
                 FROM projects 
                 WHERE id = ?
             """, (project_id,))
             
-            result = cursor.fetchone()
-            conn.close()
-            
             if result:
                 name, project_path, bid_file_name, created_at = result
                 return {
@@ -173,19 +171,13 @@ class DocumentExportService:
     async def _get_content_data(self, project_id: str) -> Dict[str, Any]:
         """获取生成的内容数据"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
             # 获取内容生成结果
-            cursor.execute("""
+            result = await self.pool.afetchone("""
                 SELECT result_data 
                 FROM step_progress 
                 WHERE project_id = ? AND step_key = ? AND status = 'completed'
             """, (project_id, "content-generation"))
             
-            result = cursor.fetchone()
-            conn.close()
-            
             if result and result[0]:
                 return json.loads(result[0])
             else:
@@ -197,19 +189,13 @@ class DocumentExportService:
     async def _get_format_config(self, project_id: str) -> Dict[str, Any]:
         """获取格式配置"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
             # 获取格式配置结果
-            cursor.execute("""
+            result = await self.pool.afetchone("""
                 SELECT result_data 
                 FROM step_progress 
                 WHERE project_id = ? AND step_key = ? AND status = 'completed'
             """, (project_id, "format-config"))
             
-            result = cursor.fetchone()
-            conn.close()
-            
             if result and result[0]:
                 return json.loads(result[0])
             else:
@@ -262,6 +248,11 @@ class DocumentExportService:
                                     export_format: str, export_dir: Path) -> Dict[str, Any]:
         """生成主文档"""
         try:
+            if export_format.lower() in ("docx", "pdf"):
+                return await self._generate_docx_document(
+                    project_id, project_info, content_data, format_config, export_format.lower(), export_dir
+                )
+
             # 构建完整文档内容
             document_content = self._build_document_content(project_info, content_data, format_config)
             
@@ -275,7 +266,7 @@ class DocumentExportService:
                 file_path = export_dir / filename
                 await self._save_markdown_document(file_path, document_content)
             else:
-                # 默认生成HTML文档
+                # 其他格式生成HTML文档
                 filename = f"投标文件_{project_info['name']}.html"
                 file_path = export_dir / filename
                 await self._save_html_document(file_path, document_content, format_config)
@@ -296,6 +287,94 @@ class DocumentExportService:
             logger.error(f"生成主文档失败: {str(e)}")
             raise e
 
+    def _collect_section_files(self, project_info: Dict[str, Any], content_data: Dict[str, Any]) -> List[str]:
+        """按章节顺序收集已生成的章节文件"""
+        content_dir = Path(project_info.get("project_path") or "") / "bid_content"
+        files = []
+        for section in content_data.get("sections", []):
+            if section.get("status") != "completed":
+                continue
+            content_file = section.get("content_file")
+            if not content_file or not os.path.exists(content_file):
+                # 项目目录迁移后按章节标识在当前目录中查找
+                content_file = str(content_dir / f"{section.get('key')}.md")
+                if not os.path.exists(content_file):
+                    logger.warning(f"章节文件不存在，导出时跳过: {section.get('key')}")
+                    continue
+            files.append(content_file)
+        return files
+
+    async def _generate_docx_document(self, project_id: str, project_info: Dict[str, Any],
+                                      content_data: Dict[str, Any], format_config: Dict[str, Any],
+                                      export_format: str, export_dir: Path) -> Dict[str, Any]:
+        """
+        流式生成DOCX（可选再转换为PDF）
+        各章节在CPU进程池中并行渲染为片段文件，再按章节顺序分块写入文档，内存占用与文档总长度无关
+        """
+        section_files = self._collect_section_files(project_info, content_data)
+        styles = await run_io(load_document_styles, project_info.get("project_path"), format_config)
+        render_dir = export_dir / f".render_{uuid.uuid4().hex}"
+        render_dir.mkdir()
+        semaphore = asyncio.Semaphore(self.render_concurrency)
+
+        async def render(index: int, source: str) -> Dict[str, Any]:
+            async with semaphore:
+                target = str(render_dir / f"{index:05d}.xml")
+                info = await run_cpu(render_markdown_fragment, source, target)
+                return {**info, "fragment": target}
+
+        try:
+            rendered = await asyncio.gather(*(render(i, source) for i, source in enumerate(section_files)))
+            await self._update_step_progress(project_id, "in_progress", 75)
+
+            title = project_info.get('name') or "投标文件"
+            cover_lines = [
+                f"项目名称：{title}",
+                f"招标文件：{project_info.get('bid_file_name') or '未知文件'}",
+                f"文档生成时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+            ]
+            filename = f"投标文件_{title}.docx"
+            file_path = export_dir / filename
+            await run_io(
+                write_docx, file_path, styles, title, cover_lines,
+                [item["fragment"] for item in rendered], self.table_of_contents
+            )
+        finally:
+            shutil.rmtree(render_dir, ignore_errors=True)
+
+        document = {
+            "filename": filename,
+            "format": "docx",
+            "url": f"/static/exports/{project_id}/{filename}",
+            "size": file_path.stat().st_size,
+            "path": str(file_path),
+            "type": "main_document",
+            "sections": len(rendered),
+            "paragraphs": sum(item["paragraphs"] for item in rendered),
+            "tables": sum(item["tables"] for item in rendered)
+        }
+        logger.info(f"DOCX文档已生成: {file_path}，共 {len(rendered)} 个章节")
+
+        if export_format == "pdf":
+            pdf_filename = f"投标文件_{title}.pdf"
+            try:
+                converter = get_office_converter()
+                if not converter.available:
+                    raise OfficeConversionError("未找到 LibreOffice（soffice/libreoffice）")
+                pdf_path = await converter.convert(file_path, export_dir / pdf_filename, timeout=self.pdf_timeout)
+                document.update({
+                    "filename": pdf_filename,
+                    "format": "pdf",
+                    "url": f"/static/exports/{project_id}/{pdf_filename}",
+                    "size": pdf_path.stat().st_size,
+                    "path": str(pdf_path),
+                    "docx_url": f"/static/exports/{project_id}/{filename}"
+                })
+            except OfficeConversionError as e:
+                logger.warning(f"PDF转换失败，保留DOCX文档: {e}")
+                document["warning"] = f"PDF转换失败，已导出DOCX文档: {e}"
+        return document
+
     async def _generate_section_document(self, project_id: str, section_id: str,
                                        content_data: Dict[str, Any], format_config: Dict[str, Any],
                                        export_format: str, export_dir: Path) -> Optional[Dict[str, Any]]:
@@ -517,35 +596,6 @@ class DocumentExportService:
     async def _update_step_progress(self, project_id: str, status: str, progress: int, data: Optional[Dict[str, Any]] = None):
         """更新步骤进度"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # 创建表（如果不存在）
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS step_progress (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    project_id TEXT NOT NULL,
-                    step_key TEXT NOT NULL,
-                    status TEXT NOT NULL,
-                    progress INTEGER DEFAULT 0,
-                    result_data TEXT,
-                    error_message TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(project_id, step_key)
-                )
-            """)
-            
-            result_json = json.dumps(data, ensure_ascii=False) if data else None
-            
-            cursor.execute("""
-                INSERT OR REPLACE INTO step_progress 
-                (project_id, step_key, status, progress, result_data, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (project_id, "document-export", status, progress, result_json, datetime.now().isoformat()))
-            
-            conn.commit()
-            conn.close()
-            
+            submit_step_progress(self.pool, project_id, "document-export", status, progress, data)
         except Exception as e:
             logger.error(f"更新步骤进度失败: {str(e)}")
@@ -0,0 +1,367 @@
+"""
+流式 DOCX 写入模块
+不依赖 python-docx，直接生成 WordprocessingML 并写入 zip 包：
+- render_markdown_fragment 把单个章节的 Markdown 文件逐行渲染为 <w:body> 片段文件，
+  为模块级函数，可在 CPU 进程池中并行执行
+- StreamingDocxWriter 按顺序把各片段分块拷贝进 word/document.xml，整个文档不在内存中组装
+- 字体、字号、行距与页边距取自 format_config/document_format.json
+支持的 Markdown 子集：# / ## / ### 标题、段落、**加粗**、无序/有序列表、管道表格。
+"""
+
+import json
+import logging
+import os
+import re
+import shutil
+import uuid
+import zipfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+from xml.sax.saxutils import escape
+
+logger = logging.getLogger(__name__)
+
+PathLike = Union[str, Path]
+
+DEFAULT_STYLES = {
+    "font_family": "宋体",
+    "font_size": 12,
+    "line_height": 1.5,
+    "margin_top": 2.54,
+    "margin_bottom": 2.54,
+    "margin_left": 3.17,
+    "margin_right": 3.17,
+}
+
+# 内容生成写在章节文件开头的元信息行，导出时跳过
+METADATA_PREFIXES = ("**生成类型**", "**生成时间**")
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+_INVALID_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_ORDERED_ITEM = re.compile(r"^(\d+)[.、)]\s+(.*)$")
+_TABLE_SEPARATOR = re.compile(r"^\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?$")
+
+
+def load_document_styles(project_path: Optional[PathLike], format_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """读取文档样式：项目 format_config/document_format.json 优先，其次为格式配置步骤结果"""
+    styles = dict(DEFAULT_STYLES)
+    if format_config:
+        styles.update({k: v for k, v in (format_config.get("config") or {}).items() if k in DEFAULT_STYLES})
+    if project_path:
+        config_file = Path(project_path) / "format_config" / "document_format.json"
+        try:
+            with open(config_file, 'r', encoding='utf-8') as f:
+                styles.update({k: v for k, v in json.load(f).items() if k in DEFAULT_STYLES})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"读取文档格式配置失败，使用默认样式: {config_file} - {e}")
+    return styles
+
+
+# ------------------ 片段渲染 ------------------
+
+def _text(value: str) -> str:
+    return escape(_INVALID_XML_CHARS.sub("", value))
+
+
+def _runs(text: str, bold: bool = False) -> str:
+    """把行内文本转换为 run，支持 **加粗**"""
+    runs = []
+    for index, part in enumerate(text.split("**")):
+        if not part:
+            continue
+        is_bold = bold or index % 2 == 1
+        rpr = "<w:rPr><w:b/></w:rPr>" if is_bold else ""
+        runs.append(f'<w:r>{rpr}<w:t xml:space="preserve">{_text(part)}</w:t></w:r>')
+    return "".join(runs)
+
+
+def _paragraph(text: str, style: Optional[str] = None, bold: bool = False) -> str:
+    ppr = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+    return f"<w:p>{ppr}{_runs(text, bold)}</w:p>"
+
+
+def _split_row(line: str) -> List[str]:
+    line = line.strip()
+    if line.startswith("|"):
+        line = line[1:]
+    if line.endswith("|"):
+        line = line[:-1]
+    return [cell.strip() for cell in line.split("|")]
+
+
+def _table(lines: List[str]) -> str:
+    rows = [_split_row(line) for line in lines if not _TABLE_SEPARATOR.match(line.strip())]
+    if not rows:
+        return ""
+    columns = max(len(row) for row in rows)
+    parts = ['<w:tbl><w:tblPr><w:tblStyle w:val="TableGrid"/><w:tblW w:w="5000" w:type="pct"/></w:tblPr><w:tblGrid>']
+    parts.append('<w:gridCol/>' * columns)
+    parts.append('</w:tblGrid>')
+    for row_index, row in enumerate(rows):
+        parts.append("<w:tr>")
+        for cell in row + [""] * (columns - len(row)):
+            parts.append(f'<w:tc><w:tcPr/>{_paragraph(cell, "TableText", bold=row_index == 0)}</w:tc>')
+        parts.append("</w:tr>")
+    parts.append("</w:tbl>")
+    return "".join(parts)
+
+
+def render_markdown_fragment(source: str, target: str) -> Dict[str, Any]:
+    """
+    把章节 Markdown 文件逐行渲染为 WordprocessingML 片段
+    只缓冲当前表格的行，返回 {title, paragraphs, tables, size}
+    """
+    title = ""
+    paragraphs = 0
+    tables = 0
+    table_lines: List[str] = []
+
+    with open(source, 'r', encoding='utf-8', errors='replace') as src, \
+            open(target, 'w', encoding='utf-8') as out:
+
+        def flush_table():
+            nonlocal tables
+            if table_lines:
+                out.write(_table(table_lines))
+                # 表格后紧跟段落，避免相邻表格被合并
+                out.write("<w:p/>")
+                tables += 1
+                table_lines.clear()
+
+        for raw in src:
+            line = raw.rstrip("\n").rstrip()
+            stripped = line.strip()
+            if stripped.startswith("|"):
+                table_lines.append(stripped)
+                continue
+            flush_table()
+
+            if not stripped or stripped in ("---", "***") or stripped.startswith(METADATA_PREFIXES):
+                continue
+            if stripped.startswith("#"):
+                level = len(stripped) - len(stripped.lstrip("#"))
+                text = stripped[level:].strip()
+                if level == 1 and not title:
+                    title = text
+                out.write(_paragraph(text, f"Heading{min(level, 3)}"))
+            elif stripped.startswith(("- ", "* ", "+ ")):
+                out.write(_paragraph(f"• {stripped[2:].strip()}", "ListText"))
+            else:
+                ordered = _ORDERED_ITEM.match(stripped)
+                if ordered:
+                    out.write(_paragraph(f"{ordered.group(1)}. {ordered.group(2)}", "ListText"))
+                else:
+                    out.write(_paragraph(stripped))
+            paragraphs += 1
+        flush_table()
+
+    return {"title": title, "paragraphs": paragraphs, "tables": tables, "size": os.path.getsize(target)}
+
+
+# ------------------ 包结构 ------------------
+
+def _twips_from_cm(value: Any) -> int:
+    return int(round(float(value) * 567))
+
+
+def _styles_xml(styles: Dict[str, Any]) -> str:
+    font = _text(str(styles["font_family"])).replace('"', "&quot;")
+    size = int(round(float(styles["font_size"]) * 2))
+    line = int(round(float(styles["line_height"]) * 240))
+
+    def heading(style_id: str, name: str, level: int, delta: int, chapter: bool = False) -> str:
+        # pPr 子元素须按架构顺序排列
+        page_break = "<w:pageBreakBefore/>" if chapter else ""
+        align = '<w:jc w:val="center"/>' if chapter else ""
+        return (
+            f'<w:style w:type="paragraph" w:styleId="{style_id}"><w:name w:val="{name}"/>'
+            f'<w:basedOn w:val="Normal"/><w:next w:val="Normal"/><w:qFormat/>'
+            f'<w:pPr><w:keepNext/>{page_break}<w:spacing w:before="240" w:after="120"/>'
+            f'<w:ind w:firstLineChars="0" w:firstLine="0"/>{align}<w:outlineLvl w:val="{level}"/></w:pPr>'
+            f'<w:rPr><w:b/><w:sz w:val="{size + delta * 2}"/><w:szCs w:val="{size + delta * 2}"/></w:rPr></w:style>'
+        )
+
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        f'<w:styles xmlns:w="{W_NS}">'
+        '<w:docDefaults><w:rPrDefault><w:rPr>'
+        f'<w:rFonts w:ascii="{font}" w:hAnsi="{font}" w:eastAsia="{font}" w:cs="{font}"/>'
+        f'<w:sz w:val="{size}"/><w:szCs w:val="{size}"/><w:lang w:val="en-US" w:eastAsia="zh-CN"/>'
+        '</w:rPr></w:rPrDefault><w:pPrDefault><w:pPr>'
+        f'<w:spacing w:after="0" w:line="{line}" w:lineRule="auto"/>'
+        '</w:pPr></w:pPrDefault></w:docDefaults>'
+        '<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/><w:qFormat/>'
+        '<w:pPr><w:ind w:firstLineChars="200"/><w:jc w:val="both"/></w:pPr></w:style>'
+        '<w:style w:type="paragraph" w:styleId="Title"><w:name w:val="Title"/><w:basedOn w:val="Normal"/>'
+        '<w:pPr><w:spacing w:before="2400" w:after="600"/><w:ind w:firstLineChars="0" w:firstLine="0"/><w:jc w:val="center"/></w:pPr>'
+        f'<w:rPr><w:b/><w:sz w:val="{size + 20}"/><w:szCs w:val="{size + 20}"/></w:rPr></w:style>'
+        + heading("Heading1", "heading 1", 0, 4, chapter=True)
+        + heading("Heading2", "heading 2", 1, 2)
+        + heading("Heading3", "heading 3", 2, 1)
+        + '<w:style w:type="paragraph" w:styleId="ListText"><w:name w:val="List Text"/><w:basedOn w:val="Normal"/>'
+        '<w:pPr><w:ind w:left="420" w:firstLineChars="0" w:firstLine="0"/></w:pPr></w:style>'
+        '<w:style w:type="paragraph" w:styleId="TableText"><w:name w:val="Table Text"/><w:basedOn w:val="Normal"/>'
+        '<w:pPr><w:spacing w:line="240" w:lineRule="auto"/><w:ind w:firstLineChars="0" w:firstLine="0"/><w:jc w:val="left"/></w:pPr></w:style>'
+        '<w:style w:type="table" w:styleId="TableGrid"><w:name w:val="Table Grid"/><w:tblPr><w:tblBorders>'
+        + "".join(f'<w:{side} w:val="single" w:sz="4" w:space="0" w:color="000000"/>'
+                  for side in ("top", "left", "bottom", "right", "insideH", "insideV"))
+        + '</w:tblBorders><w:tblCellMar><w:left w:w="108" w:type="dxa"/><w:right w:w="108" w:type="dxa"/></w:tblCellMar>'
+        '</w:tblPr></w:style>'
+        '</w:styles>'
+    )
+
+
+CONTENT_TYPES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '<Override PartName="/word/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>'
+    '<Override PartName="/word/settings.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.settings+xml"/>'
+    '<Override PartName="/docProps/core.xml" ContentType="application/vnd.openxmlformats-package.core-properties+xml"/>'
+    '</Types>'
+)
+
+PACKAGE_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/package/2006/relationships/metadata/core-properties" '
+    'Target="docProps/core.xml"/>'
+    '</Relationships>'
+)
+
+DOCUMENT_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/settings" '
+    'Target="settings.xml"/>'
+    '</Relationships>'
+)
+
+# 打开文档时更新目录域
+SETTINGS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    f'<w:settings xmlns:w="{W_NS}"><w:updateFields w:val="true"/></w:settings>'
+)
+
+
+def _core_xml(title: str) -> str:
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<cp:coreProperties xmlns:cp="http://schemas.openxmlformats.org/package/2006/metadata/core-properties" '
+        'xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:dcterms="http://purl.org/dc/terms/" '
+        'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'
+        f'<dc:title>{_text(title)}</dc:title>'
+        f'<dcterms:created xsi:type="dcterms:W3CDTF">{now}</dcterms:created>'
+        f'<dcterms:modified xsi:type="dcterms:W3CDTF">{now}</dcterms:modified>'
+        '</cp:coreProperties>'
+    )
+
+
+class StreamingDocxWriter:
+    """
+    顺序写入的 DOCX 文档
+    先写入临时文件，close() 成功后原子替换为目标文件；异常退出时删除临时文件
+    """
+
+    def __init__(self, path: PathLike, styles: Optional[Dict[str, Any]] = None, title: str = ""):
+        self.path = Path(path)
+        self.styles = {**DEFAULT_STYLES, **(styles or {})}
+        self.title = title
+        self._tmp_path = self.path.with_name(f".{self.path.name}.{uuid.uuid4().hex}.tmp")
+        self._zip = zipfile.ZipFile(self._tmp_path, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True)
+        self._body = self._zip.open("word/document.xml", "w", force_zip64=True)
+        self._write(
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            f'<w:document xmlns:w="{W_NS}" xmlns:r="{R_NS}"><w:body>'
+        )
+
+    def _write(self, xml: str) -> None:
+        self._body.write(xml.encode("utf-8"))
+
+    def add_paragraph(self, text: str, style: Optional[str] = None) -> None:
+        self._write(_paragraph(text, style))
+
+    def add_table_of_contents(self, title: str = "目录") -> None:
+        """另起一页插入目录域（Word 打开时更新）"""
+        self._write('<w:p><w:r><w:br w:type="page"/></w:r></w:p>')
+        self._write(_paragraph(title, "Heading2"))
+        self._write(
+            '<w:p><w:r><w:fldChar w:fldCharType="begin" w:dirty="true"/></w:r>'
+            '<w:r><w:instrText xml:space="preserve"> TOC \\o "1-2" \\h \\z \\u </w:instrText></w:r>'
+            '<w:r><w:fldChar w:fldCharType="separate"/></w:r>'
+            f'<w:r><w:t>{_text("打开文档后更新域以生成目录")}</w:t></w:r>'
+            '<w:r><w:fldChar w:fldCharType="end"/></w:r></w:p>'
+        )
+
+    def add_fragment(self, fragment_path: PathLike) -> None:
+        """分块拷贝已渲染的片段"""
+        with open(fragment_path, 'rb') as f:
+            shutil.copyfileobj(f, self._body, COPY_CHUNK_SIZE)
+
+    def close(self) -> Path:
+        styles = self.styles
+        self._write(
+            '<w:sectPr><w:pgSz w:w="11906" w:h="16838"/>'
+            f'<w:pgMar w:top="{_twips_from_cm(styles["margin_top"])}" w:right="{_twips_from_cm(styles["margin_right"])}" '
+            f'w:bottom="{_twips_from_cm(styles["margin_bottom"])}" w:left="{_twips_from_cm(styles["margin_left"])}" '
+            'w:header="851" w:footer="992" w:gutter="0"/></w:sectPr>'
+            '</w:body></w:document>'
+        )
+        self._body.close()
+        self._zip.writestr("[Content_Types].xml", CONTENT_TYPES_XML)
+        self._zip.writestr("_rels/.rels", PACKAGE_RELS_XML)
+        self._zip.writestr("word/_rels/document.xml.rels", DOCUMENT_RELS_XML)
+        self._zip.writestr("word/styles.xml", _styles_xml(styles))
+        self._zip.writestr("word/settings.xml", SETTINGS_XML)
+        self._zip.writestr("docProps/core.xml", _core_xml(self.title))
+        self._zip.close()
+        os.replace(self._tmp_path, self.path)
+        return self.path
+
+    def abort(self) -> None:
+        try:
+            self._body.close()
+            self._zip.close()
+        finally:
+            if self._tmp_path.exists():
+                self._tmp_path.unlink()
+
+    def __enter__(self) -> "StreamingDocxWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_docx(path: PathLike, styles: Dict[str, Any], title: str, cover_lines: Iterable[str],
+               fragments: Iterable[PathLike], table_of_contents: bool = True) -> Path:
+    """按顺序组装封面、目录与各章节片段"""
+    with StreamingDocxWriter(path, styles, title) as writer:
+        writer.add_paragraph(title, "Title")
+        for line in cover_lines:
+            writer.add_paragraph(line)
+        if table_of_contents:
+            writer.add_table_of_contents()
+        for fragment in fragments:
+            writer.add_fragment(fragment)
+    return Path(path)
@@ -4,10 +4,10 @@
 
 import os
 import json
-import sqlite3
+import hashlib
 import shutil
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, TextIO, Callable, Awaitable, Tuple
 from datetime import datetime
 import logging
 
@@ -17,14 +17,27 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 from Toolkit.ocr_processor import OCRProcessor
 from Agent.formatting.bid_format_agent import BidFormatAgent
 from Agent.base import AgentConfig
+from ..core.connection_pool import get_connection_pool
+from ..core.executors import run_io
+from ..core.progress_writer import get_progress_writer, TERMINAL_STATUSES
+from ..core.event_bus import publish_step_event
+from ..core.project_resolver import get_project_resolver
+from .artifact_cache import file_sha256, get_artifact_cache
+from .ocr_pipeline import get_ocr_pipeline
+from .office_converter import OfficeConversionError, get_office_converter
 
 logger = logging.getLogger(__name__)
 
+# 投标格式文档的输出目录与文件名
+FORMAT_DOC_DIR = "投标格式文档"
+FORMAT_DOC_PDF = "投标文件格式文档.pdf"
+
 class FileFormattingService:
     """文件格式化服务"""
 
     def __init__(self):
         self.db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "ztbai.db")
+        self.pool = get_connection_pool(self.db_path)
         self.ocr_processor = OCRProcessor()
 
         # 初始化BidFormatAgent
@@ -44,12 +57,9 @@ class FileFormattingService:
     async def get_status(self, project_id: str) -> Dict[str, Any]:
         """获取文件格式化步骤状态"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
+            await run_io(get_progress_writer().flush_pending, self.pool, ("project_progress", str(project_id), "file-formatting"))
             # 查询项目进度表中的file-formatting步骤状态
-            cursor.execute("""
+            row = await self.pool.afetchone("""
                 SELECT status, progress, error_message, started_at, completed_at, 
                        updated_at, task_id
                 FROM project_progress 
@@ -57,9 +67,6 @@ class FileFormattingService:
                 ORDER BY updated_at DESC LIMIT 1
             """, (project_id, "file-formatting"))
             
-            row = cursor.fetchone()
-            conn.close()
-            
             if row:
                 return {
                     "project_id": project_id,
@@ -131,37 +138,64 @@ class FileFormattingService:
 
             step_results = {}
 
+            # 源文件内容哈希作为各阶段产物缓存的键
+            cache = get_artifact_cache()
+            source_hash = await run_io(file_sha256, source_pdf) if cache.enabled else None
+            variant = f"clean={int(bool(clean_pdf))}"
+
             # 步骤1: 文件格式检测
             await self._update_step_progress(project_id, "in_progress", 20)
-            detect_result = await self._detect_file_format(source_pdf)
-            step_results["detect"] = {"status": "completed", "result": detect_result}
+            detect_result, cached = await self._run_cached_stage(
+                "detect", source_hash, project_dir, [],
+                lambda: self._detect_file_format(source_pdf)
+            )
+            detect_result["original_file"] = str(source_pdf)
+            step_results["detect"] = {"status": "completed", "result": detect_result, "cached": cached}
 
             # 步骤2: PDF清理
             if clean_pdf:
                 await self._update_step_progress(project_id, "in_progress", 40)
-                cleaned_pdf = await self._clean_pdf(source_pdf, project_dir)
-                step_results["clean"] = {"status": "completed", "output": str(cleaned_pdf)}
+                clean_result, cached = await self._run_cached_stage(
+                    "clean", source_hash, project_dir, ["cleaned.pdf"],
+                    lambda: self._stage_output(self._clean_pdf(source_pdf, project_dir))
+                )
+                cleaned_pdf = Path(clean_result["output"])
+                step_results["clean"] = {"status": "completed", "output": str(cleaned_pdf), "cached": cached}
             else:
                 cleaned_pdf = source_pdf
                 step_results["clean"] = {"status": "skipped"}
 
             # 步骤3: 投标文件格式提取
             await self._update_step_progress(project_id, "in_progress", 50)
-            format_doc_result = await self._extract_bid_format_document(cleaned_pdf, project_dir, project_id)
-            step_results["format_extract"] = {"status": "completed", "result": format_doc_result}
+            format_doc_result, cached = await self._run_cached_stage(
+                "extract", source_hash, project_dir, [f"{FORMAT_DOC_DIR}/{FORMAT_DOC_PDF}"],
+                lambda: self._extract_bid_format_document(cleaned_pdf, project_dir, project_id),
+                variant=variant
+            )
+            step_results["format_extract"] = {"status": "completed", "result": format_doc_result, "cached": cached}
 
             # 步骤4: OCR内容提取
             if extract_text:
                 await self._update_step_progress(project_id, "in_progress", 70)
-                extract_result = await self._extract_content_from_format_doc(format_doc_result, project_dir)
-                step_results["extract"] = {"status": "completed", "result": extract_result}
+                extract_result, cached = await self._run_cached_stage(
+                    "ocr", source_hash, project_dir,
+                    [f"{FORMAT_DOC_DIR}/page_*.json", f"{FORMAT_DOC_DIR}/ocr_summary.json",
+                     f"{FORMAT_DOC_DIR}/extracted_text.txt"],
+                    lambda: self._extract_content_from_format_doc(format_doc_result, project_dir, project_id),
+                    variant=variant
+                )
+                step_results["extract"] = {"status": "completed", "result": extract_result, "cached": cached}
             else:
                 step_results["extract"] = {"status": "skipped"}
 
             # 步骤4: 格式化PDF生成
             await self._update_step_progress(project_id, "in_progress", 80)
-            format_pdf = await self._generate_format_pdf(cleaned_pdf, project_dir)
-            step_results["html"] = {"status": "completed", "output": str(format_pdf)}
+            html_result, cached = await self._run_cached_stage(
+                "html", source_hash, project_dir, ["format.pdf"],
+                lambda: self._stage_output(self._generate_format_pdf(cleaned_pdf, project_dir)),
+                variant=variant
+            )
+            step_results["html"] = {"status": "completed", "output": html_result["output"], "cached": cached}
 
             await self._update_step_progress(project_id, "completed", 100)
 
@@ -173,6 +207,32 @@ class FileFormattingService:
             await self._update_step_progress(project_id, "error", 0)
             raise e
 
+    async def _run_cached_stage(self, stage: str, source_hash: Optional[str], project_dir: Path,
+                                outputs: List[str], compute: Callable[[], Awaitable[Dict[str, Any]]],
+                                variant: str = "") -> Tuple[Dict[str, Any], bool]:
+        """
+        执行一个处理阶段：源文件与阶段版本未变化时直接从产物缓存还原输出，否则重新计算并写入缓存
+        outputs 为该阶段输出文件相对项目目录的 glob 模式；返回 (阶段结果, 是否命中缓存)
+        """
+        cache = get_artifact_cache()
+        if source_hash:
+            entry = await run_io(cache.lookup, source_hash, stage, variant)
+            if entry is not None:
+                result = await run_io(cache.materialize, entry, project_dir, outputs)
+                logger.info(f"文件格式化阶段 {stage} 命中产物缓存，跳过计算")
+                return result, True
+            await run_io(cache.detach, project_dir, outputs)
+
+        result = await compute()
+        if source_hash:
+            await run_io(cache.store, source_hash, stage, project_dir, outputs, result, variant)
+        return result, False
+
+    @staticmethod
+    async def _stage_output(coro: Awaitable[Path]) -> Dict[str, Any]:
+        """将只返回输出路径的阶段包装为结果字典"""
+        return {"output": str(await coro)}
+
     async def get_result(self, project_id: str) -> Dict[str, Any]:
         """获取文件格式化结果"""
         project_path = await self._get_project_path_by_id(project_id) or ""
@@ -190,12 +250,12 @@ class FileFormattingService:
             result["format_pdf"] = str(format_pdf)
 
         # 检查投标格式文档目录
-        format_doc_dir = project_dir / "投标格式文档"
+        format_doc_dir = project_dir / FORMAT_DOC_DIR
         if format_doc_dir.exists():
             result["format_doc_dir"] = str(format_doc_dir)
 
             # 检查投标文件格式文档PDF
-            format_doc_pdf = format_doc_dir / "投标文件格式文档.pdf"
+            format_doc_pdf = format_doc_dir / FORMAT_DOC_PDF
             if format_doc_pdf.exists():
                 result["format_doc_pdf"] = str(format_doc_pdf)
 
@@ -222,9 +282,6 @@ class FileFormattingService:
     async def _update_step_progress(self, project_id: str, status: str, progress: int, data: Optional[Dict[str, Any]] = None):
         """更新步骤进度"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
             # 构建数据
             task_id = data.get("task_id") if data else None
             error_message = data.get("error") if data else None
@@ -234,8 +291,11 @@ class FileFormattingService:
             started_at = now if status == "in_progress" and progress == 0 else None
             completed_at = now if status in ["completed", "failed", "error"] else None
             
-            # 插入或更新进度记录
-            cursor.execute("""
+            # 插入或更新进度记录（由进度写入器合并后批量写入，终态立即写入）
+            get_progress_writer().submit(
+                self.pool,
+                ("project_progress", str(project_id), "file-formatting"),
+                """
                 INSERT OR REPLACE INTO project_progress 
                 (project_id, step_key, status, progress, error_message, task_id, 
                  started_at, completed_at, updated_at)
@@ -244,13 +304,16 @@ class FileFormattingService:
                                  (SELECT started_at FROM project_progress 
                                   WHERE project_id = ? AND step_key = ?)), 
                         ?, ?)
-            """, (
-                project_id, "file-formatting", status, progress, error_message, task_id,
-                started_at, project_id, "file-formatting", completed_at, now
-            ))
-            
-            conn.commit()
-            conn.close()
+                """,
+                (
+                    project_id, "file-formatting", status, progress, error_message, task_id,
+                    started_at, project_id, "file-formatting", completed_at, now
+                ),
+                immediate=status in TERMINAL_STATUSES
+            )
+            extra = {k: data[k] for k in ("stage", "ocr_pages_done", "ocr_pages_total") if data and k in data}
+            publish_step_event(project_id, "file-formatting", status, progress,
+                               task_id=task_id, error_message=error_message, **extra)
             
             logger.info(f"更新文件格式化步骤进度: {project_id}, 状态: {status}, 进度: {progress}%")
             
@@ -266,29 +329,13 @@ class FileFormattingService:
 
             logger.info(f"开始DOCX转PDF: {docx_file} -> {pdf_file}")
 
-            # 这里应该使用实际的DOCX转PDF工具
-            # 目前使用简化实现：复制文件（实际应该使用LibreOffice或其他转换工具）
             try:
-                # 尝试使用LibreOffice进行转换
-                import subprocess
-                cmd = [
-                    'libreoffice',
-                    '--headless',
-                    '--convert-to', 'pdf',
-                    '--outdir', str(project_dir),
-                    str(docx_file)
-                ]
-
-                result = subprocess.run(cmd, check=True, timeout=60, capture_output=True)
-
-                if pdf_file.exists():
-                    logger.info(f"DOCX转PDF成功: {pdf_file}")
-                    return pdf_file
-                else:
-                    logger.error("DOCX转PDF失败，文件未生成")
-                    return None
+                # 使用常驻LibreOffice实例池转换，免去每次冷启动
+                await get_office_converter().convert(docx_file, pdf_file)
+                logger.info(f"DOCX转PDF成功: {pdf_file}")
+                return pdf_file
 
-            except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired) as e:
+            except OfficeConversionError as e:
                 logger.warning(f"LibreOffice转换失败: {e}")
                 # 备用方案：创建一个提示文件
                 with open(pdf_file, 'w', encoding='utf-8') as f:
@@ -321,11 +368,11 @@ class FileFormattingService:
         """从招标文件中提取投标文件格式部分"""
         try:
             # 创建投标格式文档目录
-            format_doc_dir = project_dir / "投标格式文档"
+            format_doc_dir = project_dir / FORMAT_DOC_DIR
             format_doc_dir.mkdir(exist_ok=True)
 
             # 生成投标文件格式文档PDF
-            format_doc_pdf = format_doc_dir / "投标文件格式文档.pdf"
+            format_doc_pdf = format_doc_dir / FORMAT_DOC_PDF
 
             logger.info(f"开始使用AI Agent提取投标文件格式部分: {source_pdf}")
 
@@ -347,7 +394,7 @@ class FileFormattingService:
                     # 如果提取的文件不在目标位置，移动到目标位置
                     if Path(extracted_file).exists():
                         if Path(extracted_file) != format_doc_pdf:
-                            shutil.move(extracted_file, format_doc_pdf)
+                            await run_io(shutil.move, extracted_file, format_doc_pdf)
                         logger.info(f"AI Agent成功提取投标文件格式部分: {format_doc_pdf}")
 
                         return {
@@ -384,7 +431,7 @@ class FileFormattingService:
 
             # 简单实现：复制原文件作为清理后的文件
             # 在实际应用中，这里应该实现PDF清理逻辑
-            shutil.copy2(source_pdf, cleaned_pdf)
+            await run_io(shutil.copy2, source_pdf, cleaned_pdf)
 
             logger.info(f"PDF清理完成: {cleaned_pdf}")
             return cleaned_pdf
@@ -393,7 +440,23 @@ class FileFormattingService:
             logger.error(f"PDF清理失败: {e}")
             raise e
 
-    async def _extract_content_from_format_doc(self, format_doc_result: Dict[str, Any], project_dir: Path) -> Dict[str, Any]:
+    def _ocr_progress_callback(self, project_id: Optional[str]):
+        """OCR逐页进度回调：映射到步骤进度的 70~80 区间"""
+        if not project_id:
+            return None
+
+        async def on_progress(done: int, total: int):
+            if total > 0:
+                await self._update_step_progress(project_id, "in_progress", 70 + int(10 * done / total), {
+                    "stage": "ocr",
+                    "ocr_pages_done": done,
+                    "ocr_pages_total": total
+                })
+
+        return on_progress
+
+    async def _extract_content_from_format_doc(self, format_doc_result: Dict[str, Any], project_dir: Path,
+                                               project_id: Optional[str] = None) -> Dict[str, Any]:
         """从投标文件格式文档中提取内容并进行OCR处理"""
         try:
             format_doc_pdf = Path(format_doc_result["format_doc_pdf"])
@@ -401,10 +464,12 @@ class FileFormattingService:
 
             logger.info(f"开始OCR处理投标格式文档: {format_doc_pdf}")
 
-            # 使用真实的OCR处理器处理投标格式文档
-            ocr_result = self.ocr_processor.process_pdf_to_json(
-                str(format_doc_pdf),
-                str(format_doc_dir)
+            # 逐页并行OCR，已完成的页面直接复用
+            ocr_result = await get_ocr_pipeline().run(
+                format_doc_pdf,
+                format_doc_dir,
+                on_progress=self._ocr_progress_callback(project_id),
+                fallback_processor=self.ocr_processor
             )
 
             if not ocr_result.get('success', False):
@@ -430,8 +495,7 @@ class FileFormattingService:
                     "document_type": "投标文件格式文档"
                 }, f, ensure_ascii=False, indent=2)
 
-            # 提取所有文本内容到文本文件
-            all_text = await self._extract_all_text_from_json_files(format_doc_dir)
+            # 提取所有文本内容到文本文件（逐页流式写入）
             text_file = format_doc_dir / "extracted_text.txt"
             with open(text_file, 'w', encoding='utf-8') as f:
                 f.write(f"投标文件格式文档OCR提取结果\n")
@@ -444,7 +508,7 @@ class FileFormattingService:
                 f.write(f"\n{'='*50}\n")
                 f.write(f"提取的文本内容:\n")
                 f.write(f"{'='*50}\n\n")
-                f.write(all_text)
+                await self._write_text_from_json_files(format_doc_dir, f)
 
             logger.info(f"投标格式文档OCR处理完成: 总页数 {total_pages}, 处理页数 {processed_pages}")
 
@@ -464,7 +528,8 @@ class FileFormattingService:
             # 直接抛出异常，不创建备用结果
             raise e
 
-    async def _extract_content(self, pdf_file: Path, project_dir: Path) -> Dict[str, Any]:
+    async def _extract_content(self, pdf_file: Path, project_dir: Path,
+                               project_id: Optional[str] = None) -> Dict[str, Any]:
         """提取内容并进行真实OCR处理"""
         try:
             ocr_dir = project_dir / "ocr_results"
@@ -472,10 +537,12 @@ class FileFormattingService:
 
             logger.info(f"开始OCR处理: {pdf_file}")
 
-            # 使用真实的OCR处理器
-            ocr_result = self.ocr_processor.process_pdf_to_json(
-                str(pdf_file),
-                str(ocr_dir)
+            # 逐页并行OCR，已完成的页面直接复用
+            ocr_result = await get_ocr_pipeline().run(
+                pdf_file,
+                ocr_dir,
+                on_progress=self._ocr_progress_callback(project_id),
+                fallback_processor=self.ocr_processor
             )
 
             if not ocr_result.get('success', False):
@@ -500,8 +567,7 @@ class FileFormattingService:
                     "output_directory": str(ocr_dir)
                 }, f, ensure_ascii=False, indent=2)
 
-            # 提取所有文本内容到文本文件
-            all_text = await self._extract_all_text_from_json_files(ocr_dir)
+            # 提取所有文本内容到文本文件（逐页流式写入）
             text_file = ocr_dir / "extracted_text.txt"
             with open(text_file, 'w', encoding='utf-8') as f:
                 f.write(f"OCR提取结果\n")
@@ -513,7 +579,7 @@ class FileFormattingService:
                 f.write(f"\n{'='*50}\n")
                 f.write(f"提取的文本内容:\n")
                 f.write(f"{'='*50}\n\n")
-                f.write(all_text)
+                await self._write_text_from_json_files(ocr_dir, f)
 
             logger.info(f"OCR处理完成: 总页数 {total_pages}, 处理页数 {processed_pages}")
 
@@ -532,10 +598,15 @@ class FileFormattingService:
             raise e
 
 
-    async def _extract_all_text_from_json_files(self, ocr_dir: Path) -> str:
-        """从所有JSON文件中提取文本内容"""
+    async def _write_text_from_json_files(self, ocr_dir: Path, out: TextIO) -> Dict[str, int]:
+        """
+        从所有JSON文件中提取文本内容，逐页直接写入 out
+        内存占用只与单页大小相关；完整文本（full_text）的去重基于页内比较与
+        已写入文本的哈希集合，不再对累计文本做子串搜索
+        """
+        stats = {"pages": 0, "skipped_full_text": 0, "failed_pages": 0}
         try:
-            all_text = ""
+            seen_hashes = set()
             json_files = sorted(ocr_dir.glob("page_*.json"))
 
             for json_file in json_files:
@@ -544,30 +615,43 @@ class FileFormattingService:
                         data = json.load(f)
 
                     page_num = data.get('page_info', {}).get('page_number', 0)
-                    all_text += f"\n--- 第 {page_num} 页 ---\n"
 
                     # 提取文本块
-                    text_blocks = data.get('text_blocks', [])
-                    for block in text_blocks:
+                    block_lines = []
+                    for block in data.get('text_blocks', []):
                         text = block.get('text', '').strip()
                         if text:
-                            all_text += text + "\n"
-
-                    # 如果有full_text字段，也添加进来
-                    if 'full_text' in data:
-                        full_text = data['full_text'].strip()
-                        if full_text and full_text not in all_text:
-                            all_text += f"\n完整文本:\n{full_text}\n"
+                            block_lines.append(text)
+                            seen_hashes.add(hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest())
+                    page_text = "\n".join(block_lines)
+
+                    out.write(f"\n--- 第 {page_num} 页 ---\n")
+                    if page_text:
+                        out.write(page_text + "\n")
+                        seen_hashes.add(hashlib.blake2b(page_text.encode('utf-8'), digest_size=16).digest())
+
+                    # 如果有full_text字段，且与本页文本块及已写入的文本不重复，也添加进来
+                    full_text = (data.get('full_text') or '').strip()
+                    if full_text:
+                        digest = hashlib.blake2b(full_text.encode('utf-8'), digest_size=16).digest()
+                        if digest in seen_hashes or full_text in page_text:
+                            stats["skipped_full_text"] += 1
+                        else:
+                            seen_hashes.add(digest)
+                            out.write(f"\n完整文本:\n{full_text}\n")
+                    stats["pages"] += 1
 
                 except Exception as e:
+                    stats["failed_pages"] += 1
                     logger.warning(f"读取JSON文件失败 {json_file}: {e}")
                     continue
 
-            return all_text
+            return stats
 
         except Exception as e:
             logger.error(f"提取文本内容失败: {e}")
-            return "文本提取失败"
+            out.write("文本提取失败")
+            return stats
 
     async def _generate_format_pdf(self, source_pdf: Path, project_dir: Path) -> Path:
         """生成格式化PDF"""
@@ -576,7 +660,7 @@ class FileFormattingService:
 
             # 简单实现：复制原文件作为格式化文件
             # 在实际应用中，这里应该实现PDF格式化逻辑
-            shutil.copy2(source_pdf, format_pdf)
+            await run_io(shutil.copy2, source_pdf, format_pdf)
 
             logger.info(f"格式化PDF生成完成: {format_pdf}")
             return format_pdf
@@ -587,12 +671,6 @@ class FileFormattingService:
 
     async def _get_project_path_by_id(self, project_id: str) -> Optional[str]:
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute("SELECT project_path FROM projects WHERE id = ?", (project_id,))
-            row = cursor.fetchone()
-            conn.close()
-            return row['project_path'] if row else None
+            return await get_project_resolver(self.db_path).aget_path(project_id)
         except Exception:
             return None
@@ -4,11 +4,13 @@
 
 import os
 import json
-import sqlite3
 from pathlib import Path
 from typing import Optional, Dict, Any
 from datetime import datetime
 import logging
+from ..core.connection_pool import get_connection_pool
+from ..core.executors import run_io
+from ..core.progress_writer import submit_step_progress, flush_step_progress
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +19,7 @@ class FormatConfigService:
 
     def __init__(self):
         self.db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "ztbai.db")
+        self.pool = get_connection_pool(self.db_path)
         self.config_templates = {
             "standard": {
                 "template_name": "标准模板",
@@ -43,18 +46,13 @@ class FormatConfigService:
     async def get_status(self, project_id: str) -> Dict[str, Any]:
         """获取格式配置状态"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            await run_io(flush_step_progress, self.pool, project_id, "format-config")
+            result = await self.pool.afetchone("""
                 SELECT status, progress, result_data, updated_at 
                 FROM step_progress 
                 WHERE project_id = ? AND step_key = ?
             """, (project_id, "format-config"))
             
-            result = cursor.fetchone()
-            conn.close()
-            
             if result:
                 status, progress, result_data, updated_at = result
                 return {
@@ -128,18 +126,13 @@ class FormatConfigService:
     async def get_result(self, project_id: str) -> Dict[str, Any]:
         """获取格式配置结果"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            await run_io(flush_step_progress, self.pool, project_id, "format-config")
+            result = await self.pool.afetchone("""
                 SELECT result_data, status, updated_at 
                 FROM step_progress 
                 WHERE project_id = ? AND step_key = ?
             """, (project_id, "format-config"))
             
-            result = cursor.fetchone()
-            conn.close()
-            
             if result and result[0]:
                 result_data, status, updated_at = result
                 return {
@@ -273,18 +266,12 @@ th {{
     async def _get_project_info(self, project_id: str) -> Optional[Dict[str, Any]]:
         """获取项目信息"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            result = await self.pool.afetchone("""
                 SELECT name, project_path, service_mode, created_at
                 FROM projects 
                 WHERE id = ?
             """, (project_id,))
             
-            result = cursor.fetchone()
-            conn.close()
-            
             if result:
                 project_name, project_path, service_mode, created_at = result
                 return {
@@ -302,35 +289,6 @@ th {{
     async def _update_step_progress(self, project_id: str, status: str, progress: int, data: Optional[Dict[str, Any]] = None):
         """更新步骤进度"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # 创建表（如果不存在）
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS step_progress (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    project_id TEXT NOT NULL,
-                    step_key TEXT NOT NULL,
-                    status TEXT NOT NULL,
-                    progress INTEGER DEFAULT 0,
-                    result_data TEXT,
-                    error_message TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(project_id, step_key)
-                )
-            """)
-            
-            result_json = json.dumps(data, ensure_ascii=False) if data else None
-            
-            cursor.execute("""
-                INSERT OR REPLACE INTO step_progress 
-                (project_id, step_key, status, progress, result_data, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (project_id, "format-config", status, progress, result_json, datetime.now().isoformat()))
-            
-            conn.commit()
-            conn.close()
-            
+            submit_step_progress(self.pool, project_id, "format-config", status, progress, data)
         except Exception as e:
             logger.error(f"更新步骤进度失败: {str(e)}")
@@ -4,11 +4,9 @@
 
 import os
 import json
-import sqlite3
 import asyncio
 from pathlib import Path
 from typing import Optional, Dict, Any, List
-from datetime import datetime
 import logging
 
 # 导入Agent系统
@@ -16,6 +14,9 @@ from Agent.base.agent_manager import AgentManager
 from Agent.base.base_agent import AgentConfig, AgentResult
 from Agent.generation.bid_framework_agent import BidFrameworkAgent
 from ..core.repository import Repository
+from ..core.connection_pool import get_connection_pool
+from ..core.executors import run_io
+from ..core.progress_writer import submit_step_progress, flush_step_progress
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +25,7 @@ class FrameworkGenerationService:
 
     def __init__(self):
         self.db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "ztbai.db")
+        self.pool = get_connection_pool(self.db_path)
         self.repository = Repository()
         self.agent_manager = AgentManager()
         self._register_agents()
@@ -35,19 +37,14 @@ class FrameworkGenerationService:
     async def get_status(self, project_id: str) -> Dict[str, Any]:
         """获取框架生成状态"""
         try:
+            await run_io(flush_step_progress, self.pool, project_id, "framework-generation")
             # 从数据库获取实际状态
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            result = await self.pool.afetchone("""
                 SELECT status, progress, result_data, updated_at 
                 FROM step_progress 
                 WHERE project_id = ? AND step_key = ?
             """, (project_id, "framework-generation"))
             
-            result = cursor.fetchone()
-            conn.close()
-            
             if result:
                 status, progress, result_data, updated_at = result
                 return {
@@ -143,19 +140,14 @@ class FrameworkGenerationService:
     async def get_result(self, project_id: str) -> Dict[str, Any]:
         """获取框架生成结果"""
         try:
+            await run_io(flush_step_progress, self.pool, project_id, "framework-generation")
             # 从数据库获取结果
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            result = await self.pool.afetchone("""
                 SELECT result_data, status, updated_at 
                 FROM step_progress 
                 WHERE project_id = ? AND step_key = ?
             """, (project_id, "framework-generation"))
             
-            result = cursor.fetchone()
-            conn.close()
-            
             if result and result[0]:
                 result_data, status, updated_at = result
                 return {
@@ -180,18 +172,12 @@ class FrameworkGenerationService:
     async def _get_project_info(self, project_id: str) -> Optional[Dict[str, Any]]:
         """获取项目信息"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            result = await self.pool.afetchone("""
                 SELECT name, project_path, service_mode, created_at
                 FROM projects 
                 WHERE id = ?
             """, (project_id,))
             
-            result = cursor.fetchone()
-            conn.close()
-            
             if result:
                 project_name, project_path, service_mode, created_at = result
                 return {
@@ -210,18 +196,12 @@ class FrameworkGenerationService:
         """获取招标文件分析数据"""
         try:
             # 从step_progress表获取分析结果
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            result = await self.pool.afetchone("""
                 SELECT result_data 
                 FROM step_progress 
                 WHERE project_id = ? AND step_key = ? AND status = 'completed'
             """, (project_id, "bid-analysis"))
             
-            result = cursor.fetchone()
-            conn.close()
-            
             if result and result[0]:
                 return json.loads(result[0])
             return {}
@@ -276,35 +256,6 @@ class FrameworkGenerationService:
     async def _update_step_progress(self, project_id: str, status: str, progress: int, data: Optional[Dict[str, Any]] = None):
         """更新步骤进度"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # 创建表（如果不存在）
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS step_progress (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    project_id TEXT NOT NULL,
-                    step_key TEXT NOT NULL,
-                    status TEXT NOT NULL,
-                    progress INTEGER DEFAULT 0,
-                    result_data TEXT,
-                    error_message TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(project_id, step_key)
-                )
-            """)
-            
-            result_json = json.dumps(data, ensure_ascii=False) if data else None
-            
-            cursor.execute("""
-                INSERT OR REPLACE INTO step_progress 
-                (project_id, step_key, status, progress, result_data, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (project_id, "framework-generation", status, progress, result_json, datetime.now().isoformat()))
-            
-            conn.commit()
-            conn.close()
-            
+            submit_step_progress(self.pool, project_id, "framework-generation", status, progress, data)
         except Exception as e:
             logger.error(f"更新步骤进度失败: {str(e)}")
@@ -0,0 +1,228 @@
+"""
+内容生成上下文模块
+按项目缓存内容生成所需的输入数据（项目信息、框架、招标分析、资料管理结果）：
+- 每次获取时只查询版本信息：step_progress 各步骤的 status / updated_at / result_data 长度、
+  框架配置文件的修改时间与大小、项目路径与服务模式；版本未变化时直接复用已解析的数据
+- 版本变化时重新读取并解析，同一项目的并发请求只加载一次
+- 框架章节按章节标识与 section_id 建立索引，章节查找为 O(1)
+上下文对象在多个章节生成与并发请求之间共享，使用方不得修改其中的数据。
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..core.config import get_config
+from ..core.connection_pool import get_connection_pool
+from ..core.executors import run_io
+from ..core.project_resolver import get_project_resolver
+from .generation_dependencies import LEGACY_KEY_PATTERN, make_chapter_key
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_STEPS = ("framework-generation", "bid-analysis", "material-management")
+FRAMEWORK_CONFIG_NAME = "投标文件框架配置.json"
+
+# 数据库中的框架章节少于该数量时视为基本框架，改用框架配置文件中的章节
+MIN_DB_FRAMEWORK_SECTIONS = 10
+
+
+class GenerationContext:
+    """单个项目的内容生成输入（只读）"""
+
+    def __init__(self, project_info: Dict[str, Any], framework_data: Dict[str, Any],
+                 analysis_data: Dict[str, Any], material_data: Dict[str, Any], version: Tuple):
+        self.project_info = project_info
+        self.framework_data = framework_data
+        self.analysis_data = analysis_data
+        self.material_data = material_data
+        self.version = version
+
+        # 章节索引：稳定标识 -> 章节，section_id -> 首个章节及同 ID 章节数
+        self.chapter_keys: List[str] = []
+        self._by_key: Dict[str, Dict[str, Any]] = {}
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._id_counts: Dict[str, int] = {}
+        for section in self.sections:
+            section_id = section.get("section_id")
+            if not section_id:
+                continue
+            key = make_chapter_key(section_id, section.get("section_name", ""))
+            if key not in self._by_key:
+                self._by_key[key] = section
+                self.chapter_keys.append(key)
+            self._by_id.setdefault(section_id, section)
+            self._id_counts[section_id] = self._id_counts.get(section_id, 0) + 1
+
+    @property
+    def sections(self) -> List[Dict[str, Any]]:
+        return (self.framework_data or {}).get("sections") or []
+
+    def find_section(self, chapter_key: str) -> Optional[Dict[str, Any]]:
+        """根据章节标识、section_id 或旧版标识（section_id 唯一时）查找章节定义"""
+        section = self._by_key.get(chapter_key) or self._by_id.get(chapter_key)
+        if section is None:
+            legacy = LEGACY_KEY_PATTERN.match(chapter_key)
+            if legacy and self._id_counts.get(legacy.group("section_id")) == 1:
+                section = self._by_id[legacy.group("section_id")]
+        return section
+
+
+def _load_json(value: Optional[str]) -> Dict[str, Any]:
+    return json.loads(value) if value else {}
+
+
+def _load_framework(db_framework: Dict[str, Any], framework_path: str) -> Dict[str, Any]:
+    """合并数据库框架数据与框架配置文件（与原 _get_framework_data 规则一致）"""
+    if db_framework:
+        sections = db_framework.get("framework", {}).get("sections", [])
+        if sections and len(sections) < MIN_DB_FRAMEWORK_SECTIONS and os.path.exists(framework_path):
+            with open(framework_path, 'r', encoding='utf-8') as f:
+                file_framework = json.load(f)
+            if "sections" in file_framework:
+                db_framework["framework"]["sections"] = file_framework["sections"]
+        return db_framework
+
+    if os.path.exists(framework_path):
+        with open(framework_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+class GenerationContextCache:
+    """按项目缓存内容生成上下文"""
+
+    def __init__(self, db_path: Optional[str] = None, max_projects: int = 64):
+        self.pool = get_connection_pool(db_path)
+        self.resolver = get_project_resolver(db_path)
+        self.max_projects = max(1, int(max_projects))
+        self._lock = threading.Lock()
+        self._contexts: "OrderedDict[str, GenerationContext]" = OrderedDict()
+        # 加载锁在事件循环内按项目创建，无人等待时自动回收
+        self._load_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+        # 统计信息
+        self._hits = 0
+        self._loads = 0
+
+    async def _version(self, project_id: str) -> Optional[Tuple]:
+        """获取项目输入的版本信息，项目不存在时返回 None"""
+        project = await self.resolver.aget_project(project_id)
+        if not project or not project.get("project_path"):
+            return None
+        placeholders = ", ".join("?" for _ in CONTEXT_STEPS)
+        rows = await self.pool.afetchall(
+            f"SELECT step_key, status, updated_at, length(result_data) FROM step_progress "
+            f"WHERE project_id = ? AND step_key IN ({placeholders})",
+            (project_id, *CONTEXT_STEPS),
+        )
+        try:
+            stat = os.stat(os.path.join(project["project_path"], FRAMEWORK_CONFIG_NAME))
+            framework_file = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            framework_file = None
+        return (
+            project["project_path"],
+            project.get("service_mode"),
+            project.get("name"),
+            tuple(sorted(tuple(row) for row in rows)),
+            framework_file,
+        )
+
+    def _load(self, project_id: str, project: Dict[str, Any], version: Tuple) -> GenerationContext:
+        rows = self.pool.fetchall(
+            f"SELECT step_key, result_data FROM step_progress "
+            f"WHERE project_id = ? AND status = 'completed' AND step_key IN ({', '.join('?' for _ in CONTEXT_STEPS)})",
+            (project_id, *CONTEXT_STEPS),
+        )
+        results = {row[0]: row[1] for row in rows}
+        project_path = project["project_path"]
+        project_info = {
+            "project_id": project_id,
+            "project_name": project.get("name"),
+            "name": project.get("name"),
+            "project_path": project_path,
+            "service_mode": project.get("service_mode"),
+        }
+        return GenerationContext(
+            project_info,
+            _load_framework(_load_json(results.get("framework-generation")),
+                            os.path.join(project_path, FRAMEWORK_CONFIG_NAME)),
+            _load_json(results.get("bid-analysis")),
+            _load_json(results.get("material-management")),
+            version,
+        )
+
+    async def get(self, project_id: Any) -> Optional[GenerationContext]:
+        """获取项目的生成上下文，项目不存在时返回 None"""
+        project_id = str(project_id)
+        version = await self._version(project_id)
+        if version is None:
+            return None
+
+        with self._lock:
+            context = self._contexts.get(project_id)
+            if context is not None and context.version == version:
+                self._contexts.move_to_end(project_id)
+                self._hits += 1
+                return context
+
+        load_lock = self._load_locks.get(project_id)
+        if load_lock is None:
+            load_lock = asyncio.Lock()
+            self._load_locks[project_id] = load_lock
+        async with load_lock:
+            # 等待期间其他请求可能已加载同一版本
+            version = await self._version(project_id)
+            if version is None:
+                return None
+            with self._lock:
+                context = self._contexts.get(project_id)
+                if context is not None and context.version == version:
+                    self._hits += 1
+                    return context
+
+            project = await self.resolver.aget_project(project_id)
+            context = await run_io(self._load, project_id, project, version)
+            with self._lock:
+                self._loads += 1
+                self._contexts[project_id] = context
+                self._contexts.move_to_end(project_id)
+                while len(self._contexts) > self.max_projects:
+                    self._contexts.popitem(last=False)
+            logger.info(f"项目 {project_id} 生成上下文已加载，共 {len(context.sections)} 个框架章节")
+            return context
+
+    def invalidate(self, project_id: Any) -> None:
+        with self._lock:
+            self._contexts.pop(str(project_id), None)
+
+    def stats(self) -> Dict[str, Any]:
+        """上下文缓存统计信息"""
+        with self._lock:
+            return {
+                "projects": len(self._contexts),
+                "hits": self._hits,
+                "loads": self._loads,
+            }
+
+
+_context_cache: Optional[GenerationContextCache] = None
+_context_cache_lock = threading.Lock()
+
+
+def get_generation_context_cache() -> GenerationContextCache:
+    """获取内容生成上下文缓存实例"""
+    global _context_cache
+    if _context_cache is None:
+        with _context_cache_lock:
+            if _context_cache is None:
+                _context_cache = GenerationContextCache(
+                    max_projects=get_config().get("generation_context.max_projects", 64)
+                )
+    return _context_cache
@@ -0,0 +1,294 @@
+"""
+章节标识与生成依赖图模块
+章节标识为 <section_id>_<SHA-1(section_id, section_name) 前8位>，跨进程与重启保持一致；
+旧版本以进程内随机化的 hash() 生成的章节文件由 migrate_legacy_chapters 按标题迁移到新标识。
+记录每个 bid_content/<chapter>.md 生成时所用的输入及其内容指纹，保存在 bid_content/.dependencies.json：
+- framework.section      该章节在框架中的定义
+- analysis.<字段>        招标文件分析结果的各顶层字段（strategy.<字段> 为投标策略）
+- materials.<分类>       materials/<分类>/ 下的文件（按文件索引中的路径、大小、修改时间、哈希计算）
+- materials.step         资料管理步骤的结果数据
+- project.service_mode   项目服务模式
+框架章节可通过 dependencies.analysis_fields / dependencies.material_categories 收窄依赖范围，
+未声明时依赖全部分析字段与资料分类。
+再次执行内容生成时，只有输入指纹发生变化、从未成功生成或输出文件缺失的章节会被重新生成。
+同一目录的依赖图保存与旧文件迁移按目录加锁串行执行；保存时重新读取文件并合并本次的增量修改，
+并发的全量生成与流式生成不会互相覆盖对方的记录。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEPENDENCY_FILE_NAME = ".dependencies.json"
+
+# 依赖图格式或指纹算法变化时递增，旧记录全部视为过期
+GRAPH_VERSION = 1
+
+# 旧版章节标识：<section_id>_<hash(section_name) & 0xFFFFFFFF 的十进制>
+# 约 2% 的新标识摘要恰好是 8 位纯数字，也能匹配该模式，迁移时需用 is_stable_key_file 排除
+LEGACY_KEY_PATTERN = re.compile(r"^(?P<section_id>.+)_(?P<suffix>\d{1,10})$")
+
+# bid_content 目录 -> 依赖图锁（同一进程内串行化读-改-写）
+_directory_locks: Dict[str, threading.RLock] = {}
+_directory_locks_guard = threading.Lock()
+
+
+def dependency_lock(content_dir: Path) -> threading.RLock:
+    """获取章节目录的依赖图锁（可重入）"""
+    key = os.path.abspath(str(content_dir))
+    with _directory_locks_guard:
+        lock = _directory_locks.get(key)
+        if lock is None:
+            lock = _directory_locks[key] = threading.RLock()
+        return lock
+
+
+def make_chapter_key(section_id: str, section_name: Optional[str]) -> str:
+    """由框架章节ID与名称生成稳定的章节标识"""
+    digest = hashlib.sha1(f"{section_id}\x1f{section_name or ''}".encode("utf-8")).hexdigest()[:8]
+    return f"{section_id}_{digest}"
+
+
+def _read_heading(path: Path) -> str:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            line = f.readline().strip()
+        return line[2:].strip() if line.startswith("# ") else ""
+    except Exception:
+        return ""
+
+
+def is_stable_key_file(path: Path, section_id: str) -> bool:
+    """文件名是否为新标识（章节文件首行标题即生成时的章节名称）"""
+    return make_chapter_key(section_id, _read_heading(path)) == path.stem
+
+
+def migrate_legacy_chapters(content_dir: Path, sections: List[Dict[str, Any]]) -> Dict[str, str]:
+    """
+    把旧版标识命名的章节文件重命名为稳定标识，返回 {旧标识: 新标识}
+    同一 section_id 对应多个章节时按文件首行标题匹配章节名称，
+    只有一个章节时直接迁移最新的旧文件；新标识文件已存在或无法匹配的旧文件保持不动
+    """
+    content_dir = Path(content_dir)
+    if not content_dir.is_dir() or not sections:
+        return {}
+
+    targets: Dict[str, List[Any]] = {}
+    for section in sections:
+        section_id = section.get("section_id")
+        if section_id:
+            name = section.get("section_name", "")
+            targets.setdefault(str(section_id), []).append((make_chapter_key(section_id, name), name))
+    new_keys = {key for entries in targets.values() for key, _ in entries}
+
+    candidates: Dict[str, List[Path]] = {}
+    for path in content_dir.glob("*.md"):
+        match = LEGACY_KEY_PATTERN.match(path.stem)
+        if not match or path.stem in new_keys or match.group("section_id") not in targets:
+            continue
+        # 章节改名后遗留的新标识文件，其摘要可能是纯数字，不属于旧版文件
+        if len(match.group("suffix")) == 8 and is_stable_key_file(path, match.group("section_id")):
+            continue
+        candidates.setdefault(match.group("section_id"), []).append(path)
+
+    migrated: Dict[str, str] = {}
+    for section_id, paths in candidates.items():
+        pending = [(key, name) for key, name in targets[section_id] if not (content_dir / f"{key}.md").exists()]
+        for path in sorted(paths, key=lambda p: p.stat().st_mtime, reverse=True):
+            if not pending:
+                break
+            heading = _read_heading(path)
+            target = next((t for t in pending if t[1] and t[1] == heading), None)
+            if target is None and len(targets[section_id]) == 1:
+                target = pending[0]
+            if target is None:
+                continue
+            os.replace(path, content_dir / f"{target[0]}.md")
+            pending.remove(target)
+            migrated[path.stem] = target[0]
+            logger.info(f"章节文件已迁移到稳定标识: {path.name} -> {target[0]}.md")
+    return migrated
+
+
+def rename_result_sections(result_data: Dict[str, Any], migrated: Dict[str, str], content_dir: Path) -> bool:
+    """把内容生成结果中已迁移章节的 key / content_file 改为新标识，返回是否有修改"""
+    changed = False
+    for section in result_data.get("sections") or []:
+        new_key = migrated.get(section.get("key"))
+        if new_key:
+            section["key"] = new_key
+            section["content_file"] = str(Path(content_dir) / f"{new_key}.md")
+            changed = True
+    return changed
+
+
+def fingerprint(value: Any) -> str:
+    """计算任意 JSON 兼容数据的内容指纹"""
+    payload = json.dumps(value, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def analysis_fields(analysis_data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """把分析数据拆分为可单独追踪的字段"""
+    if not analysis_data:
+        return {}
+    fields: Dict[str, Any] = {}
+    analysis_result = analysis_data.get("analysis_result")
+    if isinstance(analysis_result, dict):
+        fields.update({f"analysis.{key}": value for key, value in analysis_result.items()})
+        strategy_result = analysis_data.get("strategy_result")
+        if isinstance(strategy_result, dict):
+            fields.update({f"strategy.{key}": value for key, value in strategy_result.items()})
+    else:
+        # 旧格式：分析结果直接平铺在顶层
+        fields.update({f"analysis.{key}": value for key, value in analysis_data.items()})
+    return fields
+
+
+def material_fingerprints(files: List[Dict[str, Any]]) -> Dict[str, str]:
+    """按资料分类计算指纹；files 为文件索引 list_files(project_id, "materials/") 的结果"""
+    categories: Dict[str, List[Any]] = {}
+    for item in files:
+        parts = item["path"].split("/")
+        # 只统计 materials/<分类>/ 下的文件，materials 根目录下的配置与记录文件不属于资料
+        if len(parts) < 3:
+            continue
+        categories.setdefault(parts[1], []).append(
+            (item["path"], item["size"], item["modified_time"], item.get("sha256"))
+        )
+    return {
+        f"materials.{category}": fingerprint(sorted(entries))
+        for category, entries in categories.items()
+    }
+
+
+def chapter_inputs(section: Optional[Dict[str, Any]], analysis_data: Optional[Dict[str, Any]],
+                   material_data: Optional[Dict[str, Any]], material_fps: Dict[str, str],
+                   service_mode: Optional[str]) -> Dict[str, str]:
+    """计算单个章节的输入指纹"""
+    declared = (section or {}).get("dependencies") or {}
+    wanted_fields = declared.get("analysis_fields")
+    wanted_categories = declared.get("material_categories")
+
+    inputs = {
+        "framework.section": fingerprint(section),
+        "materials.step": fingerprint(material_data or {}),
+        "project.service_mode": fingerprint(service_mode),
+    }
+    for name, value in analysis_fields(analysis_data).items():
+        if wanted_fields is None or name.split(".", 1)[1] in wanted_fields:
+            inputs[name] = fingerprint(value)
+    for name, value in material_fps.items():
+        if wanted_categories is None or name.split(".", 1)[1] in wanted_categories:
+            inputs[name] = value
+    return inputs
+
+
+class ChapterDependencyGraph:
+    """单个项目 bid_content 目录的章节依赖图"""
+
+    def __init__(self, content_dir: Path, chapters: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.content_dir = Path(content_dir)
+        self.chapters: Dict[str, Dict[str, Any]] = chapters or {}
+        self._lock = threading.Lock()
+        # 自加载以来的修改：章节标识 -> 新记录（None 表示删除），保存时合并到最新文件
+        self._changes: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._retained: Optional[set] = None
+
+    @property
+    def path(self) -> Path:
+        return self.content_dir / DEPENDENCY_FILE_NAME
+
+    @classmethod
+    def load(cls, content_dir: Path) -> "ChapterDependencyGraph":
+        """读取依赖图，文件不存在、损坏或版本不符时返回空图"""
+        graph = cls(content_dir)
+        graph.chapters = graph._read()
+        return graph
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == GRAPH_VERSION:
+                return data.get("chapters", {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"读取章节依赖图失败，将全部重新生成: {self.path} - {e}")
+        return {}
+
+    def save(self) -> None:
+        """重新读取最新的依赖图，合并本实例的修改后原子写入"""
+        with dependency_lock(self.content_dir):
+            chapters = self._read()
+            with self._lock:
+                for key, record in self._changes.items():
+                    if record is None:
+                        chapters.pop(key, None)
+                    else:
+                        chapters[key] = record
+                if self._retained is not None:
+                    chapters = {k: v for k, v in chapters.items() if k in self._retained}
+                self._changes = {}
+                self._retained = None
+                self.chapters = chapters
+                data = {"version": GRAPH_VERSION, "chapters": dict(chapters)}
+            self.content_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(f"{DEPENDENCY_FILE_NAME}.{os.getpid()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+    def stale_reasons(self, chapter_key: str, inputs: Dict[str, str]) -> List[str]:
+        """返回章节需要重新生成的原因，空列表表示章节是最新的"""
+        with self._lock:
+            record = self.chapters.get(chapter_key)
+        if not record:
+            return ["not_generated"]
+        content_file = record.get("content_file")
+        if not content_file or not os.path.exists(content_file):
+            return ["output_missing"]
+        recorded = record.get("inputs", {})
+        return sorted(
+            name for name in set(recorded) | set(inputs)
+            if recorded.get(name) != inputs.get(name)
+        )
+
+    def record(self, chapter_key: str, inputs: Dict[str, str], content_file: str) -> None:
+        """章节生成成功后记录其输入指纹"""
+        with self._lock:
+            self.chapters[chapter_key] = self._changes[chapter_key] = {
+                "inputs": inputs,
+                "content_file": content_file,
+                "generated_at": datetime.now().isoformat(),
+            }
+
+    def rename(self, old_key: str, new_key: str) -> None:
+        """章节文件迁移到新标识后同步迁移其依赖记录"""
+        with self._lock:
+            record = self.chapters.pop(old_key, None)
+            if record is not None:
+                record["content_file"] = str(self.content_dir / f"{new_key}.md")
+                self.chapters[new_key] = self._changes[new_key] = record
+                self._changes[old_key] = None
+
+    def get(self, chapter_key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self.chapters.get(chapter_key)
+
+    def retain(self, chapter_keys: List[str]) -> None:
+        """移除框架中已不存在的章节记录（不删除内容文件），保存时同样作用于其他写入者的记录"""
+        keep = set(chapter_keys)
+        with self._lock:
+            for key in [k for k in self.chapters if k not in keep]:
+                del self.chapters[key]
+            self._retained = keep if self._retained is None else self._retained & keep
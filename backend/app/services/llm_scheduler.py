@@ -0,0 +1,324 @@
+"""
+大模型请求调度模块
+位于 AIService 与各调用方之前的统一调度层：
+- 令牌桶限流：每分钟请求数（RPM）与每分钟 token 数（TPM）
+- 优先级：interactive（交互式校验）> normal > bulk（批量内容生成）
+- 有界等待队列，队列满时立即抛出背压异常
+- 429 / 5xx / 网络超时按带抖动的指数退避重试
+- 统计队列深度与各优先级等待时长
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from ..core.config import get_config
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = {"interactive": 0, "normal": 1, "bulk": 2}
+RETRYABLE_STATUS = (408, 409, 429, 500, 502, 503, 504)
+_RETRYABLE_ERRORS = ("APITimeoutError", "APIConnectionError", "RateLimitError", "InternalServerError",
+                     "Timeout", "ConnectTimeout", "ReadTimeout", "ConnectionError")
+
+
+class LLMBackpressureError(Exception):
+    """调度队列已满，调用方应稍后重试"""
+
+
+class LLMQueueTimeoutError(Exception):
+    """等待调度超时"""
+
+
+class LLMRetryableError(Exception):
+    """可重试的HTTP错误（供未使用openai客户端的调用方抛出）"""
+
+    def __init__(self, status_code: int, message: str = "", retry_after: Optional[float] = None):
+        super().__init__(f"{status_code} {message}".strip())
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """每分钟配额的令牌桶"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """获取 amount 个令牌还需等待的秒数"""
+        if self.capacity <= 0:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        if self.capacity > 0:
+            self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, delta: float) -> None:
+        """按实际用量修正（delta>0 多扣，delta<0 返还）"""
+        if self.capacity > 0:
+            self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "tokens", "enqueued_at", "admitted")
+
+    def __init__(self, priority: int, seq: int, tokens: float):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.enqueued_at = time.monotonic()
+        self.admitted = False
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class LLMScheduler:
+    """大模型请求调度器（线程安全，支持同步与异步调用）"""
+
+    def __init__(self, rpm: float = 60, tpm: float = 100000, max_queue: int = 200,
+                 max_retries: int = 4, base_delay: float = 1.0, max_delay: float = 30.0,
+                 acquire_timeout: float = 120.0):
+        self.requests_bucket = TokenBucket(rpm)
+        self.tokens_bucket = TokenBucket(tpm)
+        self.max_queue = max(1, int(max_queue))
+        self.max_retries = max(0, int(max_retries))
+        self.base_delay = float(base_delay)
+        self.max_delay = float(max_delay)
+        self.acquire_timeout = float(acquire_timeout)
+
+        self._lock = threading.Lock()
+        self._heap: List[_Waiter] = []
+        self._seq = itertools.count()
+
+        # 统计信息
+        self._max_depth = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._retries = 0
+        self._failures = 0
+        self._admitted: Dict[str, int] = {name: 0 for name in PRIORITIES}
+        self._wait_total: Dict[str, float] = {name: 0.0 for name in PRIORITIES}
+        self._wait_max: Dict[str, float] = {name: 0.0 for name in PRIORITIES}
+
+    # ------------------ 准入 ------------------
+    @staticmethod
+    def estimate_tokens(prompt: str, max_tokens: int = 0) -> int:
+        """粗略估算一次请求消耗的 token（中文约每 1.5 字符 1 token）"""
+        return int(len(prompt or "") / 1.5) + int(max_tokens or 0)
+
+    def _enqueue(self, priority: str, tokens: float) -> _Waiter:
+        if priority not in PRIORITIES:
+            priority = "normal"
+        with self._lock:
+            if len(self._heap) >= self.max_queue:
+                self._rejected += 1
+                raise LLMBackpressureError(f"大模型请求队列已满（{self.max_queue}），请稍后重试")
+            waiter = _Waiter(PRIORITIES[priority], next(self._seq), tokens)
+            heapq.heappush(self._heap, waiter)
+            self._max_depth = max(self._max_depth, len(self._heap))
+            return waiter
+
+    def _try_admit(self, waiter: _Waiter) -> float:
+        """尝试放行；返回 0 表示已放行，否则返回建议等待的秒数"""
+        with self._lock:
+            if not self._heap or self._heap[0] is not waiter:
+                # 队首之后的请求短轮询等待
+                return 0.05
+            now = time.monotonic()
+            wait = max(self.requests_bucket.wait_time(1, now),
+                       self.tokens_bucket.wait_time(waiter.tokens, now))
+            if wait > 0:
+                return min(wait, 1.0)
+            self.requests_bucket.take(1)
+            self.tokens_bucket.take(waiter.tokens)
+            heapq.heappop(self._heap)
+            waiter.admitted = True
+            name = self._priority_name(waiter.priority)
+            waited = now - waiter.enqueued_at
+            self._admitted[name] += 1
+            self._wait_total[name] += waited
+            self._wait_max[name] = max(self._wait_max[name], waited)
+            return 0.0
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        with self._lock:
+            if not waiter.admitted and waiter in self._heap:
+                self._heap.remove(waiter)
+                heapq.heapify(self._heap)
+
+    @staticmethod
+    def _priority_name(priority: int) -> str:
+        for name, value in PRIORITIES.items():
+            if value == priority:
+                return name
+        return "normal"
+
+    def _check_deadline(self, waiter: _Waiter, deadline: float) -> None:
+        if time.monotonic() >= deadline:
+            self._abandon(waiter)
+            with self._lock:
+                self._timeouts += 1
+            raise LLMQueueTimeoutError(f"等待大模型调度超时（{self.acquire_timeout}s）")
+
+    def acquire(self, priority: str = "normal", tokens: float = 1) -> None:
+        """同步等待放行"""
+        waiter = self._enqueue(priority, tokens)
+        deadline = time.monotonic() + self.acquire_timeout
+        try:
+            while True:
+                wait = self._try_admit(waiter)
+                if wait <= 0:
+                    return
+                self._check_deadline(waiter, deadline)
+                time.sleep(wait)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+    async def aacquire(self, priority: str = "normal", tokens: float = 1) -> None:
+        """异步等待放行（不阻塞事件循环）"""
+        waiter = self._enqueue(priority, tokens)
+        deadline = time.monotonic() + self.acquire_timeout
+        try:
+            while True:
+                wait = self._try_admit(waiter)
+                if wait <= 0:
+                    return
+                self._check_deadline(waiter, deadline)
+                await asyncio.sleep(wait)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+    def record_usage(self, estimated: float, actual: Optional[float]) -> None:
+        """按实际 token 用量修正 TPM 令牌桶"""
+        if actual is None:
+            return
+        with self._lock:
+            self.tokens_bucket.adjust(float(actual) - float(estimated))
+
+    # ------------------ 重试 ------------------
+    @staticmethod
+    def is_retryable(error: BaseException) -> bool:
+        status = getattr(error, "status_code", None)
+        if status is None:
+            response = getattr(error, "response", None)
+            status = getattr(response, "status_code", None)
+        if status is not None:
+            return status in RETRYABLE_STATUS
+        return type(error).__name__ in _RETRYABLE_ERRORS
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        """带完全抖动的指数退避，优先遵循 Retry-After"""
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after is None:
+            headers = getattr(getattr(error, "response", None), "headers", None) or {}
+            try:
+                retry_after = float(headers.get("retry-after")) if headers.get("retry-after") else None
+            except (TypeError, ValueError):
+                retry_after = None
+        if retry_after is not None:
+            return min(self.max_delay, float(retry_after))
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _on_retry(self, attempt: int, error: BaseException) -> float:
+        delay = self._backoff(attempt, error)
+        with self._lock:
+            self._retries += 1
+        logger.warning(f"大模型请求失败，{delay:.1f}s 后重试（第 {attempt + 1} 次）: {error}")
+        return delay
+
+    def call(self, fn: Callable[[], Any], priority: str = "normal", tokens: float = 1) -> Any:
+        """同步执行请求：排队限流 + 失败重试"""
+        for attempt in range(self.max_retries + 1):
+            self.acquire(priority, tokens)
+            try:
+                return fn()
+            except Exception as e:
+                if attempt >= self.max_retries or not self.is_retryable(e):
+                    with self._lock:
+                        self._failures += 1
+                    raise
+                time.sleep(self._on_retry(attempt, e))
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]], priority: str = "normal", tokens: float = 1) -> Any:
+        """异步执行请求：排队限流 + 失败重试"""
+        for attempt in range(self.max_retries + 1):
+            await self.aacquire(priority, tokens)
+            try:
+                return await fn()
+            except Exception as e:
+                if attempt >= self.max_retries or not self.is_retryable(e):
+                    with self._lock:
+                        self._failures += 1
+                    raise
+                await asyncio.sleep(self._on_retry(attempt, e))
+
+    # ------------------ 统计 ------------------
+    def stats(self) -> Dict[str, Any]:
+        """调度器统计信息"""
+        with self._lock:
+            depth_by_priority = {name: 0 for name in PRIORITIES}
+            for waiter in self._heap:
+                depth_by_priority[self._priority_name(waiter.priority)] += 1
+            return {
+                "queue_depth": len(self._heap),
+                "queue_depth_by_priority": depth_by_priority,
+                "max_queue_depth": self._max_depth,
+                "max_queue": self.max_queue,
+                "rejected": self._rejected,
+                "timeouts": self._timeouts,
+                "retries": self._retries,
+                "failures": self._failures,
+                "admitted": dict(self._admitted),
+                "wait_time_avg_ms": {
+                    name: round(self._wait_total[name] * 1000 / self._admitted[name], 2) if self._admitted[name] else 0.0
+                    for name in PRIORITIES
+                },
+                "wait_time_max_ms": {name: round(v * 1000, 2) for name, v in self._wait_max.items()},
+                "rpm_available": round(self.requests_bucket.tokens, 2),
+                "tpm_available": round(self.tokens_bucket.tokens, 2),
+            }
+
+
+# 全局调度器实例
+_llm_scheduler: Optional[LLMScheduler] = None
+_llm_scheduler_lock = threading.Lock()
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """获取大模型请求调度器实例"""
+    global _llm_scheduler
+    if _llm_scheduler is None:
+        with _llm_scheduler_lock:
+            if _llm_scheduler is None:
+                config = get_config()
+                _llm_scheduler = LLMScheduler(
+                    rpm=config.get("llm_scheduler.rpm", 60),
+                    tpm=config.get("llm_scheduler.tpm", 100000),
+                    max_queue=config.get("llm_scheduler.max_queue", 200),
+                    max_retries=config.get("llm_scheduler.max_retries", 4),
+                    base_delay=config.get("llm_scheduler.base_delay", 1.0),
+                    max_delay=config.get("llm_scheduler.max_delay", 30.0),
+                    acquire_timeout=config.get("llm_scheduler.acquire_timeout", 120.0),
+                )
+    return _llm_scheduler
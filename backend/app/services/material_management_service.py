@@ -4,23 +4,34 @@
 
 import os
 import json
-import sqlite3
 import shutil
 from pathlib import Path
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 import logging
 
+from ..core.connection_pool import get_connection_pool
+from ..core.executors import run_io
+from ..core.file_index import get_file_index
+from ..core.project_resolver import get_project_resolver
+from ..core.event_bus import publish_step_event
+from .blob_store import get_blob_store
+from .office_converter import OFFICE_EXTENSIONS, get_office_converter
+
 logger = logging.getLogger(__name__)
 
 # 快速模式开关
 FAST_MODE = os.getenv("ZTBAI_FAST_MODE", "false").lower() == "true"
 
+# Office 资料转换出的PDF存放目录（materials 下的隐藏目录，不计入资料、不进入文件索引）
+CONVERTED_DIR_NAME = ".converted"
+
 class MaterialManagementService:
     """资料管理服务"""
 
     def __init__(self):
         self.db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "ztbai.db")
+        self.pool = get_connection_pool(self.db_path)
         self.base_project_path = Path("ZtbBidPro")
         self.base_project_path.mkdir(exist_ok=True)
 
@@ -86,9 +97,10 @@ class MaterialManagementService:
                     "progress": 0
                 }
 
-            # 统计已上传的资料
-            uploaded_files = list(material_dir.rglob("*"))
-            uploaded_count = len([f for f in uploaded_files if f.is_file()])
+            # 从项目文件索引统计已上传的资料
+            file_index = get_file_index()
+            await run_io(file_index.ensure_fresh, project_id, project_path)
+            uploaded_count = await run_io(file_index.count_files, project_id, "materials/")
 
             # 计算进度（假设需要至少10个文件）
             progress = min(uploaded_count * 10, 100)
@@ -148,6 +160,10 @@ class MaterialManagementService:
             await self._create_material_directories(project_path)
             await self._update_step_progress(project_id, "in_progress", 30)
 
+            # 将上传的Office文档批量转换为PDF
+            conversions = await self._convert_office_materials(project_path)
+            await self._update_step_progress(project_id, "in_progress", 45)
+
             # 分析现有资料
             materials = await self._analyze_existing_materials(project_path)
             await self._update_step_progress(project_id, "in_progress", 60)
@@ -165,7 +181,9 @@ class MaterialManagementService:
                 "status": "completed",
                 "materials_count": len(materials),
                 "categories_count": len(self.material_categories),
-                "checklist_items": len(checklist)
+                "checklist_items": len(checklist),
+                "converted_count": sum(1 for c in conversions if c["success"]),
+                "conversion_errors": [c for c in conversions if not c["success"]]
             }
 
         except Exception as e:
@@ -267,8 +285,9 @@ class MaterialManagementService:
             }
 
     async def upload_material(self, project_id: str, category_id: str, item_id: str,
-                            file_content: bytes, filename: str, description: str = "") -> Dict[str, Any]:
-        """上传资料文件"""
+                            file_content: Optional[bytes], filename: str, description: str = "",
+                            staged: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """上传资料文件；staged 为已分块接收的上传文件，提供时不再使用 file_content"""
         try:
             project_path = await self._get_project_path(project_id)
             if not project_path:
@@ -278,10 +297,12 @@ class MaterialManagementService:
             material_dir = project_path / "materials" / category_id
             material_dir.mkdir(parents=True, exist_ok=True)
 
-            # 保存文件
+            # 保存文件（存入内容寻址存储，相同资料跨项目只存一份）
             file_path = material_dir / filename
-            with open(file_path, 'wb') as f:
-                f.write(file_content)
+            if staged is not None:
+                blob = await run_io(get_blob_store().ingest_staged, staged, file_path, project_id)
+            else:
+                blob = await run_io(get_blob_store().ingest_bytes, file_content, file_path, project_id)
 
             # 记录文件信息
             file_info = {
@@ -289,7 +310,8 @@ class MaterialManagementService:
                 "category_id": category_id,
                 "item_id": item_id,
                 "file_path": str(file_path),
-                "file_size": len(file_content),
+                "file_size": blob["size"],
+                "sha256": blob["sha256"],
                 "upload_time": datetime.now().isoformat(),
                 "description": description
             }
@@ -297,6 +319,11 @@ class MaterialManagementService:
             # 更新资料记录
             await self._add_material_record(project_path, file_info)
 
+            # 登记到项目文件索引
+            file_index = get_file_index()
+            await run_io(file_index.record, project_id, file_path, project_path, blob["sha256"])
+            await run_io(file_index.record, project_id, project_path / "materials" / "upload_records.json", project_path)
+
             return {
                 "success": True,
                 "file_info": file_info,
@@ -309,23 +336,10 @@ class MaterialManagementService:
 
     # 辅助方法
     async def _get_project_path(self, project_id: str) -> Optional[Path]:
-        """获取项目路径"""
+        """获取项目路径（经共享的项目解析器缓存）"""
         try:
-            # 查询数据库获取项目信息
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT project_path FROM projects WHERE id = ?", (project_id,))
-                result = cursor.fetchone()
-
-                if result:
-                    return Path(result[0])
-
-                # 如果数据库中没有，尝试从ZtbBidPro目录查找
-                for project_dir in self.base_project_path.iterdir():
-                    if project_dir.is_dir() and project_id in project_dir.name:
-                        return project_dir
-
-                return None
+            project_path = await get_project_resolver(self.db_path).aget_path(project_id)
+            return Path(project_path) if project_path else None
 
         except Exception as e:
             logger.error(f"获取项目路径失败: {e}")
@@ -341,6 +355,44 @@ class MaterialManagementService:
             category_dir = material_base / category_id
             category_dir.mkdir(exist_ok=True)
 
+    async def _convert_office_materials(self, project_path: Path) -> List[Dict[str, Any]]:
+        """
+        将资料目录中尚无最新PDF的Office文档批量转换为PDF
+        PDF写入 materials/.converted/ 下的相同相对路径，不覆盖用户上传的同名PDF
+        """
+        material_dir = project_path / "materials"
+        if not material_dir.exists():
+            return []
+        converted_dir = material_dir / CONVERTED_DIR_NAME
+
+        pending = []
+        targets = []
+        for file_path in material_dir.rglob("*"):
+            rel_path = file_path.relative_to(material_dir)
+            if any(part.startswith(".") for part in rel_path.parts):
+                continue
+            if not file_path.is_file() or file_path.suffix.lower() not in OFFICE_EXTENSIONS:
+                continue
+            pdf_path = (converted_dir / rel_path).with_suffix(".pdf")
+            if pdf_path.exists() and pdf_path.stat().st_mtime >= file_path.stat().st_mtime:
+                continue
+            pdf_path.parent.mkdir(parents=True, exist_ok=True)
+            pending.append(file_path)
+            targets.append(pdf_path)
+
+        if not pending:
+            return []
+        converter = get_office_converter()
+        if not converter.available:
+            logger.warning(f"未找到LibreOffice，跳过 {len(pending)} 个资料文档的PDF转换")
+            return []
+
+        results = await converter.convert_many(pending, targets=targets)
+        for item in results:
+            if not item["success"]:
+                logger.warning(f"资料文档转换失败: {item['source']} - {item['error']}")
+        return results
+
     async def _analyze_existing_materials(self, project_path: Path) -> List[Dict[str, Any]]:
         """分析现有资料"""
         materials = []
@@ -350,7 +402,8 @@ class MaterialManagementService:
             return materials
 
         for category_dir in material_dir.iterdir():
-            if category_dir.is_dir():
+            # 跳过 .converted 等隐藏目录，转换生成的PDF不计入资料
+            if category_dir.is_dir() and not category_dir.name.startswith("."):
                 category_id = category_dir.name
                 for file_path in category_dir.iterdir():
                     if file_path.is_file():
@@ -443,7 +496,8 @@ class MaterialManagementService:
         """更新步骤进度"""
         try:
             # 这里可以实现数据库更新逻辑
-            # 目前先记录日志
+            # 目前先记录日志并推送步骤事件
             logger.info(f"项目 {project_id} 资料管理进度更新: {status} - {progress}%")
+            publish_step_event(project_id, "material-management", status, progress)
         except Exception as e:
             logger.error(f"更新步骤进度失败: {e}")
@@ -0,0 +1,239 @@
+"""
+逐页OCR流水线模块
+将PDF拆分为单页后分发到进程池并行OCR：
+- 已存在有效 page_NNN.json 的页面直接跳过，中断后重新执行可从断点继续
+- 源PDF内容变化（按SHA-256判断）时清除旧的页面结果
+- 每完成一页回调一次进度
+- 未安装 PyPDF2 时退回整本OCR（在线程池中执行，不阻塞事件循环）
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from ..core.config import get_config
+from .artifact_cache import file_sha256
+
+logger = logging.getLogger(__name__)
+
+try:
+    from PyPDF2 import PdfReader, PdfWriter
+except Exception:  # PyPDF2 为可选依赖
+    PdfReader = None
+    PdfWriter = None
+
+PAGES_DIR_NAME = ".ocr_pages"
+MANIFEST_NAME = "manifest.json"
+
+# 子进程内复用的OCR处理器（模型加载开销较大）
+_worker_processor = None
+
+
+def _get_worker_processor():
+    global _worker_processor
+    if _worker_processor is None:
+        backend_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+        if backend_dir not in sys.path:
+            sys.path.append(backend_dir)
+        from Toolkit.ocr_processor import OCRProcessor
+        _worker_processor = OCRProcessor()
+    return _worker_processor
+
+
+def page_json_path(out_dir: Path, page_number: int) -> Path:
+    return out_dir / f"page_{page_number:03d}.json"
+
+
+def is_valid_page_json(path: Path) -> bool:
+    """页面结果文件存在且为包含文本字段的合法JSON"""
+    try:
+        if not path.is_file() or path.stat().st_size == 0:
+            return False
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return isinstance(data, dict) and ("text_blocks" in data or "full_text" in data)
+    except Exception:
+        return False
+
+
+def ocr_single_page(page_pdf: str, page_number: int, out_dir: str) -> Dict[str, Any]:
+    """
+    在子进程中OCR单页PDF，结果写入 out_dir/page_NNN.json
+    先写临时目录再原子替换，避免中断时留下半个文件
+    """
+    start = time.time()
+    out_path = page_json_path(Path(out_dir), page_number)
+    tmp_dir = Path(out_dir) / PAGES_DIR_NAME / f"tmp_{page_number:03d}"
+    try:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        result = _get_worker_processor().process_pdf_to_json(page_pdf, str(tmp_dir))
+        if not result.get('success', False):
+            return {"page": page_number, "success": False, "error": result.get('error', '未知错误')}
+
+        produced = sorted(tmp_dir.glob("page_*.json"))
+        if not produced:
+            return {"page": page_number, "success": False, "error": "OCR未生成页面结果"}
+        with open(produced[0], 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        # 单页PDF内的页码恒为1，改写为原文档页码
+        data.setdefault('page_info', {})['page_number'] = page_number
+
+        tmp_out = out_path.with_suffix(".json.tmp")
+        with open(tmp_out, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_out, out_path)
+        return {"page": page_number, "success": True, "elapsed": round(time.time() - start, 3)}
+    except Exception as e:
+        return {"page": page_number, "success": False, "error": str(e)}
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+class OCRPipeline:
+    """逐页并行、可断点续跑的OCR流水线"""
+
+    def __init__(self, max_workers: Optional[int] = None, executor: Optional[ProcessPoolExecutor] = None):
+        default_workers = max(1, min(4, (os.cpu_count() or 2) - 1))
+        self.max_workers = max(1, int(max_workers or default_workers))
+        self._executor = executor
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def _prepare_pages(self, pdf_path: Path, out_dir: Path) -> List[Path]:
+        """校验源文件指纹并拆分单页PDF（已拆分的页面复用）"""
+        pages_dir = out_dir / PAGES_DIR_NAME
+        pages_dir.mkdir(parents=True, exist_ok=True)
+        manifest_file = pages_dir / MANIFEST_NAME
+        source_hash = file_sha256(pdf_path)
+
+        manifest = {}
+        if manifest_file.exists():
+            try:
+                manifest = json.loads(manifest_file.read_text(encoding='utf-8'))
+            except Exception:
+                manifest = {}
+        if manifest.get("source_sha256") != source_hash:
+            # 源文件已变化，旧的页面结果全部作废
+            for stale in list(out_dir.glob("page_*.json")) + list(pages_dir.glob("page_*.pdf")):
+                stale.unlink(missing_ok=True)
+
+        reader = PdfReader(str(pdf_path))
+        page_files = []
+        for index, page in enumerate(reader.pages, start=1):
+            page_pdf = pages_dir / f"page_{index:03d}.pdf"
+            if not page_pdf.exists() or page_pdf.stat().st_size == 0:
+                writer = PdfWriter()
+                writer.add_page(page)
+                tmp_pdf = page_pdf.with_suffix(".pdf.tmp")
+                with open(tmp_pdf, 'wb') as f:
+                    writer.write(f)
+                os.replace(tmp_pdf, page_pdf)
+            page_files.append(page_pdf)
+
+        manifest_file.write_text(json.dumps({
+            "source_file": str(pdf_path),
+            "source_sha256": source_hash,
+            "total_pages": len(page_files),
+        }, ensure_ascii=False, indent=2), encoding='utf-8')
+        return page_files
+
+    async def run(self, pdf_path: Path, out_dir: Path,
+                  on_progress: Optional[Callable[[int, int], Any]] = None,
+                  fallback_processor: Any = None) -> Dict[str, Any]:
+        """
+        执行逐页OCR，返回与 OCRProcessor.process_pdf_to_json 兼容的结果：
+        success / total_pages / processed_pages / processing_time，并附带 skipped_pages、failed_pages
+        on_progress(done, total) 可为同步函数或协程函数
+        """
+        start = time.time()
+        loop = asyncio.get_running_loop()
+        pdf_path = Path(pdf_path)
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+
+        if PdfReader is None:
+            if fallback_processor is None:
+                return {"success": False, "error": "PyPDF2 未安装，无法逐页OCR"}
+            logger.warning("PyPDF2 未安装，退回整本OCR")
+            return await loop.run_in_executor(
+                None, fallback_processor.process_pdf_to_json, str(pdf_path), str(out_dir)
+            )
+
+        page_files = await loop.run_in_executor(None, self._prepare_pages, pdf_path, out_dir)
+        total = len(page_files)
+        pending = [
+            (page_pdf, number) for number, page_pdf in enumerate(page_files, start=1)
+            if not is_valid_page_json(page_json_path(out_dir, number))
+        ]
+        skipped = total - len(pending)
+        if skipped:
+            logger.info(f"OCR断点续跑: 跳过已完成的 {skipped}/{total} 页")
+
+        done = skipped
+        failed: List[Dict[str, Any]] = []
+
+        async def report():
+            if on_progress is None:
+                return
+            ret = on_progress(done, total)
+            if asyncio.iscoroutine(ret):
+                await ret
+
+        await report()
+        if pending:
+            executor = self._get_executor()
+            futures = [
+                loop.run_in_executor(executor, ocr_single_page, str(page_pdf), number, str(out_dir))
+                for page_pdf, number in pending
+            ]
+            for future in asyncio.as_completed(futures):
+                result = await future
+                if result.get("success"):
+                    done += 1
+                    await report()
+                else:
+                    failed.append(result)
+                    logger.error(f"第 {result.get('page')} 页OCR失败: {result.get('error')}")
+
+        processed = total - len(failed)
+        return {
+            "success": not failed,
+            "error": f"{len(failed)} 页OCR失败" if failed else None,
+            "total_pages": total,
+            "processed_pages": processed,
+            "skipped_pages": skipped,
+            "failed_pages": [f.get("page") for f in failed],
+            "processing_time": round(time.time() - start, 3),
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+# 全局OCR流水线实例
+_ocr_pipeline: Optional[OCRPipeline] = None
+_ocr_pipeline_lock = threading.Lock()
+
+
+def get_ocr_pipeline() -> OCRPipeline:
+    """获取OCR流水线实例"""
+    global _ocr_pipeline
+    if _ocr_pipeline is None:
+        with _ocr_pipeline_lock:
+            if _ocr_pipeline is None:
+                _ocr_pipeline = OCRPipeline(max_workers=get_config().get("ocr.max_workers", 0))
+    return _ocr_pipeline
@@ -0,0 +1,367 @@
+"""
+Office文档转换服务
+维护少量常驻的无界面 LibreOffice 实例，把 DOCX 等文档转换为 PDF：
+- 每个工作进程使用独立的用户配置目录（UserInstallation），并发转换互不冲突
+- 转换任务进入有界队列，由各工作线程依次取出执行
+- 单个任务超时后终止并重启对应实例，实例崩溃时自动重启
+- 安装了 unoserver 时实例常驻复用（免去每次数秒的冷启动）；
+  否则退回逐次启动 soffice，但仍使用各自独立的配置目录
+"""
+
+import asyncio
+import atexit
+import logging
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from ..core.config import get_config
+
+logger = logging.getLogger(__name__)
+
+PathLike = Union[str, Path]
+
+OFFICE_EXTENSIONS = (".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".odt", ".rtf")
+
+
+class OfficeConversionError(Exception):
+    """文档转换失败"""
+
+
+class OfficeConversionTimeout(OfficeConversionError):
+    """文档转换超时"""
+
+
+class _ConversionJob:
+    __slots__ = ("source", "target", "timeout", "future", "enqueued_at")
+
+    def __init__(self, source: Path, target: Path, timeout: float):
+        self.source = source
+        self.target = target
+        self.timeout = timeout
+        self.future: Future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+def _find_executable(*names: str) -> Optional[str]:
+    for name in names:
+        path = shutil.which(name)
+        if path:
+            return path
+    return None
+
+
+class _OfficeWorker:
+    """单个 LibreOffice 实例"""
+
+    def __init__(self, index: int, profile_dir: Path, port: int, uno_port: int,
+                 soffice: str, unoserver: Optional[str], unoconvert: Optional[str],
+                 startup_timeout: float):
+        self.index = index
+        self.profile_dir = profile_dir
+        self.port = port
+        self.uno_port = uno_port
+        self.soffice = soffice
+        self.unoserver = unoserver
+        self.unoconvert = unoconvert
+        self.startup_timeout = startup_timeout
+        self.process: Optional[subprocess.Popen] = None
+        self.restarts = 0
+
+    @property
+    def warm(self) -> bool:
+        return bool(self.unoserver and self.unoconvert)
+
+    @property
+    def profile_uri(self) -> str:
+        return self.profile_dir.resolve().as_uri()
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def start(self) -> None:
+        """启动常驻实例并等待端口可用"""
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        if not self.warm:
+            return
+        cmd = [
+            self.unoserver,
+            "--interface", "127.0.0.1",
+            "--port", str(self.port),
+            "--uno-port", str(self.uno_port),
+            "--executable", self.soffice,
+            "--user-installation", self.profile_uri,
+        ]
+        self.process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if not self.alive():
+                raise OfficeConversionError(f"LibreOffice 实例 {self.index} 启动失败")
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=1):
+                    logger.info(f"LibreOffice 实例 {self.index} 已就绪（端口 {self.port}）")
+                    return
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        raise OfficeConversionError(f"LibreOffice 实例 {self.index} 启动超时（{self.startup_timeout}s）")
+
+    def stop(self) -> None:
+        if self.process is None:
+            return
+        try:
+            self.process.terminate()
+            self.process.wait(timeout=5)
+        except Exception:
+            try:
+                self.process.kill()
+            except Exception:
+                pass
+        self.process = None
+
+    def restart(self) -> None:
+        self.restarts += 1
+        logger.warning(f"重启 LibreOffice 实例 {self.index}（第 {self.restarts} 次）")
+        self.stop()
+        self.start()
+
+    def convert(self, source: Path, target: Path, timeout: float) -> None:
+        """执行一次转换，超时或失败时抛出 OfficeConversionError"""
+        if self.warm and not self.alive():
+            self.restart()
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            if self.warm:
+                cmd = [
+                    self.unoconvert,
+                    "--host", "127.0.0.1",
+                    "--port", str(self.port),
+                    "--convert-to", "pdf",
+                    str(source), str(target),
+                ]
+                result = subprocess.run(cmd, timeout=timeout, capture_output=True)
+            else:
+                result = self._convert_cold(source, target, timeout)
+        except subprocess.TimeoutExpired:
+            # 实例可能已卡死，重启后再处理后续任务
+            if self.warm:
+                self.restart()
+            raise OfficeConversionTimeout(f"转换超时（{timeout}s）: {source.name}")
+
+        if result.returncode != 0 or not target.exists():
+            if self.warm and not self.alive():
+                self.restart()
+            stderr = (result.stderr or b"").decode("utf-8", errors="ignore").strip()
+            raise OfficeConversionError(f"转换失败: {source.name} {stderr[:200]}")
+
+    def _convert_cold(self, source: Path, target: Path, timeout: float) -> subprocess.CompletedProcess:
+        """逐次启动 soffice 转换（使用本实例独立的配置目录）"""
+        with tempfile.TemporaryDirectory(dir=self.profile_dir.parent) as out_dir:
+            cmd = [
+                self.soffice,
+                "--headless", "--norestore", "--nologo",
+                f"-env:UserInstallation={self.profile_uri}",
+                "--convert-to", "pdf",
+                "--outdir", out_dir,
+                str(source),
+            ]
+            result = subprocess.run(cmd, timeout=timeout, capture_output=True)
+            produced = Path(out_dir) / f"{source.stem}.pdf"
+            if produced.exists():
+                os.replace(produced, target)
+            return result
+
+
+class OfficeConverter:
+    """常驻 LibreOffice 实例池"""
+
+    def __init__(self, workers: int = 2, job_timeout: float = 120.0, startup_timeout: float = 30.0,
+                 base_port: int = 2003, max_queue: int = 100, profile_root: Optional[PathLike] = None):
+        self.workers = max(1, int(workers))
+        self.job_timeout = float(job_timeout)
+        self.startup_timeout = float(startup_timeout)
+        self.base_port = int(base_port)
+        self.profile_root = Path(profile_root or Path(tempfile.gettempdir()) / "ztbai_office_profiles")
+
+        self.soffice = _find_executable("soffice", "libreoffice")
+        self.unoserver = _find_executable("unoserver")
+        self.unoconvert = _find_executable("unoconvert")
+
+        self._jobs: "queue.Queue[Optional[_ConversionJob]]" = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._workers: List[_OfficeWorker] = []
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._started = False
+
+        # 统计信息
+        self._completed = 0
+        self._failed = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._convert_total = 0.0
+
+    @property
+    def available(self) -> bool:
+        return self.soffice is not None
+
+    @property
+    def mode(self) -> str:
+        if not self.available:
+            return "unavailable"
+        return "warm" if self.unoserver and self.unoconvert else "cold"
+
+    def _ensure_started(self) -> None:
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            if not self.available:
+                raise OfficeConversionError("未找到 LibreOffice（soffice/libreoffice）")
+            for index in range(self.workers):
+                worker = _OfficeWorker(
+                    index,
+                    self.profile_root / f"worker_{index}",
+                    port=self.base_port + index * 2,
+                    uno_port=self.base_port + index * 2 + 1,
+                    soffice=self.soffice,
+                    unoserver=self.unoserver,
+                    unoconvert=self.unoconvert,
+                    startup_timeout=self.startup_timeout,
+                )
+                thread = threading.Thread(target=self._worker_loop, args=(worker,),
+                                          name=f"office-worker-{index}", daemon=True)
+                self._workers.append(worker)
+                self._threads.append(thread)
+                thread.start()
+            self._started = True
+            logger.info(f"文档转换服务启动: {self.workers} 个实例，模式 {self.mode}")
+
+    def _worker_loop(self, worker: _OfficeWorker) -> None:
+        try:
+            worker.start()
+        except Exception as e:
+            logger.error(f"LibreOffice 实例 {worker.index} 启动失败，将在处理任务时重试: {e}")
+
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            started = time.monotonic()
+            try:
+                worker.convert(job.source, job.target, job.timeout)
+                with self._lock:
+                    self._completed += 1
+                    self._wait_total += started - job.enqueued_at
+                    self._convert_total += time.monotonic() - started
+                job.future.set_result(job.target)
+            except Exception as e:
+                with self._lock:
+                    self._failed += 1
+                    if isinstance(e, OfficeConversionTimeout):
+                        self._timeouts += 1
+                job.future.set_exception(e if isinstance(e, OfficeConversionError) else OfficeConversionError(str(e)))
+        worker.stop()
+
+    def submit(self, source: PathLike, target: Optional[PathLike] = None,
+               timeout: Optional[float] = None) -> Future:
+        """提交转换任务；target 默认为源文件同目录的同名PDF"""
+        self._ensure_started()
+        source = Path(source)
+        target = Path(target) if target else source.with_suffix(".pdf")
+        job = _ConversionJob(source, target, float(timeout or self.job_timeout))
+        try:
+            self._jobs.put_nowait(job)
+        except queue.Full:
+            raise OfficeConversionError("文档转换队列已满，请稍后重试")
+        return job.future
+
+    async def convert(self, source: PathLike, target: Optional[PathLike] = None,
+                      timeout: Optional[float] = None) -> Path:
+        """异步转换单个文档，返回PDF路径"""
+        return await asyncio.wrap_future(self.submit(source, target, timeout))
+
+    async def convert_many(self, sources: List[PathLike], out_dir: Optional[PathLike] = None,
+                           timeout: Optional[float] = None,
+                           targets: Optional[List[PathLike]] = None) -> List[Dict[str, Any]]:
+        """批量转换，返回每个文件的结果（失败不影响其他文件）；targets 与 sources 一一对应时优先于 out_dir"""
+        futures = []
+        for i, source in enumerate(sources):
+            source = Path(source)
+            if targets:
+                target = Path(targets[i])
+            else:
+                target = Path(out_dir) / f"{source.stem}.pdf" if out_dir else None
+            try:
+                futures.append(asyncio.wrap_future(self.submit(source, target, timeout)))
+            except OfficeConversionError as e:
+                futures.append(asyncio.sleep(0, result=e))
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        return [
+            {"source": str(source), "success": isinstance(r, Path),
+             "pdf": str(r) if isinstance(r, Path) else None,
+             "error": None if isinstance(r, Path) else str(r)}
+            for source, r in zip(sources, results)
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        """转换服务统计信息"""
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "workers": self.workers,
+                "alive": sum(1 for w in self._workers if w.alive()),
+                "queued": self._jobs.qsize(),
+                "completed": self._completed,
+                "failed": self._failed,
+                "timeouts": self._timeouts,
+                "restarts": sum(w.restarts for w in self._workers),
+                "wait_time_avg_ms": round(self._wait_total * 1000 / self._completed, 2) if self._completed else 0.0,
+                "convert_time_avg_ms": round(self._convert_total * 1000 / self._completed, 2) if self._completed else 0.0,
+            }
+
+    def shutdown(self) -> None:
+        """停止所有实例"""
+        if not self._started:
+            return
+        for _ in self._threads:
+            try:
+                self._jobs.put_nowait(None)
+            except queue.Full:
+                break
+        for worker in self._workers:
+            worker.stop()
+
+
+# 全局转换服务实例
+_office_converter: Optional[OfficeConverter] = None
+_office_converter_lock = threading.Lock()
+
+
+def get_office_converter() -> OfficeConverter:
+    """获取文档转换服务实例"""
+    global _office_converter
+    if _office_converter is None:
+        with _office_converter_lock:
+            if _office_converter is None:
+                config = get_config()
+                _office_converter = OfficeConverter(
+                    workers=config.get("office.workers", 2),
+                    job_timeout=config.get("office.job_timeout", 120.0),
+                    startup_timeout=config.get("office.startup_timeout", 30.0),
+                    base_port=config.get("office.base_port", 2003),
+                    max_queue=config.get("office.max_queue", 100),
+                    profile_root=config.get("office.profile_root") or None,
+                )
+                atexit.register(_office_converter.shutdown)
+    return _office_converter
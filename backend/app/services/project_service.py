@@ -6,29 +6,38 @@
 import os
 import json
 import uuid
+import base64
 import shutil
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional, Any
+import re
 import sqlite3
 import logging
 
+from ..core.config import get_config
+from ..core.connection_pool import get_connection_pool
+from ..core.executors import run_io
+from ..core.file_index import get_file_index
+from ..core.project_resolver import get_project_resolver
+from .blob_store import get_blob_store
+from .upload_service import stream_upload
+
 # 导入加密工具
 try:
-    from ..utils.encryption import AESEncryption, calculate_file_md5, sanitize_filename
+    from ..utils import AESEncryption, calculate_file_md5
 except ImportError:
     try:
         # 尝试绝对导入
-        from app.utils.encryption import AESEncryption, calculate_file_md5, sanitize_filename
+        from app.utils import AESEncryption, calculate_file_md5
     except ImportError:
-        # 如果导入失败，创建简单的替代实现
+        # 如果导入失败（未安装 cryptography），创建简单的替代实现
         import hashlib
-        import re
-        from datetime import datetime
 
         class AESEncryption:
             def encrypt(self, text): return text
             def decrypt(self, text): return text
+            def decrypt_many(self, texts): return list(texts)
 
         def calculate_file_md5(file_path):
             hash_md5 = hashlib.md5()
@@ -37,62 +46,94 @@ except ImportError:
                     hash_md5.update(chunk)
             return hash_md5.hexdigest()
 
-        def safe_decode_filename(raw_filename):
-            """安全解码文件名，处理中文编码问题"""
-            print(f"🔍 [DEBUG] safe_decode_filename 被调用，输入: {repr(raw_filename)}, 类型: {type(raw_filename)}")
+
+def safe_decode_filename(raw_filename):
+    """安全解码文件名，处理中文编码问题"""
+    print(f"🔍 [DEBUG] safe_decode_filename 被调用，输入: {repr(raw_filename)}, 类型: {type(raw_filename)}")
+    try:
+        # 如果已经是字符串，直接返回
+        if isinstance(raw_filename, str):
+            print(f"🔍 [DEBUG] 输入是字符串，直接返回: {repr(raw_filename)}")
+            return raw_filename
+
+        # 如果是字节类型，尝试解码
+        if isinstance(raw_filename, bytes):
+            # 尝试UTF-8解码
             try:
-                # 如果已经是字符串，直接返回
-                if isinstance(raw_filename, str):
-                    print(f"🔍 [DEBUG] 输入是字符串，直接返回: {repr(raw_filename)}")
-                    return raw_filename
-                
-                # 如果是字节类型，尝试解码
-                if isinstance(raw_filename, bytes):
-                    # 尝试UTF-8解码
+                return raw_filename.decode('utf-8')
+            except UnicodeDecodeError:
+                try:
+                    # 尝试GBK解码（Windows系统默认）
+                    return raw_filename.decode('gbk')
+                except UnicodeDecodeError:
                     try:
-                        return raw_filename.decode('utf-8')
-                    except UnicodeDecodeError:
-                        try:
-                            # 尝试GBK解码（Windows系统默认）
-                            return raw_filename.decode('gbk')
-                        except UnicodeDecodeError:
-                            try:
-                                # 尝试使用chardet检测编码
-                                import chardet
-                                detected = chardet.detect(raw_filename)
-                                if detected['encoding']:
-                                    return raw_filename.decode(detected['encoding'])
-                            except:
-                                pass
-                            # 如果所有方法都失败，使用安全文件名
-                            return "bid_document"
-                
-                # 其他类型转换为字符串
-                return str(raw_filename)
-                
-            except Exception as e:
-                logger.warning(f"文件名解码失败: {e}")
-                return "bid_document"
+                        # 尝试使用chardet检测编码
+                        import chardet
+                        detected = chardet.detect(raw_filename)
+                        if detected['encoding']:
+                            return raw_filename.decode(detected['encoding'])
+                    except:
+                        pass
+                    # 如果所有方法都失败，使用安全文件名
+                    return "bid_document"
+
+        # 其他类型转换为字符串
+        return str(raw_filename)
+
+    except Exception as e:
+        logger.warning(f"文件名解码失败: {e}")
+        return "bid_document"
 
-        def sanitize_filename(filename):
-            # 首先安全解码文件名
-            decoded_filename = safe_decode_filename(filename)
-            
-            # 按照用户要求的命名规范实现
-            name_without_ext = decoded_filename.rsplit('.', 1)[0] if '.' in decoded_filename else decoded_filename
-            
-            # 替换特殊字符为下划线，保留中文字符
-            sanitized = re.sub(r'[^\w\u4e00-\u9fff]', '_', name_without_ext)
-            sanitized = re.sub(r'_+', '_', sanitized).strip('_') or "project"
-            
-            # 添加时间戳
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            return f"{sanitized}_{timestamp}"
+
+def sanitize_filename(filename):
+    # 首先安全解码文件名
+    decoded_filename = safe_decode_filename(filename)
+
+    # 按照用户要求的命名规范实现
+    name_without_ext = decoded_filename.rsplit('.', 1)[0] if '.' in decoded_filename else decoded_filename
+
+    # 替换特殊字符为下划线，保留中文字符
+    sanitized = re.sub(r'[^\w\u4e00-\u9fff]', '_', name_without_ext)
+    sanitized = re.sub(r'_+', '_', sanitized).strip('_') or "project"
+
+    # 添加时间戳
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return f"{sanitized}_{timestamp}"
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+def _encrypt_text(text: str) -> str:
+    """加密文本（主密钥在进程内只派生一次，之后每次加密只是一次AES-GCM运算）"""
+    return AESEncryption().encrypt(text)
+
+
+def _encode_cursor(created_at: str, project_id: int) -> str:
+    """编码分页游标（最后一行的创建时间与ID）"""
+    raw = json.dumps([created_at, project_id], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple:
+    """解码分页游标，格式错误时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, project_id = json.loads(raw.decode("utf-8"))
+        return str(created_at), int(project_id)
+    except Exception as e:
+        raise ValueError(f"无效的分页游标: {cursor}") from e
+
+
+def _normalize_timestamp(value: str, end_of_day: bool) -> str:
+    """把日期或ISO时间转换为 created_at 的存储格式（YYYY-MM-DD HH:MM:SS）"""
+    value = value.strip().replace("T", " ")
+    if len(value) == 10:
+        return f"{value} {'23:59:59' if end_of_day else '00:00:00'}"
+    return value
+
+
 class ProjectService:
     """项目管理服务"""
     
@@ -115,6 +156,7 @@ class ProjectService:
                 projects_root = "./ZtbBidPro"
 
         self.db_path = Path(db_path)
+        self.pool = get_connection_pool(str(self.db_path))
         self.projects_root = Path(projects_root)
         self.projects_root.mkdir(exist_ok=True)
         
@@ -126,7 +168,7 @@ class ProjectService:
     def _init_database(self):
         """初始化数据库表"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.connection() as conn:
                 cursor = conn.cursor()
                 
                 # 创建项目表
@@ -153,6 +195,13 @@ class ProjectService:
                 if 'file_md5' not in columns:
                     cursor.execute('ALTER TABLE projects ADD COLUMN file_md5 TEXT')
 
+                # 项目列表按 (created_at, id) 倒序游标分页，过滤字段与排序字段组成复合索引
+                cursor.executescript('''
+                    CREATE INDEX IF NOT EXISTS idx_projects_created ON projects(created_at, id);
+                    CREATE INDEX IF NOT EXISTS idx_projects_status_created ON projects(status, created_at, id);
+                    CREATE INDEX IF NOT EXISTS idx_projects_mode_created ON projects(service_mode, created_at, id);
+                    CREATE INDEX IF NOT EXISTS idx_projects_phone_created ON projects(user_phone, created_at, id);
+                ''')
                 
                 # 创建项目文件表
                 cursor.execute('''
@@ -175,29 +224,30 @@ class ProjectService:
             logger.error(f"初始化数据库失败: {e}")
             raise
     
-    async def create_project(self, file: Any, user_phone: str = "") -> Dict[str, Any]:
+    async def create_project(self, file: Any = None, user_phone: str = "",
+                             staged: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         通过上传招标文件创建新项目 (异步版本)
 
         Args:
             file: FastAPI的UploadFile对象
             user_phone: 用户手机号
+            staged: 已接收的上传文件（断点续传完成后的结果），提供时忽略 file
 
         Returns:
             项目创建结果
         """
-        temp_dir = Path("./temp_uploads")
-        temp_dir.mkdir(exist_ok=True)
-        temp_file_path = temp_dir / f"{uuid.uuid4()}_{file.filename}"
+        blob_store = get_blob_store()
+        own_staged = staged is None
 
         try:
-            # 异步保存上传的文件到临时位置
-            with open(temp_file_path, "wb") as buffer:
-                content = await file.read()  # async read
-                buffer.write(content)
+            # 分块接收上传文件到共享存储的暂存目录，同时计算SHA-256与MD5
+            if staged is None:
+                staged = await stream_upload(
+                    file, blob_store.staging_dir / f"{uuid.uuid4().hex}.upload", filename=file.filename
+                )
 
-            bid_file_path = str(temp_file_path)
-            original_filename = file.filename
+            original_filename = staged["filename"]
 
             # --- 原有的同步逻辑开始 ---
             # 1. 安全解码和生成项目目录名
@@ -212,14 +262,13 @@ class ProjectService:
             project_dir = self.projects_root / project_dir_name
             project_dir.mkdir(parents=True, exist_ok=True)
 
-            # 2. 复制招标文件到项目目录下
-            target_bid_file = project_dir / original_filename
-            shutil.copy2(bid_file_path, target_bid_file)
+            # 2. 加密文件MD5（MD5已在接收时算出；在IO线程中执行，与本进程共享已派生的主密钥）
+            file_md5 = staged["md5"]
+            encrypted_md5 = await run_io(_encrypt_text, file_md5)
 
-            # 3. 计算文件MD5并加密
-            file_md5 = calculate_file_md5(bid_file_path)
-            encryptor = AESEncryption()
-            encrypted_md5 = encryptor.encrypt(file_md5)
+            # 3. 招标文件移入内容寻址存储，项目目录中放置硬链接（相同文件跨项目只存一份）
+            target_bid_file = project_dir / original_filename
+            await run_io(blob_store.ingest_staged, staged, target_bid_file)
 
             # 4. 创建 ZtbAiConfig.Ztbai 配置文件
             current_time = datetime.now().isoformat()
@@ -252,11 +301,15 @@ class ProjectService:
                 f.write(log_content)
 
             # 7. 保存到数据库
-            project_id = self._save_to_database(
+            project_id = await run_io(
+                self._save_to_database,
                 project_dir_name, safe_filename, file_md5,
                 user_phone, str(project_dir), target_bid_file
             )
 
+            # 8. 登记项目文件索引
+            await run_io(get_file_index().reconcile, project_id, project_dir)
+
             logger.info(f"项目创建成功: {project_id} - {project_dir_name}")
 
             return {
@@ -275,9 +328,9 @@ class ProjectService:
                 "message": f"创建项目失败: {str(e)}"
             }
         finally:
-            # 清理临时文件
-            if temp_file_path.exists():
-                os.remove(temp_file_path)
+            # 清理未存入共享存储的暂存文件
+            if own_staged and staged and os.path.exists(staged["path"]):
+                os.remove(staged["path"])
 
     def _create_readme_content(self, project_name: str, bid_file_name: str, created_time: str) -> str:
         """创建README.md内容"""
@@ -341,7 +394,7 @@ class ProjectService:
     def _save_to_database(self, project_name: str, bid_file_name: str, file_md5: str,
                          user_phone: str, project_path: str, bid_file_path: Path) -> int:
         """保存项目信息到数据库"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
 
             # 插入项目记录
@@ -375,49 +428,93 @@ class ProjectService:
             conn.commit()
             return project_id
     
-    def get_project_list(self) -> Dict[str, Any]:
+    def get_project_list(self, limit: Optional[int] = None, cursor: Optional[str] = None,
+                         status: Optional[str] = None, service_mode: Optional[str] = None,
+                         user_phone: Optional[str] = None, created_from: Optional[str] = None,
+                         created_to: Optional[str] = None, search: Optional[str] = None,
+                         include_total: bool = False) -> Dict[str, Any]:
         """
-        获取项目列表
+        获取项目列表（按创建时间倒序的游标分页）
         
+        Args:
+            limit: 每页数量，默认 projects.list_page_size，上限 projects.list_max_limit
+            cursor: 上一页返回的 next_cursor，为空时从第一页开始
+            status / service_mode / user_phone: 精确过滤
+            created_from / created_to: 创建时间范围（含端点，可只传日期）
+            search: 项目名称关键字
+            include_total: 是否统计符合条件的总数（需要额外一次计数查询）
+            
         Returns:
             项目列表
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT id, name, bid_file_name, user_phone, service_mode, status, 
-                           project_path, description, created_at, updated_at
-                    FROM projects
-                    ORDER BY created_at DESC
-                ''')
-                
-                rows = cursor.fetchall()
-                
-                projects = []
-                for row in rows:
-                    project = {
-                        "id": row[0],
-                        "name": row[1],
-                        "bid_file_name": row[2],
-                        "user_phone": row[3],
-                        "service_mode": row[4],
-                        "status": row[5],
-                        "project_path": row[6],
-                        "description": row[7],
-                        "created_at": row[8],
-                        "updated_at": row[9]
+            config = get_config()
+            max_limit = int(config.get("projects.list_max_limit", 200))
+            limit = int(limit or config.get("projects.list_page_size", 50))
+            limit = max(1, min(limit, max_limit))
+
+            where, params = self._build_list_filters(
+                status, service_mode, user_phone, created_from, created_to, search
+            )
+            total = None
+            if include_total:
+                total = self.pool.fetchone(
+                    f"SELECT COUNT(*) FROM projects {'WHERE ' + ' AND '.join(where) if where else ''}",
+                    tuple(params)
+                )[0]
+
+            if cursor:
+                try:
+                    cursor_created, cursor_id = _decode_cursor(cursor)
+                except ValueError:
+                    return {
+                        "success": False,
+                        "message": "无效的分页游标"
                     }
-                    projects.append(project)
-                
-                logger.info(f"获取项目列表成功，共 {len(projects)} 个项目")
-                
-                return {
-                    "success": True,
-                    "projects": projects,
-                    "total": len(projects),
-                    "message": "获取项目列表成功"
+                where.append("(created_at, id) < (?, ?)")
+                params.extend([cursor_created, cursor_id])
+
+            # 多取一条判断是否还有下一页
+            rows = self.pool.fetchall(f'''
+                SELECT id, name, bid_file_name, user_phone, service_mode, status,
+                       project_path, description, created_at, updated_at
+                FROM projects
+                {'WHERE ' + ' AND '.join(where) if where else ''}
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            ''', tuple(params) + (limit + 1,))
+
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            projects = [
+                {
+                    "id": row["id"],
+                    "name": row["name"],
+                    "bid_file_name": row["bid_file_name"],
+                    "user_phone": row["user_phone"],
+                    "service_mode": row["service_mode"],
+                    "status": row["status"],
+                    "project_path": row["project_path"],
+                    "description": row["description"],
+                    "created_at": row["created_at"],
+                    "updated_at": row["updated_at"]
                 }
+                for row in rows
+            ]
+            next_cursor = _encode_cursor(rows[-1]["created_at"], rows[-1]["id"]) if has_more else None
+
+            logger.info(f"获取项目列表成功，本页 {len(projects)} 个项目")
+
+            return {
+                "success": True,
+                "projects": projects,
+                "count": len(projects),
+                "total": total,
+                "limit": limit,
+                "has_more": has_more,
+                "next_cursor": next_cursor,
+                "message": "获取项目列表成功"
+            }
                 
         except Exception as e:
             logger.error(f"获取项目列表失败: {e}")
@@ -425,6 +522,34 @@ class ProjectService:
                 "success": False,
                 "message": f"获取项目列表失败: {str(e)}"
             }
+
+    @staticmethod
+    def _build_list_filters(status: Optional[str], service_mode: Optional[str], user_phone: Optional[str],
+                            created_from: Optional[str], created_to: Optional[str],
+                            search: Optional[str]) -> tuple:
+        """构造项目列表的过滤条件，返回 (条件列表, 参数列表)"""
+        where: List[str] = []
+        params: List[Any] = []
+        if status:
+            where.append("status = ?")
+            params.append(status)
+        if service_mode:
+            where.append("service_mode = ?")
+            params.append(service_mode)
+        if user_phone:
+            where.append("user_phone = ?")
+            params.append(user_phone)
+        if created_from:
+            where.append("created_at >= ?")
+            params.append(_normalize_timestamp(created_from, end_of_day=False))
+        if created_to:
+            where.append("created_at <= ?")
+            params.append(_normalize_timestamp(created_to, end_of_day=True))
+        if search:
+            escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            where.append("name LIKE ? ESCAPE '\\'")
+            params.append(f"%{escaped}%")
+        return where, params
     
     def get_project_details(self, project_id: str) -> Dict[str, Any]:
         """
@@ -447,7 +572,7 @@ class ProjectService:
                     "project": {}
                 }
 
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     SELECT id, name, bid_file_name, user_phone, service_mode, status,
@@ -521,7 +646,7 @@ class ProjectService:
             更新结果
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.connection() as conn:
                 cursor = conn.cursor()
 
                 # 构建更新SQL
@@ -568,32 +693,36 @@ class ProjectService:
                 ''', (project_id,))
 
                 row = cursor.fetchone()
-                if row:
-                    project = {
-                        "id": row[0],
-                        "name": row[1],
-                        "bid_file_name": row[2],
-                        "user_phone": row[3],
-                        "service_mode": row[4],
-                        "status": row[5],
-                        "project_path": row[6],
-                        "description": row[7],
-                        "created_at": row[8],
-                        "updated_at": row[9]
-                    }
 
-                    logger.info(f"更新项目成功: {project_id}")
+            # 提交后再失效项目解析缓存，避免并发读取在提交前重新缓存旧数据
+            get_project_resolver(self.pool.db_path).invalidate(project_id)
 
-                    return {
-                        "success": True,
-                        "message": "更新项目成功",
-                        "project": project
-                    }
-                else:
-                    return {
-                        "success": False,
-                        "message": "获取更新后的项目信息失败"
-                    }
+            if row:
+                project = {
+                    "id": row[0],
+                    "name": row[1],
+                    "bid_file_name": row[2],
+                    "user_phone": row[3],
+                    "service_mode": row[4],
+                    "status": row[5],
+                    "project_path": row[6],
+                    "description": row[7],
+                    "created_at": row[8],
+                    "updated_at": row[9]
+                }
+
+                logger.info(f"更新项目成功: {project_id}")
+
+                return {
+                    "success": True,
+                    "message": "更新项目成功",
+                    "project": project
+                }
+            else:
+                return {
+                    "success": False,
+                    "message": "获取更新后的项目信息失败"
+                }
 
         except Exception as e:
             logger.error(f"更新项目失败: {str(e)}")
@@ -629,7 +758,7 @@ class ProjectService:
 
             # 获取项目信息
             logger.debug(f"查询项目信息: {project_id_int}")
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute('SELECT project_path, name FROM projects WHERE id = ?', (project_id_int,))
                 row = cursor.fetchone()
@@ -739,6 +868,14 @@ class ProjectService:
                             directory_deleted = True
                             logger.info(f"项目目录删除成功: {project_path}")
 
+                            # 释放项目文件对共享存储的引用，回收已无引用的文件
+                            try:
+                                collected = get_blob_store().release_tree(project_path_obj)
+                                if collected:
+                                    logger.info(f"回收共享存储文件 {collected} 个")
+                            except Exception as gc_error:
+                                logger.warning(f"释放共享存储引用失败: {gc_error}")
+
                         except PermissionError as pe:
                             error_msg = f"删除项目目录失败，权限不足: {project_path} - {str(pe)}"
                             logger.error(error_msg)
@@ -796,6 +933,14 @@ class ProjectService:
                     conn.commit()
                     logger.info(f"数据库记录删除成功: 项目记录={projects_deleted}条, 文件记录={files_deleted}条, 进展记录={progress_deleted}条")
 
+                    get_project_resolver(self.pool.db_path).invalidate(project_id_int)
+
+                    # 清除项目文件索引
+                    try:
+                        get_file_index().remove_project(project_id_int)
+                    except Exception as index_error:
+                        logger.warning(f"清除项目文件索引失败: {index_error}")
+
                 except sqlite3.Error as se:
                     error_msg = f"删除数据库记录失败: {str(se)}"
                     logger.error(error_msg)
@@ -855,6 +1000,67 @@ class ProjectService:
             logger.warning(f"创建项目备份失败: {str(e)}")
             return None
 
+    def verify_projects(self, project_ids: Optional[List[Any]] = None) -> Dict[str, Any]:
+        """
+        批量校验项目：解密 ZtbAiConfig.Ztbai 中的加密MD5并与数据库记录比对
+
+        Args:
+            project_ids: 要校验的项目ID列表，为空时校验全部项目
+
+        Returns:
+            校验结果
+        """
+        try:
+            if project_ids:
+                placeholders = ",".join("?" for _ in project_ids)
+                rows = self.pool.fetchall(
+                    f"SELECT id, name, project_path, file_md5 FROM projects WHERE id IN ({placeholders})",
+                    tuple(int(pid) for pid in project_ids)
+                )
+            else:
+                rows = self.pool.fetchall("SELECT id, name, project_path, file_md5 FROM projects")
+
+            encrypted = []
+            for row in rows:
+                config_file = Path(row["project_path"] or "") / "ZtbAiConfig.Ztbai"
+                try:
+                    with open(config_file, 'r', encoding='utf-8') as f:
+                        encrypted.append(json.load(f).get("file_md5_encrypted"))
+                except (OSError, ValueError):
+                    encrypted.append(None)
+
+            decrypted = AESEncryption().decrypt_many(encrypted)
+
+            results = []
+            for row, token, md5 in zip(rows, encrypted, decrypted):
+                if token is None:
+                    status = "missing_config"
+                elif md5 is None:
+                    status = "decrypt_failed"
+                elif md5 == row["file_md5"]:
+                    status = "verified"
+                else:
+                    status = "mismatch"
+                results.append({"id": row["id"], "name": row["name"], "status": status})
+
+            verified = sum(1 for r in results if r["status"] == "verified")
+            logger.info(f"批量校验项目完成: {verified}/{len(results)} 通过")
+            return {
+                "success": True,
+                "total": len(results),
+                "verified": verified,
+                "failed": len(results) - verified,
+                "projects": results,
+                "message": "项目校验完成"
+            }
+
+        except Exception as e:
+            logger.error(f"批量校验项目失败: {e}")
+            return {
+                "success": False,
+                "message": f"批量校验项目失败: {str(e)}"
+            }
+
     def get_health_status(self) -> Dict[str, Any]:
         """
         获取服务健康状态
@@ -864,7 +1070,7 @@ class ProjectService:
         """
         try:
             # 检查数据库连接
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute('SELECT COUNT(*) FROM projects')
                 project_count = cursor.fetchone()[0]
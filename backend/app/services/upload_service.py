@@ -0,0 +1,312 @@
+"""
+上传接收服务
+以固定大小的分块接收上传文件，避免整个文件读入内存：
+- stream_upload：边读 UploadFile 边计算 SHA-256/MD5 边写入，写完后原子重命名到目标位置
+- 断点续传会话：大文件可分多次上传，客户端按服务端记录的偏移量续传，完成后校验哈希
+- 接收结果（staged）统一为 {"path", "size", "sha256", "md5", "filename"}，可直接交给共享存储
+每个上传占用的内存约为一个分块大小
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional, Union
+
+from ..core.config import get_config
+from ..core.executors import run_io
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "upload_sessions")
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+PathLike = Union[str, Path]
+
+
+class UploadError(Exception):
+    """上传失败"""
+
+
+class UploadTooLargeError(UploadError):
+    """上传文件超出大小限制"""
+
+
+class UploadOffsetError(UploadError):
+    """续传偏移量与服务端记录不一致"""
+
+    def __init__(self, expected: int, message: str = ""):
+        super().__init__(message or f"偏移量不匹配，应从 {expected} 字节处续传")
+        self.expected = expected
+
+
+class UploadNotFoundError(UploadError):
+    """上传会话不存在或已过期"""
+
+
+def _chunk_size() -> int:
+    return int(get_config().get("uploads.chunk_size", DEFAULT_CHUNK_SIZE))
+
+
+def _max_size() -> int:
+    return int(get_config().get("uploads.max_size_bytes", 2 * 1024 ** 3))
+
+
+def _write_chunk(f, hashers, chunk: bytes) -> None:
+    f.write(chunk)
+    for hasher in hashers:
+        hasher.update(chunk)
+
+
+async def stream_upload(upload: Any, dest: PathLike, filename: Optional[str] = None) -> Dict[str, Any]:
+    """
+    分块读取 UploadFile 写入 dest（先写同目录临时文件，完成后原子重命名）
+    返回接收结果；超出 uploads.max_size_bytes 时抛出 UploadTooLargeError
+    """
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = dest.with_name(f".{dest.name}.{uuid.uuid4().hex[:8]}.part")
+    chunk_size = _chunk_size()
+    max_size = _max_size()
+    sha256, md5 = hashlib.sha256(), hashlib.md5()
+    size = 0
+    f = await run_io(open, tmp_file, 'wb')
+    try:
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if max_size > 0 and size > max_size:
+                raise UploadTooLargeError(f"文件超过大小限制 {max_size} 字节")
+            await run_io(_write_chunk, f, (sha256, md5), chunk)
+        await run_io(f.close)
+        await run_io(os.replace, tmp_file, dest)
+    except BaseException:
+        f.close()
+        tmp_file.unlink(missing_ok=True)
+        raise
+    return {
+        "path": str(dest),
+        "size": size,
+        "sha256": sha256.hexdigest(),
+        "md5": md5.hexdigest(),
+        "filename": filename or getattr(upload, "filename", None) or dest.name,
+    }
+
+
+def _hash_file(path: Path) -> Dict[str, str]:
+    sha256, md5 = hashlib.sha256(), hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(DEFAULT_CHUNK_SIZE), b''):
+            sha256.update(chunk)
+            md5.update(chunk)
+    return {"sha256": sha256.hexdigest(), "md5": md5.hexdigest()}
+
+
+class UploadSessionManager:
+    """断点续传会话管理"""
+
+    def __init__(self, root: str = DEFAULT_SESSION_ROOT, ttl_seconds: float = 24 * 3600):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = float(ttl_seconds)
+        self._lock = threading.Lock()
+        # upload_id -> (已哈希的字节数, sha256, md5)，进程重启后在完成时重新计算
+        self._hashers: Dict[str, tuple] = {}
+        # 同一会话的追加写入串行执行
+        self._session_locks: Dict[str, threading.Lock] = {}
+
+    def _session_dir(self, upload_id: str) -> Path:
+        if not upload_id or not all(c in "0123456789abcdef" for c in upload_id):
+            raise UploadNotFoundError(f"上传会话不存在: {upload_id}")
+        return self.root / upload_id
+
+    def _read_meta(self, upload_id: str) -> Dict[str, Any]:
+        meta_file = self._session_dir(upload_id) / "meta.json"
+        try:
+            meta = json.loads(meta_file.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            raise UploadNotFoundError(f"上传会话不存在: {upload_id}")
+        data_file = self._session_dir(upload_id) / "data.part"
+        meta["received"] = data_file.stat().st_size if data_file.exists() else meta.get("received", 0)
+        return meta
+
+    def _write_meta(self, upload_id: str, meta: Dict[str, Any]) -> None:
+        meta_file = self._session_dir(upload_id) / "meta.json"
+        tmp = meta_file.with_suffix(".tmp")
+        tmp.write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, meta_file)
+
+    def _session_lock(self, upload_id: str) -> threading.Lock:
+        with self._lock:
+            return self._session_locks.setdefault(upload_id, threading.Lock())
+
+    # ------------------ 会话 ------------------
+    def create(self, filename: str, total_size: Optional[int] = None,
+               sha256: Optional[str] = None) -> Dict[str, Any]:
+        """创建上传会话"""
+        max_size = _max_size()
+        if total_size is not None and max_size > 0 and int(total_size) > max_size:
+            raise UploadTooLargeError(f"文件超过大小限制 {max_size} 字节")
+        self.purge_expired()
+        upload_id = uuid.uuid4().hex
+        self._session_dir(upload_id).mkdir(parents=True)
+        (self._session_dir(upload_id) / "data.part").touch()
+        meta = {
+            "upload_id": upload_id,
+            "filename": filename,
+            "total_size": int(total_size) if total_size is not None else None,
+            "expected_sha256": sha256,
+            "status": "uploading",
+            "chunk_size": _chunk_size(),
+            "created_at": time.time(),
+            "updated_at": time.time(),
+        }
+        self._write_meta(upload_id, meta)
+        return dict(meta, received=0)
+
+    def get(self, upload_id: str) -> Dict[str, Any]:
+        """查询会话状态（received 即客户端续传的起始偏移量）"""
+        meta = self._read_meta(upload_id)
+        meta.pop("staged", None)
+        return meta
+
+    def _append_chunk(self, upload_id: str, offset: int, chunk: bytes) -> int:
+        data_file = self._session_dir(upload_id) / "data.part"
+        with self._session_lock(upload_id):
+            received = data_file.stat().st_size
+            if offset != received:
+                raise UploadOffsetError(received)
+            max_size = _max_size()
+            if max_size > 0 and received + len(chunk) > max_size:
+                raise UploadTooLargeError(f"文件超过大小限制 {max_size} 字节")
+            with open(data_file, 'ab') as f:
+                f.write(chunk)
+            state = self._hashers.get(upload_id)
+            if state is None and received == 0:
+                state = (0, hashlib.sha256(), hashlib.md5())
+            if state is not None and state[0] == received:
+                state[1].update(chunk)
+                state[2].update(chunk)
+                self._hashers[upload_id] = (received + len(chunk), state[1], state[2])
+            return received + len(chunk)
+
+    async def append(self, upload_id: str, offset: int, stream: AsyncIterator[bytes]) -> Dict[str, Any]:
+        """从 offset 处追加请求体数据，返回更新后的会话状态"""
+        meta = self._read_meta(upload_id)
+        if meta["status"] != "uploading":
+            raise UploadError(f"上传会话已结束: {meta['status']}")
+        chunk_size = _chunk_size()
+        buffer = bytearray()
+        position = int(offset)
+        async for data in stream:
+            buffer.extend(data)
+            if len(buffer) >= chunk_size:
+                position = await run_io(self._append_chunk, upload_id, position, bytes(buffer))
+                buffer.clear()
+        if buffer:
+            position = await run_io(self._append_chunk, upload_id, position, bytes(buffer))
+        if position == int(offset):
+            # 空请求体，仅校验偏移量
+            await run_io(self._append_chunk, upload_id, position, b"")
+        meta["updated_at"] = time.time()
+        await run_io(self._write_meta, upload_id, {k: v for k, v in meta.items() if k != "received"})
+        return dict(meta, received=position)
+
+    def _finish(self, upload_id: str, sha256: Optional[str], staging_dir: Path) -> Dict[str, Any]:
+        with self._session_lock(upload_id):
+            meta = self._read_meta(upload_id)
+            if meta["status"] == "completed":
+                return meta["staged"]
+            data_file = self._session_dir(upload_id) / "data.part"
+            received = meta["received"]
+            if meta.get("total_size") is not None and received != meta["total_size"]:
+                raise UploadOffsetError(received, f"上传未完成: 已接收 {received}/{meta['total_size']} 字节")
+
+            state = self._hashers.pop(upload_id, None)
+            if state is not None and state[0] == received:
+                digests = {"sha256": state[1].hexdigest(), "md5": state[2].hexdigest()}
+            else:
+                digests = _hash_file(data_file)
+            expected = sha256 or meta.get("expected_sha256")
+            if expected and expected.lower() != digests["sha256"]:
+                raise UploadError("文件校验失败: SHA-256 不一致")
+
+            staging_dir.mkdir(parents=True, exist_ok=True)
+            staged_path = staging_dir / f"{upload_id}.upload"
+            try:
+                os.replace(data_file, staged_path)
+            except OSError:
+                shutil.move(str(data_file), str(staged_path))
+            staged = {
+                "path": str(staged_path),
+                "size": received,
+                "sha256": digests["sha256"],
+                "md5": digests["md5"],
+                "filename": meta["filename"],
+            }
+            meta.update(status="completed", staged=staged, updated_at=time.time())
+            meta.pop("received", None)
+            self._write_meta(upload_id, meta)
+            return staged
+
+    async def complete(self, upload_id: str, sha256: Optional[str] = None,
+                       staging_dir: Optional[PathLike] = None) -> Dict[str, Any]:
+        """结束上传并校验，返回接收结果（文件移入 staging_dir，默认会话目录）"""
+        target_dir = Path(staging_dir) if staging_dir else self._session_dir(upload_id)
+        return await run_io(self._finish, upload_id, sha256, target_dir)
+
+    def get_staged(self, upload_id: str) -> Dict[str, Any]:
+        """获取已完成上传的接收结果；使用方存入文件后调用 abort 清理会话"""
+        meta = self._read_meta(upload_id)
+        if meta["status"] != "completed":
+            raise UploadError("上传尚未完成")
+        return meta["staged"]
+
+    def abort(self, upload_id: str) -> None:
+        """取消上传并删除已接收的数据"""
+        session_dir = self._session_dir(upload_id)
+        with self._lock:
+            self._hashers.pop(upload_id, None)
+            self._session_locks.pop(upload_id, None)
+        shutil.rmtree(session_dir, ignore_errors=True)
+
+    def purge_expired(self) -> int:
+        """清理过期会话"""
+        now = time.time()
+        purged = 0
+        for meta_file in self.root.glob("*/meta.json"):
+            try:
+                meta = json.loads(meta_file.read_text(encoding="utf-8"))
+                expired = now - meta.get("updated_at", 0) > self.ttl_seconds
+                if expired:
+                    self.abort(meta_file.parent.name)
+                    purged += 1
+            except Exception:
+                continue
+        return purged
+
+
+# 全局会话管理实例
+_upload_sessions: Optional[UploadSessionManager] = None
+_upload_sessions_lock = threading.Lock()
+
+
+def get_upload_sessions() -> UploadSessionManager:
+    """获取断点续传会话管理实例"""
+    global _upload_sessions
+    if _upload_sessions is None:
+        with _upload_sessions_lock:
+            if _upload_sessions is None:
+                config = get_config()
+                _upload_sessions = UploadSessionManager(
+                    root=config.get("uploads.session_root") or DEFAULT_SESSION_ROOT,
+                    ttl_seconds=config.get("uploads.session_ttl_seconds", 24 * 3600),
+                )
+    return _upload_sessions
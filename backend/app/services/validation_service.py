@@ -8,6 +8,8 @@ import requests
 from typing import Dict, Any, Optional
 from pathlib import Path
 
+from .llm_scheduler import get_llm_scheduler, LLMRetryableError, RETRYABLE_STATUS
+
 # 添加Agent路径
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
@@ -124,11 +126,26 @@ class ValidationService:
                         "temperature": 0.7
                     }
 
-                    response = requests.post(
-                        f"{self.base_url}/chat/completions",
-                        headers=headers,
-                        json=data,
-                        timeout=60
+                    def _post():
+                        resp = requests.post(
+                            f"{self.base_url}/chat/completions",
+                            headers=headers,
+                            json=data,
+                            timeout=60
+                        )
+                        if resp.status_code in RETRYABLE_STATUS:
+                            retry_after = resp.headers.get("Retry-After")
+                            raise LLMRetryableError(
+                                resp.status_code, resp.text[:200],
+                                float(retry_after) if retry_after and retry_after.isdigit() else None
+                            )
+                        return resp
+
+                    # 交互式校验请求优先于批量内容生成
+                    scheduler = get_llm_scheduler()
+                    response = scheduler.call(
+                        _post, priority="interactive",
+                        tokens=scheduler.estimate_tokens(prompt, max_tokens)
                     )
 
                     if response.status_code == 200:
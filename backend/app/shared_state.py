@@ -2,7 +2,8 @@
 Shared state for the ZtbAi API server.
 """
 
-# In-memory storage for analysis tasks
-# In a production environment, this would be replaced with a more robust solution like Redis or a database.
-analysis_tasks = {}
+# Analysis tasks are tracked by the indexed, persistent task registry
+# (see app.core.task_registry), which replaces the former process-local dict.
+from app.core.task_registry import get_task_registry
 
+__all__ = ["get_task_registry"]
@@ -5,7 +5,7 @@ from pathlib import Path
 from typing import Optional
 
 import os
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 def find_bid_file_in_project(project_dir: Path) -> Optional[Path]:
     """在项目目录中查找招标文件"""
@@ -32,6 +32,10 @@ def find_bid_file_in_project(project_dir: Path) -> Optional[Path]:
 
 from datetime import datetime
 from app.core.response import create_response, create_error_response
+from app.core.connection_pool import get_connection_pool
+from app.core.file_index import get_file_index
+from app.core.project_resolver import get_project_resolver
+from app.core.progress_writer import get_progress_writer, TERMINAL_STATUSES
 
 async def save_analysis_results(project_id: str, combined_result):
     """保存分析结果到项目目录（严格使用Agent产物，不做模板覆写）"""
@@ -80,6 +84,15 @@ async def save_analysis_results(project_id: str, combined_result):
         except Exception as e:
             print(f"⚠️ [API] 更新项目配置文件失败: {e}")
 
+        # 登记到项目文件索引
+        file_index = get_file_index()
+        for path in (analysis_path, strategy_path, project_dir / "ZtbAiConfig.Ztbai"):
+            try:
+                file_index.record(project_id, path, project_dir)
+            except ValueError:
+                # Agent产物不在项目目录下，无需登记
+                pass
+
         print(f"✅ [API] 分析结果已保存到项目目录: {project_path}")
         return create_response(True, "保存分析结果成功", {
             'files_generated': {
@@ -206,56 +219,18 @@ async def update_project_config_file(project_dir: Path, generation_results: dict
 
 
 def get_project_path_by_id(project_id: str) -> Optional[str]:
-    """根据项目ID获取项目路径"""
+    """根据项目ID获取项目路径（经共享的项目解析器缓存）"""
     try:
-        print(f"🔍 [PATH_RESOLVER] 根据项目ID获取路径: {project_id}")
-
-        # 连接数据库获取项目信息
-        import sqlite3
-        db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ztbai.db")
-        print(f"🔍 [PATH_RESOLVER] 数据库路径: {db_path}")
-
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
-        # 查询项目信息
-        cursor.execute("SELECT * FROM projects WHERE id = ?", (project_id,))
-        project = cursor.fetchone()
-
-        if project:
-            project_path = project['project_path']
-            print(f"✅ [PATH_RESOLVER] 从数据库获取到项目路径: {project_path}")
-            conn.close()
-            return project_path
-        else:
-            print(f"❌ [PATH_RESOLVER] 数据库中未找到项目ID: {project_id}")
-            # 尝试从ZtbBidPro目录查找匹配的项目
-            fallback_path = None  # find_project_by_id_fallback(project_id)
-            if fallback_path:
-                print(f"✅ [PATH_RESOLVER] 从目录查找到项目路径: {fallback_path}")
-                conn.close()
-                return fallback_path
-            conn.close()
-            return None
-
+        return get_project_resolver().get_path(project_id)
     except Exception as e:
         print(f"❌ [PATH_RESOLVER] 获取项目路径失败: {e}")
-        import traceback
-        print(f"❌ [PATH_RESOLVER] 错误堆栈: {traceback.format_exc()}")
         return None
 
 def upsert_task_record(project_id: str, step_key: str, task_id: str, status: str, progress: int = 0, payload: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
     try:
-        import sqlite3, json
+        import json
         now = datetime.now().isoformat()
         db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ztbai.db")
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        # 读取已有
-        cursor.execute("SELECT id, started_at FROM tasks WHERE project_id=? AND step_key=? AND task_id=? ORDER BY id DESC LIMIT 1", (project_id, step_key, task_id))
-        row = cursor.fetchone()
-        started_at = row[1] if row else (now if status == "in_progress" else None)
         completed_at = now if status == "completed" else None
         cancelled_at = now if status == "cancelled" else None
         payload_txt = json.dumps(payload, ensure_ascii=False) if payload else None
@@ -264,16 +239,21 @@ def upsert_task_record(project_id: str, step_key: str, task_id: str, status: str
             idk = payload.get("idempotency_key") if payload else None
         except Exception:
             idk = None
-        # 插入一条快照记录（保留历史）
-        cursor.execute(
+        # 插入一条快照记录（保留历史）；started_at 沿用已有记录，由进度写入器合并后批量写入
+        get_progress_writer().submit(
+            get_connection_pool(db_path),
+            ("tasks", project_id, step_key, task_id),
             """
             INSERT INTO tasks (task_id, project_id, step_key, status, progress, payload, error, started_at, updated_at, completed_at, cancelled_at, idempotency_key)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            VALUES (?, ?, ?, ?, ?, ?, ?,
+                    COALESCE((SELECT started_at FROM tasks WHERE project_id=? AND step_key=? AND task_id=? ORDER BY id DESC LIMIT 1), ?),
+                    ?, ?, ?, ?)
             """,
-            (task_id, project_id, step_key, status, int(progress or 0), payload_txt, error, started_at, now, completed_at, cancelled_at, idk)
+            (task_id, project_id, step_key, status, int(progress or 0), payload_txt, error,
+             project_id, step_key, task_id, now if status == "in_progress" else None,
+             now, completed_at, cancelled_at, idk),
+            immediate=status in TERMINAL_STATUSES
         )
-        conn.commit()
-        conn.close()
     except Exception as e:
         print(f"⚠️ 写入任务记录失败: {e}")
 
@@ -430,20 +410,16 @@ async def update_project_config_file(project_dir: Path, generation_results: dict
 
 def insert_step_result_record(project_id: str, step_key: str, data_obj: Dict[str, Any]):
     try:
-        import sqlite3, json
+        import json
         now = datetime.now().isoformat()
         db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ztbai.db")
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute(
+        get_connection_pool(db_path).execute(
             """
             INSERT INTO step_results (project_id, step_key, result_json, created_at)
             VALUES (?, ?, ?, ?)
             """,
             (project_id, step_key, json.dumps(data_obj, ensure_ascii=False), now)
         )
-        conn.commit()
-        conn.close()
     except Exception as e:
         print(f"⚠️ 写入步骤结果失败: {e}")
 
@@ -460,23 +436,83 @@ def insert_step_result_record(project_id: str, step_key: str, data_obj: Dict[str
 
 import base64
 import hashlib
+import logging
+import re
+import threading
+import uuid
+from functools import lru_cache
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 import os
 
+from app.core.config import get_config
+
+logger = logging.getLogger(__name__)
+
+# 主密钥盐文件默认位置（与 ztbai.db 同目录）
+DEFAULT_KEY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ztbai.key")
+# 主密钥格式的密文前缀；无前缀的为旧格式 base64(salt + nonce + ciphertext)
+MASTER_KEY_PREFIX = "v2:"
+# 旧版本使用不加密的兜底实现，配置文件中直接保存32位十六进制MD5；
+# 合法的旧格式密文至少 44 字节（base64 后 60 个字符），不会与之混淆
+LEGACY_PLAINTEXT_MD5 = re.compile(r"^[0-9a-fA-F]{32}$")
+
+# (密码, 盐文件) -> 主密钥对应的 AESGCM 实例
+_master_ciphers: Dict[Any, AESGCM] = {}
+_master_ciphers_lock = threading.Lock()
+
+
+@lru_cache(maxsize=256)
+def _pbkdf2_derive(password: bytes, salt: bytes) -> bytes:
+    """PBKDF2-HMAC-SHA256 派生密钥（按盐缓存）"""
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,  # AES-256需要32字节密钥
+        salt=salt,
+        iterations=100000,
+    )
+    return kdf.derive(password)
+
+
+def _load_master_salt(key_file: Path) -> bytes:
+    """读取主密钥盐值，不存在时生成（多个进程同时生成时以先写入的为准）"""
+    if not key_file.exists():
+        key_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = key_file.with_name(f".{key_file.name}.{uuid.uuid4().hex[:8]}")
+        tmp_file.write_text(base64.b64encode(os.urandom(16)).decode('ascii'), encoding='utf-8')
+        try:
+            os.link(tmp_file, key_file)
+        except FileExistsError:
+            pass
+        finally:
+            tmp_file.unlink(missing_ok=True)
+    return base64.b64decode(key_file.read_text(encoding='utf-8').strip())
+
 
 class AESEncryption:
-    """AES-256-GCM加密工具类"""
+    """
+    AES-256-GCM加密工具类
+    master 模式（默认）：主密钥每个进程只派生一次，每条消息使用随机nonce，密文为 "v2:" + base64(nonce + ciphertext)
+    per_message 模式：每条消息生成新盐值并重新派生密钥（旧格式）
+    解密时自动识别两种格式，已有配置文件中的旧格式密文仍可读取；
+    未加密保存的32位十六进制MD5原样返回
+    """
 
-    def __init__(self, password: str = "My060322@"):
+    def __init__(self, password: str = "My060322@", mode: Optional[str] = None,
+                 key_file: Optional[str] = None):
         """
         初始化加密器
 
         Args:
             password: 加密密码
+            mode: master 或 per_message，默认读取 encryption.mode
+            key_file: 主密钥盐值文件，默认读取 encryption.key_file
         """
+        config = get_config()
         self.password = password.encode('utf-8')
+        self.mode = mode or config.get("encryption.mode", "master")
+        self.key_file = Path(key_file or config.get("encryption.key_file") or DEFAULT_KEY_FILE)
 
     def _derive_key(self, salt: bytes) -> bytes:
         """
@@ -488,13 +524,19 @@ class AESEncryption:
         Returns:
             派生的密钥
         """
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,  # AES-256需要32字节密钥
-            salt=salt,
-            iterations=100000,
-        )
-        return kdf.derive(self.password)
+        return _pbkdf2_derive(self.password, salt)
+
+    def _master_cipher(self) -> AESGCM:
+        """获取主密钥（每个进程只派生一次）"""
+        cache_key = (self.password, str(self.key_file))
+        cipher = _master_ciphers.get(cache_key)
+        if cipher is None:
+            with _master_ciphers_lock:
+                cipher = _master_ciphers.get(cache_key)
+                if cipher is None:
+                    cipher = AESGCM(self._derive_key(_load_master_salt(self.key_file)))
+                    _master_ciphers[cache_key] = cipher
+        return cipher
 
     def encrypt(self, plaintext: str) -> str:
         """
@@ -507,24 +549,17 @@ class AESEncryption:
             加密后的base64编码字符串
         """
         try:
-            # 生成随机盐值和nonce
-            salt = os.urandom(16)
             nonce = os.urandom(12)  # GCM模式推荐12字节nonce
 
-            # 派生密钥
-            key = self._derive_key(salt)
-
-            # 创建AESGCM实例
-            aesgcm = AESGCM(key)
-
-            # 加密
-            ciphertext = aesgcm.encrypt(nonce, plaintext.encode('utf-8'), None)
-
-            # 组合：salt + nonce + ciphertext
-            encrypted_data = salt + nonce + ciphertext
+            if self.mode == "per_message":
+                # 组合：salt + nonce + ciphertext
+                salt = os.urandom(16)
+                ciphertext = AESGCM(self._derive_key(salt)).encrypt(nonce, plaintext.encode('utf-8'), None)
+                return base64.b64encode(salt + nonce + ciphertext).decode('utf-8')
 
-            # 返回base64编码
-            return base64.b64encode(encrypted_data).decode('utf-8')
+            # 组合："v2:" + base64(nonce + ciphertext)
+            ciphertext = self._master_cipher().encrypt(nonce, plaintext.encode('utf-8'), None)
+            return MASTER_KEY_PREFIX + base64.b64encode(nonce + ciphertext).decode('utf-8')
 
         except Exception as e:
             raise Exception(f"加密失败: {str(e)}")
@@ -540,6 +575,16 @@ class AESEncryption:
             解密后的明文
         """
         try:
+            if LEGACY_PLAINTEXT_MD5.match(encrypted_text):
+                return encrypted_text
+
+            if encrypted_text.startswith(MASTER_KEY_PREFIX):
+                encrypted_data = base64.b64decode(encrypted_text[len(MASTER_KEY_PREFIX):].encode('utf-8'))
+                nonce = encrypted_data[:12]
+                ciphertext = encrypted_data[12:]
+                plaintext = self._master_cipher().decrypt(nonce, ciphertext, None)
+                return plaintext.decode('utf-8')
+
             # base64解码
             encrypted_data = base64.b64decode(encrypted_text.encode('utf-8'))
 
@@ -562,6 +607,28 @@ class AESEncryption:
         except Exception as e:
             raise Exception(f"解密失败: {str(e)}")
 
+    def decrypt_many(self, encrypted_texts: List[Optional[str]]) -> List[Optional[str]]:
+        """
+        批量解密（用于批量校验项目）
+
+        Args:
+            encrypted_texts: 加密字符串列表
+
+        Returns:
+            与输入顺序一致的明文列表，空输入或解密失败的位置为 None
+        """
+        results: List[Optional[str]] = []
+        for encrypted_text in encrypted_texts:
+            if not encrypted_text:
+                results.append(None)
+                continue
+            try:
+                results.append(self.decrypt(encrypted_text))
+            except Exception as e:
+                logger.warning(f"批量解密跳过一条密文: {e}")
+                results.append(None)
+        return results
+
 
 def calculate_file_md5(file_path: str) -> str:
     """
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# 使 `app` 包可导入（与 backend 目录下启动服务时一致）
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
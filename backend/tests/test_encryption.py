@@ -0,0 +1,41 @@
+"""
+AESEncryption 解密兼容性测试
+"""
+
+import hashlib
+
+import pytest
+
+from app.utils import AESEncryption
+
+
+@pytest.fixture
+def encryption(tmp_path):
+    return AESEncryption(key_file=str(tmp_path / "ztbai.key"))
+
+
+def test_master_roundtrip(encryption):
+    md5 = hashlib.md5(b"bid").hexdigest()
+    token = encryption.encrypt(md5)
+    assert token.startswith("v2:")
+    assert encryption.decrypt(token) == md5
+
+
+def test_per_message_roundtrip(tmp_path):
+    md5 = hashlib.md5(b"bid").hexdigest()
+    token = AESEncryption(mode="per_message", key_file=str(tmp_path / "ztbai.key")).encrypt(md5)
+    # 旧格式密文在默认的 master 模式下也能解密
+    assert AESEncryption(key_file=str(tmp_path / "ztbai.key")).decrypt(token) == md5
+
+
+def test_legacy_plaintext_md5(encryption):
+    # 旧版本的不加密兜底实现直接保存MD5
+    md5 = hashlib.md5(b"bid").hexdigest()
+    assert encryption.decrypt(md5) == md5
+    assert encryption.decrypt(md5.upper()) == md5.upper()
+
+
+def test_decrypt_many(encryption):
+    md5 = hashlib.md5(b"bid").hexdigest()
+    token = encryption.encrypt(md5)
+    assert encryption.decrypt_many([token, md5, None, "v2:invalid"]) == [md5, md5, None, None]